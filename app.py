@@ -1,12 +1,24 @@
 import streamlit as st
 import requests
 import pandas as pd
+import json
+import threading
+import time
+from collections import OrderedDict
 import plotly.graph_objs as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 
 # Backend URL (Assumed to be running)
 BACKEND_URL = "https://stock-trend-price-forecasting-system.onrender.com/stock"
+# Same analysis as Server-Sent Events: the chart first, the models as they finish
+STREAM_URL = BACKEND_URL + "/stream"
+# Longer ranges are downsampled by the backend; the chart can't show more candles than this anyway
+CHART_MAX_POINTS = 600
+# Backend results and built charts are kept per (ticker, start, end), so switching back to a
+# recently viewed ticker, or any widget change, reruns without a backend call
+RESULT_TTL_SECONDS = 15 * 60
+RESULT_CACHE_SIZE = 32
 
 # --- Streamlit Page Setup ---
 st.set_page_config(
@@ -131,6 +143,168 @@ with header_placeholder.container():
     )
 
 
+# --- Backend Access (Cached) ---
+class BackendError(Exception):
+    """The backend answered with an analysis error; not cached, the next fetch asks again."""
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """One session for the app process, so connections to the backend are kept alive and reused."""
+    return requests.Session()
+
+
+class ResultCache:
+    """Backend results by (ticker, start, end), bounded and with a time-to-live."""
+
+    def __init__(self, ttl: float, size: int):
+        self.ttl = ttl
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def result_cache() -> ResultCache:
+    """One result cache for the app process, shared by all sessions."""
+    return ResultCache(RESULT_TTL_SECONDS, RESULT_CACHE_SIZE)
+
+
+def stream_analysis(ticker: str, start: str, end: str, on_event) -> dict:
+    """
+    Backend analysis of ``ticker`` between ``start`` and ``end`` (YYYY-MM-DD),
+    read from the event stream. ``on_event(name, result so far)`` is called
+    after every event. Raises BackendError when there is no chart; later
+    stages that fail are listed under "Stage_Errors".
+    """
+    params = {"symbol": ticker, "start": start, "end": end, "max_points": CHART_MAX_POINTS}
+    result = {}
+    with http_session().get(STREAM_URL, params=params, stream=True, timeout=120) as resp:
+        resp.raise_for_status()
+        name = None
+        # the events are UTF-8 whatever the headers say; each arrives in its own chunk
+        for line in resp.iter_lines(chunk_size=None):
+            line = line.decode("utf-8")
+            if line.startswith("event:"):
+                name = line[len("event:"):].strip()
+                continue
+            if not line.startswith("data:"):
+                continue
+            payload = json.loads(line[len("data:"):])
+            if name == "error":
+                if payload["stage"] == "indicators":
+                    raise BackendError(payload["error"])
+                result.setdefault("Stage_Errors", {})[payload["stage"]] = payload["error"]
+            elif name != "done":
+                predictions = payload.pop("SARIMA_Predictions", {})
+                result.update(payload)
+                result.setdefault("SARIMA_Predictions", {}).update(predictions)
+            on_event(name, result)
+    # the charts built from it are cached under this too, so a fresh result never shows an older chart
+    result["Fetched_At"] = time.time()
+    return result
+
+
+def to_frame(chart: dict) -> pd.DataFrame:
+    """The columnar chart of a backend result as a DataFrame sorted by date."""
+    chart = pd.DataFrame(chart or {})
+    if not chart.empty:
+        chart["Date"] = pd.to_datetime(chart["Date"], unit="ms")
+        chart = chart.sort_values("Date")
+    return chart
+
+
+@st.cache_data(ttl=RESULT_TTL_SECONDS, max_entries=RESULT_CACHE_SIZE, show_spinner=False)
+def chart_frame(ticker: str, start: str, end: str, fetched_at: float, _data: dict) -> pd.DataFrame:
+    """``to_frame`` of the chart in ``_data``, the result for (ticker, start, end) fetched at ``fetched_at``."""
+    return to_frame(_data.get("chart"))
+
+
+@st.cache_data(ttl=RESULT_TTL_SECONDS, max_entries=RESULT_CACHE_SIZE, show_spinner=False)
+def price_figure(ticker: str, start: str, end: str, fetched_at: float, _chart: pd.DataFrame) -> go.Figure:
+    """``build_figure`` of ``_chart``, the chart for (ticker, start, end) fetched at ``fetched_at``."""
+    return build_figure(ticker, _chart)
+
+
+def build_figure(ticker: str, df: pd.DataFrame) -> go.Figure:
+    """Candlestick, EMA and volume chart."""
+    fig = make_subplots(
+        rows=2, cols=1,
+        shared_xaxes=True,
+        row_heights=[0.75, 0.25], 
+        vertical_spacing=0.03
+    )
+
+    # --- Candlestick (Top) ---
+    fig.add_trace(
+        go.Candlestick(
+            x=df["Date"],
+            open=df["Open"], high=df["High"],
+            low=df["Low"], close=df["Close"],
+            name="Price",
+            increasing_line_color="#2ca02c", 
+            decreasing_line_color="#d62728"
+        ),
+        row=1, col=1
+    )
+    
+    # --- Add EMAs to Candlestick Chart (Row 1) ---
+    # FIX: Assumes backend now correctly includes 'EMA5' and 'EMA10'
+    fig.add_trace(go.Scatter(x=df['Date'], y=df['EMA5'], line=dict(color='#1f77b4', width=1.5), name='EMA 05'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=df['Date'], y=df['EMA10'], line=dict(color='#9467bd', width=1.5), name='EMA 10'), row=1, col=1)
+
+    # --- Volume (Bottom) with Green/Red coloring ---
+    colors = ["#2ca02c" if c >= o else "#d62728" for c, o in zip(df["Close"], df["Open"])]
+    fig.add_trace(
+        go.Bar(
+            x=df["Date"], y=df["Volume"],
+            marker_color=colors,
+            opacity=0.7,
+            name="Volume"
+        ),
+        row=2, col=1
+    )
+
+    # --- Layout Styling ---
+    fig.update_layout(
+        title=f"{ticker} Candlestick Chart",
+        height=750, 
+        xaxis_rangeslider_visible=False,
+        paper_bgcolor="#ffffff", 
+        plot_bgcolor="#ffffff",
+        font=dict(color="#1c1c1c"), 
+        margin=dict(t=50, b=10, l=10, r=10),
+        hovermode="x unified",
+        xaxis=dict(showgrid=False),
+        yaxis=dict(title="Price", showgrid=True, gridcolor="#e0e0e0"),
+        yaxis2=dict(title="Volume", showgrid=False),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    
+    fig.update_xaxes(showgrid=False, rangeslider_visible=False)
+    fig.update_yaxes(title='', showgrid=True, gridcolor='#e0e0e0')
+    fig.update_yaxes(title='Price', row=1, col=1)
+    fig.update_yaxes(title='Volume', row=2, col=1)
+
+    return fig
+
+
 # --- Data Input and Fetch Logic (SIDEBAR) ---
 if 'fetch_data_clicked' not in st.session_state:
     st.session_state['fetch_data_clicked'] = False
@@ -168,23 +342,43 @@ if st.session_state['fetch_data_clicked']:
         st.session_state['fetch_data_clicked'] = False
         st.stop()
         
-    params = {
-        "symbol": _ticker, 
-        "start": st.session_state.start_date_input.strftime("%Y-%m-%d"),
-        "end": st.session_state.end_date_input.strftime("%Y-%m-%d")
-    }
+    query = (
+        _ticker.upper(),
+        st.session_state.start_date_input.strftime("%Y-%m-%d"),
+        st.session_state.end_date_input.strftime("%Y-%m-%d"),
+    )
     
+    # a recently viewed (ticker, start, end) comes from the cache, without a backend call
+    cached = result_cache().get(query)
     try:
-        with st.spinner(f"Running XGBoost and SARIMA analysis for {_ticker.upper()}..."):
-            resp = requests.get(BACKEND_URL, params=params, timeout=120)
-            resp.raise_for_status()
-            st.session_state['data'] = resp.json()
-        
-        if 'error' in st.session_state['data']:
-            st.error(f"Backend Analysis Error: {st.session_state['data']['error']}")
-            st.session_state['data'] = None
-            st.session_state['fetch_data_clicked'] = False
-            st.stop()
+        if cached is None:
+            chart_slot, status_slot = st.empty(), st.empty()
+
+            def show_partial(name, partial):
+                # each part is shown as it arrives; the full layout replaces them below
+                if name == "chart":
+                    chart_slot.plotly_chart(build_figure(query[0], to_frame(partial["chart"])), use_container_width=True)
+                predictions = partial.get("SARIMA_Predictions", {})
+                parts = [f"**XGBoost:** {partial.get('XGBoost_Signal', 'running...')}"]
+                for horizon in ("3_Day", "5_Day"):
+                    price = predictions.get(horizon, {}).get("Predicted_Price")
+                    parts.append(f"**{horizon.replace('_', '-')}:** " + (f"{price:.2f}" if price is not None else "running..."))
+                status_slot.markdown(" &nbsp;|&nbsp; ".join(parts))
+
+            with st.spinner(f"Running XGBoost and SARIMA analysis for {_ticker.upper()}..."):
+                cached = stream_analysis(*query, on_event=show_partial)
+            chart_slot.empty()
+            status_slot.empty()
+            if "Stage_Errors" not in cached:
+                result_cache().put(query, cached)
+        st.session_state['data'] = cached
+        st.session_state['query'] = query
+            
+    except BackendError as e:
+        st.error(f"Backend Analysis Error: {e}")
+        st.session_state['data'] = None
+        st.session_state['fetch_data_clicked'] = False
+        st.stop()
             
     except Exception as e:
         st.error(f"Failed to fetch data or communication error: {e}")
@@ -195,7 +389,9 @@ if st.session_state['fetch_data_clicked']:
 # --- Display Data (MAIN BODY) ---
 if st.session_state['data']:
     data = st.session_state['data']
-    chart = data.get("chart", [])
+    chart = chart_frame(*st.session_state['query'], data["Fetched_At"], data)
+    for stage, error in data.get("Stage_Errors", {}).items():
+        st.warning(f"{stage} unavailable: {error}")
     
     # Extract prediction data
     sarima_predictions = data.get("SARIMA_Predictions", {})
@@ -205,12 +401,13 @@ if st.session_state['data']:
     pred_3_day = sarima_predictions.get("3_Day", {})
     pred_5_day = sarima_predictions.get("5_Day", {})
     
-    if not chart:
+    if chart.empty:
         st.info(f"No historical data available for **{st.session_state.ticker_input.upper()}** between {st.session_state.start_date_input} and {st.session_state.end_date_input}.")
         st.stop()
 
     # --- Extract Latest/52W Data ---
-    latest = chart[-1] if chart else {}
+    latest = {k: (None if pd.isna(v) else v) for k, v in chart.iloc[-1].items()}
+    latest["Date"] = latest["Date"].isoformat()
     
     live_data = data.get("live", {})
     mock_52w_high = live_data.get("52wHigh", latest.get("High") * 1.1 if latest.get("High") else 950.00) 
@@ -252,69 +449,7 @@ if st.session_state['data']:
     # --- Candlestick + Volume Chart ---
     with left:
         
-        df = pd.DataFrame(chart)
-        df["Date"] = pd.to_datetime(df["Date"])
-        df = df.sort_values("Date")
-        
-        fig = make_subplots(
-            rows=2, cols=1,
-            shared_xaxes=True,
-            row_heights=[0.75, 0.25], 
-            vertical_spacing=0.03
-        )
-
-        # --- Candlestick (Top) ---
-        fig.add_trace(
-            go.Candlestick(
-                x=df["Date"],
-                open=df["Open"], high=df["High"],
-                low=df["Low"], close=df["Close"],
-                name="Price",
-                increasing_line_color="#2ca02c", 
-                decreasing_line_color="#d62728"
-            ),
-            row=1, col=1
-        )
-        
-        # --- Add EMAs to Candlestick Chart (Row 1) ---
-        # FIX: Assumes backend now correctly includes 'EMA5' and 'EMA10'
-        fig.add_trace(go.Scatter(x=df['Date'], y=df['EMA5'], line=dict(color='#1f77b4', width=1.5), name='EMA 05'), row=1, col=1)
-        fig.add_trace(go.Scatter(x=df['Date'], y=df['EMA10'], line=dict(color='#9467bd', width=1.5), name='EMA 10'), row=1, col=1)
-
-        # --- Volume (Bottom) with Green/Red coloring ---
-        colors = ["#2ca02c" if c >= o else "#d62728" for c, o in zip(df["Close"], df["Open"])]
-        fig.add_trace(
-            go.Bar(
-                x=df["Date"], y=df["Volume"],
-                marker_color=colors,
-                opacity=0.7,
-                name="Volume"
-            ),
-            row=2, col=1
-        )
-
-        # --- Layout Styling ---
-        fig.update_layout(
-            title=f"{_ticker.upper()} Candlestick Chart",
-            height=750, 
-            xaxis_rangeslider_visible=False,
-            paper_bgcolor="#ffffff", 
-            plot_bgcolor="#ffffff",
-            font=dict(color="#1c1c1c"), 
-            margin=dict(t=50, b=10, l=10, r=10),
-            hovermode="x unified",
-            xaxis=dict(showgrid=False),
-            yaxis=dict(title="Price", showgrid=True, gridcolor="#e0e0e0"),
-            yaxis2=dict(title="Volume", showgrid=False),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        
-        fig.update_xaxes(showgrid=False, rangeslider_visible=False)
-        fig.update_yaxes(title='', showgrid=True, gridcolor='#e0e0e0')
-        fig.update_yaxes(title='Price', row=1, col=1)
-        fig.update_yaxes(title='Volume', row=2, col=1)
-
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(price_figure(*st.session_state['query'], data["Fetched_At"], chart), use_container_width=True)
 
 
     # --- Indicators / Side Panel (REVISED LAYOUT) ---
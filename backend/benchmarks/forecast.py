@@ -0,0 +1,172 @@
+"""
+Speed and accuracy of the forecast engines: SARIMA and the fast ones of
+forecast_engine.
+
+    python -m backend.benchmarks.forecast                          # synthetic data
+    python -m backend.benchmarks.forecast --symbols INFY TCS --start 2015-01-01
+    python -m backend.benchmarks.forecast --batch 1 10 100 --origins 40 --save forecast.json
+
+Speed: the time to forecast a batch of symbols (one /stock window of
+``--window`` bars each) with every engine. SARIMA fits symbol by symbol, as
+a /stock/batch chunk does; the fast engines fit the batch in one call.
+SARIMA is timed on at most ``--sarima-max`` symbols, and larger batches are
+extrapolated from that.
+
+Accuracy: a rolling-origin evaluation. At each of ``--origins`` cut-offs,
+evenly spaced over the last ``--test-bars`` bars of every series, each
+engine is fitted on the ``--window`` bars before the cut-off. Its 3- and
+5-day forecasts are then compared with the actual closes. Reported per
+engine and horizon:
+- MAPE and RMSE in percent of the price;
+- the direction hit rate, i.e. how often the sign of the predicted move was
+  right.
+
+The naive forecast (the latest close) is the baseline. On a random walk
+(the synthetic data) no engine should beat it by much; use ``--symbols``
+for real bars, fetched through the configured OHLCV provider and caches.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from .pipeline import _isolate, _meta
+
+ENGINES = ("naive", "sarima", "ar", "ets")
+BATCH_SIZES = [1, 10, 100]
+SYNTHETIC_SYMBOLS = 5
+SYNTHETIC_YEARS = 6
+WINDOW = 250
+TEST_BARS = 500
+ORIGINS = 20
+SARIMA_MAX = 5
+
+
+def _synthetic(count, years):
+    from .synthetic import random_walk_ohlcv
+
+    return {f"SYN{i}": random_walk_ohlcv(years, seed=i)[["Date", "Close"]] for i in range(count)}
+
+
+def _historical(symbols, start, end):
+    from backend.src.services.stock_services import fetch_historical_many
+
+    frames = fetch_historical_many(symbols, start, end)
+    return {symbol: frame[["Date", "Close"]] for symbol, frame in frames.items() if not frame.empty}
+
+
+def _bars(frame):
+    frame = frame.dropna(subset=["Close"]).sort_values("Date")
+    return {"Date": frame["Date"].to_numpy(dtype="datetime64[ns]"), "Close": frame["Close"].to_numpy(dtype=float)}
+
+
+def predict(engine, windows, horizons):
+    """``{symbol: {horizon: predicted price}}`` of ``engine`` for ``{symbol: bars}``."""
+    from backend.src.services import forecast_engine
+    from backend.src.services.stock_services import predict_with_sarima
+
+    if engine == "naive":
+        return {symbol: {h: bars["Close"][-1] for h in horizons} for symbol, bars in windows.items()}
+    if engine == "sarima":
+        results = {symbol: predict_with_sarima(bars, horizons=horizons) for symbol, bars in windows.items()}
+    else:
+        results = forecast_engine.forecast_many({s: bars["Close"] for s, bars in windows.items()}, engine, horizons)
+    return {symbol: {h: r[f"{h}_Day"]["Predicted_Price"] for h in horizons} for symbol, r in results.items()}
+
+
+def speed(series, batch_sizes, window, sarima_max):
+    """Seconds per batch for each engine and batch size."""
+    pool = list(series.values())
+    results = {}
+    for size in batch_sizes:
+        # the synthetic or fetched series are reused round-robin for large batches
+        windows = {f"B{i}": {k: v[-window:] for k, v in pool[i % len(pool)].items()} for i in range(size)}
+        for engine in ENGINES[1:]:
+            timed = dict(list(windows.items())[:sarima_max]) if engine == "sarima" else windows
+            t0 = time.perf_counter()
+            predict(engine, timed, (3, 5))
+            seconds = (time.perf_counter() - t0) * size / len(timed)
+            name = f"{engine}/batch{size}"
+            results[name] = {"seconds": seconds, "extrapolated": len(timed) < size}
+            note = "  (extrapolated)" if len(timed) < size else ""
+            print(f"{name:<24} {seconds * 1e3:>11.1f} ms{note}")
+    return results
+
+
+def accuracy(series, window, test_bars, origins, horizons=(3, 5)):
+    """MAPE, RMSE (percent) and direction hit rate per engine and horizon."""
+    errors = {engine: {h: [] for h in horizons} for engine in ENGINES}
+    hits = {engine: {h: [] for h in horizons} for engine in ENGINES}
+    for symbol, bars in series.items():
+        n = len(bars["Close"])
+        first = max(window, n - test_bars)
+        if n - max(horizons) < first:
+            print(f"{symbol}: shorter than a {window}-bar window and the horizons, skipped")
+            continue
+        for cutoff in np.unique(np.linspace(first, n - max(horizons), origins).astype(int)):
+            windows = {symbol: {k: v[cutoff - window:cutoff] for k, v in bars.items()}}
+            latest = bars["Close"][cutoff - 1]
+            for engine in ENGINES:
+                predicted = predict(engine, windows, horizons)[symbol]
+                for h in horizons:
+                    actual = bars["Close"][cutoff + h - 1]
+                    errors[engine][h].append((predicted[h] - actual) / actual * 100)
+                    if engine != "naive":
+                        hits[engine][h].append(np.sign(predicted[h] - latest) == np.sign(actual - latest))
+
+    results = {}
+    print(f"\n{'engine':<8} {'horizon':>7} {'MAPE %':>8} {'RMSE %':>8} {'direction':>10} {'forecasts':>10}")
+    for engine in ENGINES:
+        for h in horizons:
+            e = np.asarray(errors[engine][h])
+            if not len(e):
+                continue
+            entry = {
+                "mape_%": round(float(np.abs(e).mean()), 4),
+                "rmse_%": round(float(np.sqrt((e ** 2).mean())), 4),
+                "direction_hit_rate": round(float(np.mean(hits[engine][h])), 4) if hits[engine][h] else None,
+                "forecasts": int(len(e)),
+            }
+            results[f"{engine}/{h}_Day"] = entry
+            direction = f"{entry['direction_hit_rate']:.1%}" if entry["direction_hit_rate"] is not None else "-"
+            print(f"{engine:<8} {h:>5}_D {entry['mape_%']:>8.3f} {entry['rmse_%']:>8.3f} {direction:>10} {entry['forecasts']:>10}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", nargs="+", help="real symbols instead of synthetic random walks")
+    parser.add_argument("--start", default="2015-01-01", help="first date fetched for --symbols")
+    parser.add_argument("--end", default=time.strftime("%Y-%m-%d"), help="last date fetched for --symbols")
+    parser.add_argument("--batch", type=int, nargs="*", default=BATCH_SIZES, help=f"batch sizes timed (default {BATCH_SIZES})")
+    parser.add_argument("--window", type=int, default=WINDOW, help="bars each fit sees (default: one /stock year)")
+    parser.add_argument("--test-bars", type=int, default=TEST_BARS, help="bars at the end of each series the origins spread over")
+    parser.add_argument("--origins", type=int, default=ORIGINS, help="forecast origins per series")
+    parser.add_argument("--sarima-max", type=int, default=SARIMA_MAX, help="symbols SARIMA is timed on per batch")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.symbols:
+        frames = _historical([s.strip().upper() for s in args.symbols], args.start, args.end)
+    else:
+        # keep the fits away from the repository caches
+        _isolate()
+        frames = _synthetic(SYNTHETIC_SYMBOLS, SYNTHETIC_YEARS)
+    series = {symbol: _bars(frame) for symbol, frame in frames.items()}
+    if not series:
+        print("no data")
+        return 1
+
+    results = {"speed": speed(series, args.batch, args.window, args.sarima_max) if args.batch else {}}
+    results["accuracy"] = accuracy(series, args.window, args.test_bars, args.origins)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": _meta(), "symbols": list(series), "results": results}, f, indent=2)
+        print(f"\nresults written to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Peak memory per request of the analysis pipeline, standard against lean mode.
+
+    python -m backend.benchmarks.memory --save memory.json
+    python -m backend.benchmarks.memory --years 5 20 --batch 0
+
+The cases run in a fresh interpreter with ``LEAN_MODE=0`` (standard), then
+in another one with ``LEAN_MODE=1`` (lean). The child imports the analysis
+libraries first (``WORKER_MODULES``, as a preloaded pool worker has them),
+then reports how far the resident set size (RSS) of the process rose above
+its level before each request; the first case also pays for the one-off
+allocations of the libraries' first use:
+
+cold/<years>
+    get_stock with nothing cached: indicators, XGBoost training, SARIMA fit.
+warm/<years>
+    The same request again: features from the store, the cached model and
+    the SARIMA Kalman filter with the stored parameters.
+batch<size>/<years>
+    analyze_many over ``size`` symbols, cold; what one pool worker runs for
+    a chunk of /stock/batch.
+
+Before every request the heap memory freed so far is handed back to the
+OS (glibc ``malloc_trim``), so that memory kept from the case before does
+not hide the next one's peak, and the peak is reset through
+/proc/self/clear_refs (Linux). Where that is not available the peak of the
+whole process is used, imports included, so only the larger requests are
+meaningful there.
+Bars come from the synthetic random walk of benchmarks/pipeline.py.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+from .pipeline import _isolate, _meta, _window, _write_symbol
+
+YEARS = [5, 10, 20]
+BATCH_SIZES = [5]
+BATCH_YEARS = 5
+MODES = {"standard": "0", "lean": "1"}
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _status_mib(field: str):
+    """``VmRSS`` / ``VmHWM`` of this process in MiB, or None without /proc."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _max_rss_mib() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _trim_heap():
+    gc.collect()
+    try:
+        ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim(0)
+    except (OSError, AttributeError, TypeError):
+        pass  # not glibc
+
+
+def _reset_peak() -> bool:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(func) -> dict:
+    """Run ``func``; RSS before it and its peak above that, in MiB."""
+    _trim_heap()
+    before = _status_mib("VmRSS") or _max_rss_mib()
+    per_request = _reset_peak()
+    func()
+    peak = _status_mib("VmHWM") if per_request else _max_rss_mib()
+    return {"rss_mib": round(before, 1), "peak_mib": round(peak - before, 1), "per_request": per_request}
+
+
+def child(cases: list) -> dict:
+    """Runs in the fresh interpreter: every ``(name, symbols, start, end)`` case, in order."""
+    from backend.src.services import stock_services as svc
+    from backend.src.services.executor import import_worker_modules
+
+    import_worker_modules()
+    results = {}
+    for name, symbols, start, end in cases:
+        if len(symbols) == 1:
+            result = {}
+            entry = measure(lambda: result.update(svc.get_stock(symbols[0], start, end)))
+            failed = [result] if "error" in result else []
+        else:
+            results_many = []
+            histories = svc.fetch_historical_many(symbols, start, end, warmup=True)
+            entry = measure(lambda: results_many.extend(svc.analyze_many(list(histories.items()), start=start)))
+            failed = [r for r in results_many if "error" in r]
+        if failed:
+            entry = {"error": failed[0]["error"]}
+        results[name] = entry
+    return results
+
+
+def run_mode(mode: str, cases: list) -> dict:
+    env = dict(os.environ, LEAN_MODE=MODES[mode])
+    # every mode starts with empty caches, so the cold cases are cold
+    shutil.rmtree(env["STOCK_CACHE_DIR"], ignore_errors=True)
+    out = subprocess.run([sys.executable, "-m", "backend.benchmarks.memory", "--child", json.dumps(cases)],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(years_list, batch_sizes) -> dict:
+    data_dir = _isolate()
+    cases = []
+    for years in years_list:
+        symbol = f"MEM{years}Y"
+        start, end = _window(_write_symbol(data_dir, symbol, years, seed=years), years)
+        cases.append((f"cold/{years}y", [symbol], start, end))
+        cases.append((f"warm/{years}y", [symbol], start, end))
+    for size in batch_sizes:
+        batch = [f"MEMB{size}X{i:03d}" for i in range(size)]
+        frames = [_write_symbol(data_dir, s, BATCH_YEARS, seed=1000 * size + i) for i, s in enumerate(batch)]
+        start, end = _window(frames[0], BATCH_YEARS)
+        cases.append((f"batch{size}/{BATCH_YEARS}y", batch, start, end))
+
+    results = {}
+    for mode in MODES:
+        try:
+            measured = run_mode(mode, cases)
+        except Exception as e:
+            measured = {name: {"error": str(e)} for name, *_ in cases}
+        for name, entry in measured.items():
+            results[f"{mode}/{name}"] = entry
+    return results
+
+
+def report(results: dict):
+    print(f"{'case':<24} {'standard MiB':>13} {'lean MiB':>9} {'change':>8}")
+    names = [name.split("/", 1)[1] for name in results if name.startswith("standard/")]
+    for name in names:
+        before, after = results[f"standard/{name}"], results.get(f"lean/{name}", {})
+        if "peak_mib" not in before or "peak_mib" not in after:
+            error = before.get("error") or after.get("error")
+            print(f"{name:<24} {'error':>13}: {error}")
+            continue
+        change = after["peak_mib"] / before["peak_mib"] - 1 if before["peak_mib"] > 0 else 0.0
+        print(f"{name:<24} {before['peak_mib']:>13.1f} {after['peak_mib']:>9.1f} {change:>+7.0%}")
+    baseline = next((entry for entry in results.values() if "rss_mib" in entry), None)
+    if baseline and not baseline["per_request"]:
+        print("\npeak RSS of the whole process: /proc/self/clear_refs is not available here")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, nargs="+", default=YEARS, help=f"history lengths (default {YEARS})")
+    parser.add_argument("--batch", type=int, nargs="*", help=f"batch sizes (default {BATCH_SIZES}), 0 for none")
+    parser.add_argument("--save", metavar="PATH", help="write the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child(json.loads(args.child))))
+        return 0
+
+    batch_sizes = [size for size in (args.batch if args.batch is not None else BATCH_SIZES) if size > 0]
+    results = run(args.years, batch_sizes)
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": _meta(), "results": results}, f, indent=2)
+        print(f"\nresults written to {args.save}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Benchmarks for the analysis pipeline in stock_services, on synthetic data.
+
+    python -m backend.benchmarks.pipeline --save baseline.json
+    python -m backend.benchmarks.pipeline --compare baseline.json [--threshold 0.2]
+    python -m backend.benchmarks.pipeline --quick        # 1 and 5 years, batches of 1 and 5
+
+Times build_indicators, generate_xgboost_signal, predict_with_sarima and a
+full get_stock (cold: nothing cached, warm: model cache and SARIMA state in
+place) plus the serialization of its result, and of its chart downsampled
+to ``DOWNSAMPLE_POINTS`` rows, for each history length, and
+get_stocks for each batch size. Bars come from a deterministic random walk
+with holiday gaps, served through a LocalFileProvider in a scratch
+directory, so no network is needed and the repository caches are left alone.
+Each symbol has ``WARMUP_YEARS`` of bars before its window, which the
+requests load for the weekly/monthly features as they do in production.
+
+A case whose analysis fails, by raising or by returning an "error" entry,
+is reported as an error, not timed, and never compared.
+
+Results are written as JSON. ``--compare`` runs the same cases and reports
+every case that got slower than the baseline by more than ``--threshold``
+(relative, default 20%); the exit code is 1 if there is any.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+YEARS = [1, 5, 10, 20]
+BATCH_SIZES = [1, 10, 50, 100]
+BATCH_YEARS = 5
+QUICK_YEARS = [1, 5]
+QUICK_BATCH_SIZES = [1, 5]
+HOLIDAYS_PER_YEAR = 14
+THRESHOLD = 0.2
+DOWNSAMPLE_POINTS = 600
+# differences below this are noise, whatever the ratio
+MIN_DELTA_SECONDS = 0.005
+# bars before each window for the indicator warm-up (timeframes.warmup_days, rounded up to years)
+WARMUP_YEARS = 2
+
+
+def _isolate():
+    """Point every cache at a scratch directory and the provider at local files. Call before importing backend.src."""
+    root = tempfile.mkdtemp(prefix="stock-bench-")
+    os.environ["STOCK_CACHE_DIR"] = os.path.join(root, "cache")
+    os.environ["OHLCV_PROVIDER"] = "local"
+    os.environ["OHLCV_LOCAL_DIR"] = os.path.join(root, "data")
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    os.makedirs(os.environ["OHLCV_LOCAL_DIR"])
+    return os.environ["OHLCV_LOCAL_DIR"]
+
+
+def _write_symbol(data_dir, symbol, years, seed):
+    """``years`` of bars for the window plus ``WARMUP_YEARS`` before it."""
+    from .synthetic import random_walk_ohlcv
+
+    df = random_walk_ohlcv(years + WARMUP_YEARS, seed=seed, start="2004-01-05", holidays_per_year=HOLIDAYS_PER_YEAR)
+    df.to_parquet(os.path.join(data_dir, f"{symbol}.NS.parquet"), index=False)
+    return df
+
+
+def _window(df, years):
+    """The last ``years`` of ``df`` as a request window; /stock rejects windows shorter than 365 days."""
+    end = df["Date"].iloc[-1]
+    start = end - pd.Timedelta(days=max(365, math.ceil(years * 365.25)))
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def _failure(value):
+    """The error of a failed analysis result (a get_stock dict or a list of them), else None."""
+    results = value if isinstance(value, list) else [value]
+    return next((r["error"] for r in results if isinstance(r, dict) and "error" in r), None)
+
+
+def _best_of(func, repeat):
+    """Best time of ``repeat`` runs and the value of the last one."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - t0)
+        error = _failure(value)
+        if error is not None:
+            raise RuntimeError(error)
+    return best, value
+
+
+class Runner:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def case(self, name, func, repeat=None):
+        """Time ``func``; returns its value, or None if it failed (recorded as the case's error, not fatal)."""
+        try:
+            seconds, value = _best_of(func, repeat or self.repeat)
+        except Exception as e:
+            self.results[name] = {"error": str(e)}
+            print(f"{name:<36} {'error':>14}: {e}")
+            return None
+        self.results[name] = {"seconds": seconds}
+        print(f"{name:<36} {seconds * 1e3:>11.1f} ms")
+        return value
+
+
+def run(years_list, batch_sizes, repeat):
+    data_dir = _isolate()
+    from backend.src.services import stock_services as svc
+    from backend.src.services.executor import get_executor
+    from backend.src.utils import serializers
+    from backend.src.utils.downsample import downsample_chart
+
+    runner = Runner(repeat)
+    for years in years_list:
+        symbol = f"BENCH{years}Y"
+        df = _write_symbol(data_dir, symbol, years, seed=years)
+        start, end = _window(df, years)
+        # the window's rows, with the warm-up bars before it used for the features only
+        hist = svc.since(svc.build_indicators(df), start)
+        label = f"{years}y"
+
+        # the stages only read their input, as in get_stock
+        runner.case(f"build_indicators/{label}", lambda: svc.build_indicators(df))
+        runner.case(f"generate_xgboost_signal/{label}", lambda: svc.generate_xgboost_signal(hist))
+        # a full SARIMA fit is the slowest stage by far; one run is representative
+        runner.case(f"predict_with_sarima/{label}", lambda: svc.predict_with_sarima(hist), repeat=1)
+
+        result = runner.case(f"get_stock_cold/{label}", lambda: svc.get_stock(symbol, start, end), repeat=1)
+        runner.case(f"get_stock_warm/{label}", lambda: svc.get_stock(symbol, start, end))
+        if result is not None:
+            for fmt in (serializers.JSON, serializers.COLUMNAR, serializers.ARROW, serializers.MSGPACK):
+                runner.case(f"serialize_{fmt}/{label}", lambda: serializers.encode(result, fmt))
+            # what the dashboard asks for: the chart cut for display, then encoded
+            runner.case(f"downsample{DOWNSAMPLE_POINTS}_json/{label}", lambda: serializers.encode(
+                {**result, "chart": downsample_chart(result["chart"], DOWNSAMPLE_POINTS)}, serializers.JSON))
+
+    if batch_sizes:
+        # start the pool workers outside the measurement
+        get_executor().submit(len, "warm-up").result()
+        for size in batch_sizes:
+            # fresh symbols per size, so the cold run has nothing cached
+            batch = [f"BATCH{size}X{i:03d}" for i in range(size)]
+            frames = [_write_symbol(data_dir, s, BATCH_YEARS, seed=1000 * size + i) for i, s in enumerate(batch)]
+            start, end = _window(frames[0], BATCH_YEARS)
+            runner.case(f"get_stocks_cold/{BATCH_YEARS}y/batch{size}", lambda: svc.get_stocks(batch, start, end), repeat=1)
+            runner.case(f"get_stocks_warm/{BATCH_YEARS}y/batch{size}", lambda: svc.get_stocks(batch, start, end), repeat=1)
+        get_executor().shutdown()
+
+    return runner.results
+
+
+def _meta():
+    import numpy
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Cases slower than the baseline by more than ``threshold``; prints a table."""
+    regressions = []
+    print(f"\n{'case':<36} {'baseline ms':>12} {'current ms':>11} {'change':>8}")
+    for name, entry in current.items():
+        base = baseline.get(name)
+        if not base or "seconds" not in base or "seconds" not in entry:
+            continue
+        before, after = base["seconds"], entry["seconds"]
+        change = after / before - 1
+        regressed = change > threshold and after - before > MIN_DELTA_SECONDS
+        if regressed:
+            regressions.append(name)
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<36} {before * 1e3:>12.1f} {after * 1e3:>11.1f} {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=float, nargs="+", help=f"history lengths (default {YEARS})")
+    parser.add_argument("--batch", type=int, nargs="*", help=f"batch sizes (default {BATCH_SIZES})")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best one counts")
+    parser.add_argument("--quick", action="store_true", help=f"years {QUICK_YEARS}, batches {QUICK_BATCH_SIZES}")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative slowdown counted as regression")
+    args = parser.parse_args(argv)
+
+    years = args.years or (QUICK_YEARS if args.quick else YEARS)
+    batch_sizes = args.batch if args.batch is not None else (QUICK_BATCH_SIZES if args.quick else BATCH_SIZES)
+    years = [int(y) if float(y).is_integer() else y for y in years]
+
+    results = run(years, batch_sizes, args.repeat)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": _meta(), "results": results}, f, indent=2)
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\nno regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+Cold-start benchmark of the API server.
+
+    python -m backend.benchmarks.startup --save startup.json
+    python -m backend.benchmarks.startup --compare startup.json [--threshold 0.2]
+    python -m backend.benchmarks.startup --top 15       # also list the slowest imports
+
+Every case starts a fresh interpreter:
+
+import_app
+    ``import backend.server``, timed inside the child process.
+first_response
+    From launching uvicorn to the first 200 from ``/``.
+first_stock_lazy
+    The first /stock request, sent as soon as ``/`` answers, with
+    ``PRELOAD=0``; it pays for importing the analysis libraries.
+first_stock_preloaded
+    The same request with ``PRELOAD=1``, sent once the background preload
+    has logged ``preload_finished``.
+
+/stock runs on a synthetic year of bars served by a LocalFileProvider in a
+scratch directory, so no network is needed. Results, ``--save`` and
+``--compare`` work as in benchmarks/pipeline.py: cases slower than the
+baseline by more than ``--threshold`` count as regressions (exit code 1).
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from .pipeline import THRESHOLD, _isolate, _meta, _window, _write_symbol, compare
+
+SYMBOL = "COLD"
+READY_TIMEOUT = 60.0
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import backend.server; print(time.perf_counter() - t)"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url: str, timeout: float = 120.0):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except OSError:
+        return None
+
+
+def time_import() -> float:
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=os.environ,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def slowest_imports(top: int) -> list:
+    """``(cumulative seconds, module)`` of the slowest imports under ``import backend.server``."""
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.server"], cwd=ROOT,
+                         env=os.environ, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in err.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", line)
+        # top-level packages only, nested ones are part of their parent's time
+        if match and len(match.group(2)) <= 2:
+            rows.append((int(match.group(1)) / 1e6, match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+
+class Server:
+    """uvicorn in a child process; its log lines are collected for ``wait_for``."""
+
+    def __init__(self, preload: bool):
+        self.port = _free_port()
+        env = dict(os.environ, PRELOAD="1" if preload else "0", LOG_LEVEL="INFO")
+        self.started = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.server:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+            start_new_session=True,
+        )
+        self.lines = []
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self.process.stdout:
+            self.lines.append(line)
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def wait_ready(self) -> float:
+        """Seconds from launch to the first 200 from ``/``."""
+        while time.perf_counter() - self.started < READY_TIMEOUT:
+            if self.process.poll() is not None:
+                raise RuntimeError("server exited: " + "".join(self.lines[-5:]))
+            if _get(self.url("/"), timeout=1.0) == 200:
+                return time.perf_counter() - self.started
+            time.sleep(0.01)
+        raise RuntimeError("server did not answer / in time")
+
+    def wait_for(self, event: str):
+        deadline = time.perf_counter() + READY_TIMEOUT
+        while time.perf_counter() < deadline:
+            if any(f'"event": "{event}"' in line for line in self.lines):
+                return
+            time.sleep(0.05)
+        raise RuntimeError(f"no {event} log line in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            # also takes down the forkserver and the workers, which outlive a killed server
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+
+
+def time_first_stock(preload: bool, start: str, end: str) -> float:
+    server = Server(preload)
+    try:
+        server.wait_ready()
+        if preload:
+            server.wait_for("preload_finished")
+        t0 = time.perf_counter()
+        with urllib.request.urlopen(server.url(f"/stock?symbol={SYMBOL}&start={start}&end={end}"), timeout=120.0) as response:
+            status, body = response.status, json.loads(response.read())
+        elapsed = time.perf_counter() - t0
+        if status != 200:
+            raise RuntimeError(f"/stock answered {status}")
+        if "error" in body:
+            # a failed analysis answers 200 too; its time is not the pipeline's
+            raise RuntimeError(body["error"])
+        return elapsed
+    finally:
+        server.stop()
+
+
+def time_first_response() -> float:
+    server = Server(preload=True)
+    try:
+        return server.wait_ready()
+    finally:
+        server.stop()
+
+
+def _best_of(func, repeat):
+    return min(func() for _ in range(repeat))
+
+
+def run(repeat: int) -> dict:
+    data_dir = _isolate()
+    df = _write_symbol(data_dir, SYMBOL, 1, seed=7)
+    start, end = _window(df, 1)
+    cache_dir = os.environ["STOCK_CACHE_DIR"]
+
+    def fresh(func, *args):
+        # every run starts with empty caches, so /stock does the full analysis
+        def call():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            return func(*args)
+        return call
+
+    cases = {
+        "import_app": time_import,
+        "first_response": fresh(time_first_response),
+        "first_stock_lazy": fresh(time_first_stock, False, start, end),
+        "first_stock_preloaded": fresh(time_first_stock, True, start, end),
+    }
+    results = {}
+    for name, func in cases.items():
+        try:
+            seconds = _best_of(func, repeat)
+            results[name] = {"seconds": seconds}
+            print(f"{name:<36} {seconds * 1e3:>11.1f} ms")
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            print(f"{name:<36} {'error':>14}: {e}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case, the best one counts")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest top-level imports")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a saved baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="relative slowdown counted as regression")
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat)
+    if args.top:
+        print(f"\n{'slowest imports':<36} {'ms':>11}")
+        for seconds, module in slowest_imports(args.top):
+            print(f"{module:<36} {seconds * 1e3:>11.1f}")
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"meta": _meta(), "results": results}, f, indent=2)
+        print(f"\nbaseline written to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            return 1
+        print(f"\nno regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
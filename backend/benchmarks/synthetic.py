@@ -0,0 +1,30 @@
+"""
+Deterministic synthetic OHLCV data for benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def random_walk_ohlcv(years: float = 1, seed: int = 0, start: str = "2005-01-03", price: float = 1000.0,
+                      holidays_per_year: int = 0) -> pd.DataFrame:
+    """
+    Daily bars following a geometric random walk, same layout as fetch_historical_yfinance.
+    Volume is log-normal and rises on large moves; ``holidays_per_year`` random
+    weekdays per year are dropped to mimic exchange holidays.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=int(TRADING_DAYS_PER_YEAR * years))
+    n = len(dates)
+    returns = rng.normal(0.0003, 0.015, n)
+    close = price * np.exp(np.cumsum(returns))
+    open_ = close * (1 + rng.normal(0, 0.004, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, n)))
+    volume = np.round(rng.lognormal(np.log(1_000_000), 0.5, n) * (1 + 20 * np.abs(returns)))
+    df = pd.DataFrame({"Date": dates, "Open": open_, "High": high, "Low": low, "Close": close, "Volume": volume})
+    if holidays_per_year:
+        holidays = rng.choice(n, size=min(n - 1, int(holidays_per_year * years)), replace=False)
+        df = df.drop(index=holidays).reset_index(drop=True)
+    return df
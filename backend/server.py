@@ -1,10 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from backend.src.routes import stock_routes
+from fastapi.responses import JSONResponse, Response
+from backend.src.routes import stock_routes, model_routes, job_routes
 from backend.src.middleware.custom_middleware import log_request
+from backend.src.services.executor import get_executor
+from backend.src.services.jobs import get_job_runner, queued_jobs, shutdown_job_runner
+from backend.src.services.preload import start_preload
+from backend.src.services.scheduler import start_scheduler, stop_scheduler
+from backend.src.services.stock_services import in_flight_stats
+from backend.src.utils import metrics
 
-app = FastAPI(title="Stock API")
+
+def register_gauges():
+    """Queue depth gauges of /metrics, read when it is scraped."""
+    metrics.QUEUE_DEPTH.labels("analysis_running").set_function(lambda: get_executor().stats()["running"])
+    metrics.QUEUE_DEPTH.labels("analysis_queued").set_function(lambda: get_executor().stats()["queued"])
+    metrics.QUEUE_DEPTH.labels("in_flight").set_function(lambda: in_flight_stats()["in_flight"])
+    metrics.QUEUE_DEPTH.labels("jobs_queued").set_function(queued_jobs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    register_gauges()
+    # Resume jobs left unfinished by the previous run
+    get_job_runner()
+    # Post-close precompute of the watchlist (no-op without WATCHLIST)
+    start_scheduler()
+    # Analysis libraries are imported lazily; warm them up while the first requests are served
+    start_preload()
+    yield
+    stop_scheduler()
+    shutdown_job_runner()
+    # uvicorn re-raises the SIGTERM once this returns, before the pool's own
+    # exit handler could stop the workers; without waiting here they would be orphaned
+    get_executor().shutdown(wait=True)
+
+
+app = FastAPI(title="Stock API", lifespan=lifespan)
 
 # Middleware
 app.add_middleware(
@@ -18,12 +51,20 @@ app.middleware("http")(log_request)
 
 # Include the stock route
 app.include_router(stock_routes.router)
+app.include_router(model_routes.router)
+app.include_router(job_routes.router)
 
 # Root endpoint to avoid 404 at "/"
 @app.get("/")
 def root():
     return {"message": "Stock API is running. Use /stock?symbol=INFY endpoint to get data."}
 
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics: stage and request histograms, cache hit/miss counters, queue depths."""
+    body, content_type = metrics.exposition()
+    return Response(body, media_type=content_type)
+
 # Global exception handler to catch unexpected errors
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -1,3 +1,5 @@
+import os
+
 NSE_HOME = "https://www.nseindia.com"
 NSE_QUOTE_API = "https://www.nseindia.com/api/quote-equity?symbol={symbol}"
 
@@ -8,3 +10,142 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
     "Accept-Encoding": "gzip, deflate, br",
 }
+
+# ---------------- Logging ----------------
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# ---------------- Local caches ----------------
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+CACHE_DIR = os.getenv("STOCK_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache"))
+
+# ---------------- Market calendar ----------------
+MARKET_TIMEZONE = "Asia/Kolkata"
+MARKET_CLOSE = os.getenv("MARKET_CLOSE", "15:30")  # HH:MM, local exchange time
+# Intraday bars and hourly periods start at the session open: 09:15, 10:15, ...
+MARKET_OPEN = os.getenv("MARKET_OPEN", "09:15")  # HH:MM, local exchange time
+
+# ---------------- OHLCV cache ----------------
+OHLCV_CACHE_DIR = os.path.join(CACHE_DIR, "ohlcv")
+# "yfinance" downloads from Yahoo; "local" reads <OHLCV_LOCAL_DIR>/<TICKER>.csv|.parquet
+OHLCV_PROVIDER = os.getenv("OHLCV_PROVIDER", "yfinance")
+OHLCV_LOCAL_DIR = os.getenv("OHLCV_LOCAL_DIR", os.path.join(PROJECT_ROOT, "data"))
+# Sessions still open are fetched again at most this often
+OHLCV_TAIL_TTL_SECONDS = float(os.getenv("OHLCV_TAIL_TTL_SECONDS", "300"))
+
+# ---------------- Intraday bars ----------------
+# Minute bars ingested from files (services/intraday.py), aggregated to 5m/15m/1h bars
+# stored here, and to daily bars stored in the OHLCV cache
+INTRADAY_DIR = os.path.join(CACHE_DIR, "intraday")
+# Rows read from a minute file at a time; bounds the memory of an ingestion
+INTRADAY_CHUNK_ROWS = int(os.getenv("INTRADAY_CHUNK_ROWS", "1000000"))
+# Completed bars held in memory before they are written out
+INTRADAY_FLUSH_ROWS = int(os.getenv("INTRADAY_FLUSH_ROWS", "500000"))
+# Files per ticker and interval before they are compacted into one
+INTRADAY_MAX_PARTS = int(os.getenv("INTRADAY_MAX_PARTS", "16"))
+
+# ---------------- Batch analysis ----------------
+BATCH_MAX_SYMBOLS = int(os.getenv("BATCH_MAX_SYMBOLS", "200"))
+# Parallel downloads for providers without a bulk endpoint
+BATCH_DOWNLOAD_CONCURRENCY = int(os.getenv("BATCH_DOWNLOAD_CONCURRENCY", "8"))
+
+# ---------------- Incremental indicators ----------------
+# Symbols whose indicator state is kept in memory per worker (LRU)
+INDICATOR_ENGINE_MAX_SYMBOLS = int(os.getenv("INDICATOR_ENGINE_MAX_SYMBOLS", "256"))
+
+# ---------------- Lean memory mode ----------------
+# Lower peak memory per analysis, for batch and multi-year workloads: pandas copy-on-write,
+# float32 indicator columns (the prices stay float64) and SARIMA fits that keep no per-bar
+# Kalman filter matrices. Forecasts are unchanged; indicators are rounded to ~7 digits
+LEAN_MODE = os.getenv("LEAN_MODE", "0").lower() in ("1", "true", "yes")
+
+# ---------------- Shared feature store ----------------
+# Memory-mapped indicator matrices shared by all worker processes
+FEATURE_STORE_DIR = os.path.join(CACHE_DIR, "features")
+# "float64" or "float32" (half the memory, values rounded to ~7 digits)
+FEATURE_STORE_DTYPE = os.getenv("FEATURE_STORE_DTYPE", "float64")
+
+# ---------------- XGBoost model cache ----------------
+MODEL_CACHE_DIR = os.path.join(CACHE_DIR, "models")
+MODEL_CACHE_MAX_ENTRIES = int(os.getenv("MODEL_CACHE_MAX_ENTRIES", "500"))
+MODEL_CACHE_TTL_SECONDS = float(os.getenv("MODEL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# ---------------- SARIMA ----------------
+SARIMA_ORDER = (2, 1, 2)
+SARIMA_SEASONAL_ORDER = (1, 1, 1, 12)
+SARIMA_HORIZONS = (3, 5)
+SARIMA_STATE_DIR = os.path.join(CACHE_DIR, "sarima")
+# Full refit policy; in between, stored parameters are re-applied with the Kalman filter
+SARIMA_REFIT_AFTER_BARS = int(os.getenv("SARIMA_REFIT_AFTER_BARS", "20"))
+SARIMA_REFIT_MAX_AGE_DAYS = float(os.getenv("SARIMA_REFIT_MAX_AGE_DAYS", "30"))
+SARIMA_REFIT_LLF_DROP = float(os.getenv("SARIMA_REFIT_LLF_DROP", "0.05"))
+# Per-symbol order selection; SARIMA_ORDER / SARIMA_SEASONAL_ORDER are used until a search picked one
+SARIMA_ORDER_SEARCH = os.getenv("SARIMA_ORDER_SEARCH", "0").lower() in ("1", "true", "yes")
+SARIMA_SEARCH_P = [int(v) for v in os.getenv("SARIMA_SEARCH_P", "0,1,2").split(",")]
+SARIMA_SEARCH_D = [int(v) for v in os.getenv("SARIMA_SEARCH_D", "1").split(",")]
+SARIMA_SEARCH_Q = [int(v) for v in os.getenv("SARIMA_SEARCH_Q", "0,1,2").split(",")]
+SARIMA_SEARCH_SEASONAL_P = [int(v) for v in os.getenv("SARIMA_SEARCH_SEASONAL_P", "0,1").split(",")]
+SARIMA_SEARCH_SEASONAL_D = [int(v) for v in os.getenv("SARIMA_SEARCH_SEASONAL_D", "0,1").split(",")]
+SARIMA_SEARCH_SEASONAL_Q = [int(v) for v in os.getenv("SARIMA_SEARCH_SEASONAL_Q", "0,1").split(",")]
+SARIMA_SEARCH_PERIODS = [int(v) for v in os.getenv("SARIMA_SEARCH_PERIODS", "12").split(",")]
+# d and D are chosen before the search, so that AIC/BIC compare fits of the same series
+SARIMA_SEARCH_ADF_ALPHA = float(os.getenv("SARIMA_SEARCH_ADF_ALPHA", "0.05"))
+SARIMA_SEARCH_SEASONAL_STRENGTH = float(os.getenv("SARIMA_SEARCH_SEASONAL_STRENGTH", "0.64"))
+SARIMA_SEARCH_CRITERION = os.getenv("SARIMA_SEARCH_CRITERION", "aic").lower()  # "aic" or "bic"
+# Every candidate gets a short fit first; only the best fraction is fitted fully
+SARIMA_SEARCH_PROBE_ITER = int(os.getenv("SARIMA_SEARCH_PROBE_ITER", "10"))
+SARIMA_SEARCH_KEEP = float(os.getenv("SARIMA_SEARCH_KEEP", "0.25"))
+SARIMA_SEARCH_BUDGET_SECONDS = float(os.getenv("SARIMA_SEARCH_BUDGET_SECONDS", "300"))
+# Largest budget_seconds POST /models/sarima/search accepts
+SARIMA_SEARCH_MAX_BUDGET_SECONDS = float(os.getenv("SARIMA_SEARCH_MAX_BUDGET_SECONDS", "900"))
+SARIMA_ORDER_TTL_DAYS = float(os.getenv("SARIMA_ORDER_TTL_DAYS", "30"))
+
+# ---------------- Fast forecasts ----------------
+# Forecast engine of /stock when the request does not pick one: "sarima", "ar" or "ets"
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "sarima").lower()
+FORECAST_AR_LAGS = int(os.getenv("FORECAST_AR_LAGS", "5"))
+# The fast engines fit on the latest bars only (about three years by default)
+FORECAST_FIT_BARS = int(os.getenv("FORECAST_FIT_BARS", "750"))
+
+# ---------------- Analysis process pool ----------------
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+# Tasks allowed to wait behind the running ones before requests get 503 + Retry-After
+ANALYSIS_QUEUE_LIMIT = int(os.getenv("ANALYSIS_QUEUE_LIMIT", "16"))
+# BLAS/OpenMP threads per worker process (XGBoost, statsmodels)
+ANALYSIS_THREADS_PER_WORKER = int(os.getenv("ANALYSIS_THREADS_PER_WORKER", "1"))
+# Start the pool workers, with the analysis libraries imported, in the background once the
+# server takes traffic; otherwise each worker imports them on first use
+PRELOAD = os.getenv("PRELOAD", "1").lower() in ("1", "true", "yes")
+
+# ---------------- Background jobs ----------------
+JOB_STORE_PATH = os.path.join(CACHE_DIR, "jobs.sqlite")
+# Threads taking jobs off the queue; each job runs one stage at a time in the analysis pool
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", str(24 * 3600)))
+# Every server process runs its own job threads; a process marks the jobs it runs alive this often,
+# and running jobs without a mark for JOB_HEARTBEAT_TIMEOUT_SECONDS are queued again for any process
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("JOB_HEARTBEAT_TIMEOUT_SECONDS", "60"))
+
+# ---------------- Post-market precompute ----------------
+# Comma-separated symbols analysed every weekday after the close, e.g. "INFY,TCS,HDFCBANK"
+WATCHLIST = [s.strip().upper() for s in os.getenv("WATCHLIST", "").split(",") if s.strip()]
+PRECOMPUTE_DELAY_MINUTES = int(os.getenv("PRECOMPUTE_DELAY_MINUTES", "30"))
+# Symbols analysed at the same time (each takes one analysis pool slot)
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+# Window of the precomputed results: the default /stock window. The indicators also load
+# timeframes.warmup_days of bars before it, so the W/M features are complete from its first bar
+PRECOMPUTE_LOOKBACK_DAYS = int(os.getenv("PRECOMPUTE_LOOKBACK_DAYS", "365"))
+PRECOMPUTE_DIR = os.path.join(CACHE_DIR, "precomputed")
+PRECOMPUTE_DB = os.path.join(CACHE_DIR, "precompute.sqlite")
+# Every server process has a scheduler; the one holding a session's lease runs it and renews
+# the lease while it does; a lease not renewed for this long passes to another process
+PRECOMPUTE_LEASE_SECONDS = float(os.getenv("PRECOMPUTE_LEASE_SECONDS", "120"))
+
+# ---------------- Signal model ----------------
+# "symbol": one XGBoost model per symbol and window, trained on request and cached
+# "panel": one model across PANEL_UNIVERSE, trained after the close; requests only predict
+SIGNAL_MODE = os.getenv("SIGNAL_MODE", "symbol").lower()
+# Comma-separated symbols the panel model is trained on; the watchlist if unset
+PANEL_UNIVERSE = [s.strip().upper() for s in os.getenv("PANEL_UNIVERSE", "").split(",") if s.strip()] or WATCHLIST
+PANEL_TRAIN_DAYS = int(os.getenv("PANEL_TRAIN_DAYS", str(5 * 365)))
+PANEL_MODEL_PATH = os.path.join(CACHE_DIR, "panel_model.joblib")
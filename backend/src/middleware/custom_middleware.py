@@ -1,9 +1,25 @@
 from fastapi import Request
 import time
+from ..utils import metrics
+from ..utils.log import get_logger, log_event
+
+logger = get_logger(__name__)
+
 
 async def log_request(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = time.time() - start
-    print(f"{request.method} {request.url} completed in {duration:.3f}s")
-    return response
\ No newline at end of file
+    start = time.perf_counter()
+    with metrics.request_timings() as timings:
+        response = await call_next(request)
+    duration = time.perf_counter() - start
+
+    # Route template rather than the raw path keeps the metric labels bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.REQUEST_SECONDS.labels(request.method, route, str(response.status_code)).observe(duration)
+    response.headers["Server-Timing"] = metrics.server_timing(timings.stages, duration)
+    log_event(
+        logger, "request",
+        method=request.method, path=request.url.path, query=request.url.query,
+        status=response.status_code, duration_ms=round(duration * 1000, 2),
+        stages=metrics.stage_totals(timings.stages),
+    )
+    return response
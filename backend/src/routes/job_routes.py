@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, Response
+from ..services.jobs import PRIORITIES, get_job_runner
+from ..utils import metrics, serializers
+from ..utils.helper import format_error
+from datetime import datetime, timedelta
+
+router = APIRouter(prefix="/jobs")
+
+
+@router.post("", status_code=202)
+def submit_job(
+    symbol: str = Query(..., description="Ticker e.g., INFY, TCS"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"), 
+        description="Start date for historical data (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"), 
+        description="End date for historical data (YYYY-MM-DD)"
+    ),
+    priority: str = Query("interactive", description="interactive (default) or bulk; interactive jobs run first")
+):
+    """
+    Queues a /stock analysis and returns its job id right away.
+    Poll GET /jobs/{id} for the status and the results.
+    """
+    if priority not in PRIORITIES:
+        return JSONResponse(status_code=400, content=format_error(f"priority must be one of: {', '.join(PRIORITIES)}"))
+    job = get_job_runner().submit(symbol.strip().upper(), start, end, PRIORITIES[priority])
+    return {"id": job["id"], "status": job["status"]}
+
+
+@router.get("/{job_id}")
+def get_job(
+    request: Request,
+    job_id: str,
+    fmt: str = Query(None, alias="format", description="Response format: json (default), columnar, arrow or msgpack"),
+):
+    """
+    Job status ("queued", "running", "done" or "failed"), the last finished
+    stage ("indicators", "signal", "sarima") and the results so far, in the
+    same shape as /stock. SARIMA order searches (kind "sarima_search") have
+    the single stage "search" and the selection as their result.
+    """
+    try:
+        fmt = serializers.negotiate(fmt, request.headers.get("accept"))
+    except ValueError as e:
+        return JSONResponse(status_code=406, content=format_error(str(e)))
+    job = get_job_runner().store.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content=format_error("Unknown or expired job"))
+
+    data = {k: job[k] for k in ("id", "kind", "status", "stage", "symbol", "start", "end", "created", "updated")}
+    if job["error"]:
+        data["error"] = job["error"]
+    data.update(job["result"] or {})
+    with metrics.stage("serialize"):
+        body = serializers.encode(data, fmt)
+    return Response(body, media_type=serializers.MEDIA_TYPES[fmt])
@@ -0,0 +1,165 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+from ..config import settings
+from ..services.backtest import MODES, backtest
+from ..services.executor import QueueFullError, run_analysis
+from ..services.jobs import PRIORITIES, SARIMA_SEARCH, get_job_runner
+from ..services.model_cache import get_model_cache
+from ..services.panel_model import get_panel_store, summary
+from ..services.sarima_search import CRITERIA
+from ..services.sarima_state import get_state_store
+from ..services.stock_services import retrain_xgboost, train_panel_model
+from ..utils.helper import format_error
+from .stock_routes import _busy
+from datetime import datetime, timedelta
+
+router = APIRouter(prefix="/models")
+
+
+@router.delete("/xgboost")
+def invalidate_xgboost_models(
+    symbol: str = Query(None, description="Ticker whose cached models are dropped; all models if omitted")
+):
+    """
+    Drops cached XGBoost models so the next request trains again.
+    """
+    removed = get_model_cache().invalidate(symbol.strip().upper() if symbol else None)
+    return {"symbol": symbol, "invalidated": removed}
+
+
+@router.post("/xgboost/retrain")
+async def retrain_xgboost_model(
+    symbol: str = Query(..., description="Ticker e.g., INFY, TCS"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"), 
+        description="Start date of the training window (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"), 
+        description="End date of the training window (YYYY-MM-DD)"
+    )
+):
+    """
+    Trains the XGBoost model for a window again and replaces its cached entry.
+    Trains in the analysis pool; 503 when it is full.
+    """
+    try:
+        return await run_analysis(retrain_xgboost, symbol.strip().upper(), start, end)
+    except QueueFullError as e:
+        return _busy(e)
+
+
+@router.get("/panel")
+def panel_model_info():
+    """
+    The panel signal model: training window, session, symbols, rows and
+    hold-out accuracy. Used for /stock signals when SIGNAL_MODE=panel.
+    """
+    entry = get_panel_store().get()
+    if entry is None:
+        return JSONResponse(status_code=404, content=format_error("No panel model trained yet"))
+    return dict(summary(entry), signal_mode=settings.SIGNAL_MODE)
+
+
+@router.post("/panel/train")
+async def train_panel(
+    symbols: str = Query(None, description="Comma-separated tickers; PANEL_UNIVERSE if omitted"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=settings.PANEL_TRAIN_DAYS)).strftime("%Y-%m-%d"),
+        description="Start date of the training window (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"),
+        description="End date of the training window (YYYY-MM-DD)"
+    )
+):
+    """
+    Trains the panel signal model now (it is otherwise retrained after each
+    close) and replaces the saved one. The download and the training run in
+    the analysis pool, like the scheduled training; 503 when it is full.
+    """
+    universe = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else None
+    try:
+        return await run_analysis(train_panel_model, universe, start, end)
+    except QueueFullError as e:
+        return _busy(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=format_error(str(e)))
+
+
+@router.get("/xgboost/backtest")
+def backtest_xgboost(
+    symbols: str = Query(..., description="Comma-separated tickers e.g., INFY,TCS"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=10 * 365)).strftime("%Y-%m-%d"),
+        description="Start date of the backtest window (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"),
+        description="End date of the backtest window (YYYY-MM-DD)"
+    ),
+    mode: str = Query("expanding", description=f"Training window: {' or '.join(MODES)}"),
+    train_bars: int = Query(504, description="Bars in the first (expanding) or every (rolling) training window"),
+    test_bars: int = Query(63, description="Bars tested per fold; also the step between folds"),
+    warm_rounds: int = Query(25, description="Trees added per fold when warm-starting from the previous fold")
+):
+    """
+    Walk-forward backtest of the XGBoost signal: hit rate, precision per
+    signal and PnL per fold, per symbol and overall. Folds run in parallel
+    in the analysis pool.
+    """
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not symbol_list:
+        return JSONResponse(status_code=400, content=format_error("No symbols given"))
+    if len(symbol_list) > settings.BATCH_MAX_SYMBOLS:
+        return JSONResponse(status_code=400, content=format_error(f"At most {settings.BATCH_MAX_SYMBOLS} symbols per request"))
+    try:
+        return backtest(symbol_list, start, end, mode, train_bars, test_bars, warm_rounds)
+    except QueueFullError as e:
+        return _busy(e)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=format_error(str(e)))
+
+
+@router.get("/sarima/orders")
+def sarima_orders(symbol: str = Query(..., description="Ticker e.g., INFY, TCS")):
+    """
+    SARIMA orders used for a symbol: the last search result if it has not
+    expired, otherwise the configured defaults.
+    """
+    symbol = symbol.strip().upper()
+    store = get_state_store()
+    selection = store.get_orders(symbol)
+    order, seasonal_order = store.selected_orders(symbol) or (settings.SARIMA_ORDER, settings.SARIMA_SEASONAL_ORDER)
+    return {"symbol": symbol, "order": list(order), "seasonal_order": list(seasonal_order), "search": selection}
+
+
+@router.post("/sarima/search", status_code=202)
+def search_sarima_orders(
+    symbol: str = Query(..., description="Ticker e.g., INFY, TCS"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"),
+        description="Start date of the window the candidates are fitted on (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"),
+        description="End date of the window (YYYY-MM-DD)"
+    ),
+    criterion: str = Query(None, description=f"{' or '.join(CRITERIA)}; SARIMA_SEARCH_CRITERION if omitted"),
+    budget_seconds: float = Query(
+        None, gt=0, le=settings.SARIMA_SEARCH_MAX_BUDGET_SECONDS,
+        description="Time budget; SARIMA_SEARCH_BUDGET_SECONDS if omitted"
+    )
+):
+    """
+    Queues a search of the SARIMA order grid for a symbol (in the analysis
+    pool, within the time budget) and returns its job id right away. Poll
+    GET /jobs/{id} for the pick, which is also stored for later requests.
+    """
+    if criterion is not None and criterion.lower() not in CRITERIA:
+        return JSONResponse(status_code=400, content=format_error(f"criterion must be one of: {', '.join(CRITERIA)}"))
+    job = get_job_runner().submit(
+        symbol.strip().upper(), start, end, PRIORITIES["interactive"],
+        kind=SARIMA_SEARCH, params={"criterion": criterion, "budget_seconds": budget_seconds},
+    )
+    return {"id": job["id"], "status": job["status"]}
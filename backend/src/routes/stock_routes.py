@@ -26,14 +26,79 @@
 
 #     return data
 
-from fastapi import APIRouter, Query
-from ..services.stock_services import get_stock
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from ..config import settings
+from ..services.executor import QueueFullError, get_executor
+from ..services.forecast_engine import ENGINES
+from ..services.intraday import BAR_INTERVALS, DAILY
+from ..services.progressive import result_events, stage_events, start_history
+from ..services.scheduler import get_scheduler
+from ..services.singleflight import wait
+from ..services.stock_services import get_precomputed, get_stocks, in_flight_stats, submit_stock
+from ..utils import metrics, serializers
+from ..utils.downsample import MIN_POINTS, downsample_chart
+from ..utils.helper import format_error
+from ..utils.log import get_logger, log_event
 from datetime import datetime, timedelta
 
 router = APIRouter()
+logger = get_logger(__name__)
+
+
+def _busy(exc: QueueFullError) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": "Server busy, please retry later", "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+FORMAT_DESCRIPTION = "Response format: json (default), columnar, arrow or msgpack; also negotiated from Accept"
+ENGINE_DESCRIPTION = f"Price forecast engine: {', '.join(ENGINES)}; FORECAST_ENGINE if omitted"
+INTERVAL_DESCRIPTION = (
+    f"Bar interval: {', '.join(BAR_INTERVALS)}; {DAILY} if omitted. Intraday bars come from ingested minute "
+    "files (services/intraday.py) and forecast horizons then count bars of that interval"
+)
+MAX_POINTS_DESCRIPTION = (
+    f"Downsample the chart to at most this many rows (>= {MIN_POINTS}) for display: OHLC buckets for the "
+    "candles, LTTB for the indicator lines; all bars if omitted. Forecasts and signal use every bar"
+)
+
+
+def _engine(engine: str) -> str:
+    """Validated forecast engine of a request; raises ValueError."""
+    engine = (engine or settings.FORECAST_ENGINE).strip().lower()
+    if engine not in ENGINES:
+        raise ValueError(f"forecast_engine must be one of: {', '.join(ENGINES)}")
+    return engine
+
+
+def _interval(interval: str) -> str:
+    """Validated bar interval of a request; raises ValueError."""
+    interval = (interval or DAILY).strip().lower()
+    if interval not in BAR_INTERVALS:
+        raise ValueError(f"interval must be one of: {', '.join(BAR_INTERVALS)}")
+    return interval
+
+
+def _check_max_points(max_points: int):
+    """Raises ValueError for a ``max_points`` the chart cannot be cut to."""
+    if max_points is not None and max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+
+
+def _downsampled(result: dict, max_points: int) -> dict:
+    """``result`` with its chart cut to ``max_points`` rows; a copy, the result may be shared or cached."""
+    if not max_points or "chart" not in result:
+        return result
+    return {**result, "chart": downsample_chart(result["chart"], max_points)}
+
 
 @router.get("/stock")
-def stock_endpoint(
+async def stock_endpoint(
+    request: Request,
     symbol: str = Query(..., description="Ticker e.g., INFY, TCS"),
     start: str = Query(
         (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"), 
@@ -42,20 +107,168 @@ def stock_endpoint(
     end: str = Query(
         datetime.now().strftime("%Y-%m-%d"), 
         description="End date for historical data (YYYY-MM-DD)"
-    )
+    ),
+    fmt: str = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+    forecast_engine: str = Query(None, description=ENGINE_DESCRIPTION),
+    interval: str = Query(None, description=INTERVAL_DESCRIPTION),
+    max_points: int = Query(None, description=MAX_POINTS_DESCRIPTION),
 ):
     """
     API endpoint to get live NSE + historical YFinance stock data.
     Even if one source fails, the other is returned.
     """
-    data = get_stock(symbol.strip().upper(), start,end)
-    # Optional: debug prints
-    if "live" in data:
-        print("LIVE DATA:", data["live"])
-    if "chart" in data:
-        print("HISTORICAL DATA:", data["chart"][:2])  # first 2 rows
-    if "live_error" in data:
-        print("LIVE ERROR:", data["live_error"])
-    if "chart_error" in data:
-        print("CHART ERROR:", data["chart_error"])
-    return data
+    try:
+        fmt = serializers.negotiate(fmt, request.headers.get("accept"))
+    except ValueError as e:
+        return JSONResponse(status_code=406, content=format_error(str(e)))
+    try:
+        engine = _engine(forecast_engine)
+        interval = _interval(interval)
+        _check_max_points(max_points)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=format_error(str(e)))
+    symbol = symbol.strip().upper()
+    # Watchlist symbols are usually ready from the post-close precompute (daily bars)
+    data = await run_in_threadpool(get_precomputed, symbol, start, end, engine) if interval == DAILY else None
+    if data is None:
+        try:
+            # CPU-heavy analysis runs in the process pool, shared with identical
+            # requests already in flight; fail fast when the pool is saturated
+            future = submit_stock(symbol, start, end, engine, interval)
+            data = await wait(future)
+        except QueueFullError as e:
+            return _busy(e)
+        metrics.add_stages(future.stage_timings)
+    if "error" in data:
+        log_event(logger, "stock_error", symbol=symbol, error=data["error"])
+    with metrics.stage("downsample"):
+        data = _downsampled(data, max_points)
+    with metrics.stage("serialize"):
+        body = serializers.encode(data, fmt)
+    return Response(body, media_type=serializers.MEDIA_TYPES[fmt])
+
+
+@router.get("/stock/stream")
+async def stock_stream_endpoint(
+    symbol: str = Query(..., description="Ticker e.g., INFY, TCS"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"), 
+        description="Start date for historical data (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"), 
+        description="End date for historical data (YYYY-MM-DD)"
+    ),
+    forecast_engine: str = Query(None, description=ENGINE_DESCRIPTION),
+    interval: str = Query(None, description=INTERVAL_DESCRIPTION),
+    max_points: int = Query(None, description=MAX_POINTS_DESCRIPTION),
+):
+    """
+    /stock as Server-Sent Events: the chart as soon as the indicators are
+    built, then the XGBoost signal and every forecast horizon as they
+    finish, then "done". Event names and payloads are described in
+    services/progressive.py; the chart is in the columnar layout.
+    """
+    try:
+        engine = _engine(forecast_engine)
+        interval = _interval(interval)
+        _check_max_points(max_points)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=format_error(str(e)))
+    symbol = symbol.strip().upper()
+    data = await run_in_threadpool(get_precomputed, symbol, start, end, engine) if interval == DAILY else None
+    if data is not None:
+        events = _iterate(result_events(data))
+    else:
+        try:
+            events = stage_events(start_history(symbol, start, end, interval), symbol, engine, interval)
+        except QueueFullError as e:
+            return _busy(e)
+
+    async def body():
+        async for name, payload in events:
+            if name == "chart":
+                payload = _downsampled(payload, max_points)
+            yield serializers.sse_event(name, payload)
+
+    # no caching or proxy buffering, each event must reach the client when it is sent
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(body(), media_type=serializers.SSE_MEDIA_TYPE, headers=headers)
+
+
+async def _iterate(events):
+    for event in events:
+        yield event
+
+
+@router.get("/stock/batch")
+def stock_batch_endpoint(
+    request: Request,
+    symbols: str = Query(..., description="Comma-separated tickers e.g., INFY,TCS,HDFCBANK"),
+    start: str = Query(
+        (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d"), 
+        description="Start date for historical data (YYYY-MM-DD)"
+    ),
+    end: str = Query(
+        datetime.now().strftime("%Y-%m-%d"), 
+        description="End date for historical data (YYYY-MM-DD)"
+    ),
+    fmt: str = Query(None, alias="format", description=FORMAT_DESCRIPTION),
+    forecast_engine: str = Query(None, description=ENGINE_DESCRIPTION),
+    interval: str = Query(None, description=INTERVAL_DESCRIPTION),
+    max_points: int = Query(None, description=MAX_POINTS_DESCRIPTION),
+):
+    """
+    Batch version of /stock. Data is downloaded in bulk and the analysis runs
+    in parallel. Every symbol gets its own entry in "results", failed ones
+    carry an "error" key instead of aborting the batch.
+    """
+    try:
+        fmt = serializers.negotiate(fmt, request.headers.get("accept"))
+    except ValueError as e:
+        return JSONResponse(status_code=406, content=format_error(str(e)))
+    try:
+        engine = _engine(forecast_engine)
+        interval = _interval(interval)
+        _check_max_points(max_points)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content=format_error(str(e)))
+    symbol_list = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not symbol_list:
+        return JSONResponse(status_code=400, content=format_error("No symbols given"))
+    if len(symbol_list) > settings.BATCH_MAX_SYMBOLS:
+        return JSONResponse(status_code=400, content=format_error(f"At most {settings.BATCH_MAX_SYMBOLS} symbols per batch"))
+
+    try:
+        results = get_stocks(symbol_list, start, end, engine, interval)
+    except QueueFullError as e:
+        return _busy(e)
+    failed = [r["symbol"] for r in results if "error" in r]
+    if failed:
+        log_event(logger, "batch_errors", symbols=failed)
+    with metrics.stage("downsample"):
+        results = [_downsampled(r, max_points) for r in results]
+    with metrics.stage("serialize"):
+        body = serializers.encode_many(results, fmt)
+    return Response(body, media_type=serializers.MEDIA_TYPES[fmt])
+
+
+@router.get("/stock/queue")
+def stock_queue_endpoint():
+    """
+    Analysis pool status: running and queued tasks, recent queue wait and run
+    times, and how many requests were coalesced with an identical one in flight.
+    """
+    return {**get_executor().stats(), **in_flight_stats()}
+
+
+@router.get("/stock/precompute")
+def stock_precompute_endpoint():
+    """
+    Watchlist and progress of the latest post-close precompute run.
+    """
+    scheduler = get_scheduler()
+    if scheduler is None:
+        return {"watchlist": [], "last_run": None}
+    return scheduler.status()
+
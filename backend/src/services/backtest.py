@@ -0,0 +1,263 @@
+"""
+Walk-forward backtest of the XGBoost signal.
+
+The indicator matrix of each symbol is built once (through the shared
+feature store, in a pool task like the analysis of a /stock batch) and
+every fold reads its rows from it. Folds are
+``expanding`` (training from the first row) or ``rolling`` (the last
+``train_bars`` rows), each followed by ``test_bars`` unseen rows. The
+``LABEL_HORIZON`` rows in between are left out, because their labels look
+into the test period, and SMOTE only ever sees training rows.
+
+Consecutive folds of a symbol run in the same pool task, so XGBoost is
+warm-started: a fold continues the previous fold's booster with
+``warm_rounds`` trees fitted on its own training rows instead of training
+from scratch. The tasks are spread over the analysis process pool, at
+most one per worker, like a /stock batch.
+
+Reported per fold, per symbol and overall: hit rate, precision of each
+signal, and the PnL of trading it (long on BUY, short on SELL, flat on
+HOLD, each position held for the next bar).
+"""
+import logging
+
+import numpy as np
+
+from ..utils import metrics
+from ..utils.log import get_logger, log_event
+from .executor import get_executor
+from .feature_store import SIGNAL_FEATURES
+from .panel_model import SIGNAL_LABELS
+from .stock_services import LABEL_HORIZON, fetch_historical_many, load_features, signal_labels
+
+MODES = ("expanding", "rolling")
+TRADING_DAYS = 252
+N_ESTIMATORS = 100
+# per-row arrays of a scored fold
+SCORES = ("pred", "actual", "returns")
+
+logger = get_logger(__name__)
+
+
+def dataset(view):
+    """
+    ``(X, y, next_return, dates)`` of the rows that can be scored: every
+    feature present and all ``LABEL_HORIZON`` future closes known.
+    """
+    close = np.asarray(view['Close'], dtype=float)
+    X = np.asarray(view[SIGNAL_FEATURES])
+    y = signal_labels(close)
+    next_return = np.append(close[1:] / close[:-1] - 1, np.nan)
+    rows = ~np.isnan(X).any(axis=1)
+    rows[max(len(rows) - LABEL_HORIZON, 0):] = False
+    return X[rows], y[rows], next_return[rows], np.asarray(view['Date'])[rows]
+
+
+def fold_bounds(rows: int, mode: str, train_bars: int, test_bars: int) -> list:
+    """``(train_start, train_end, test_start, test_end)`` row ranges of each fold."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of: {', '.join(MODES)}")
+    if train_bars < 1 or test_bars < 1:
+        raise ValueError("train_bars and test_bars must be positive")
+    bounds = []
+    test_start = train_bars + LABEL_HORIZON
+    while test_start < rows:
+        train_end = test_start - LABEL_HORIZON
+        train_start = 0 if mode == "expanding" else train_end - train_bars
+        bounds.append((train_start, train_end, test_start, min(test_start + test_bars, rows)))
+        test_start += test_bars
+    return bounds
+
+
+def _oversample(X, y):
+    """SMOTE on the training rows; skipped when a class is too small to interpolate."""
+    from imblearn.over_sampling import SMOTE
+    from sklearn.preprocessing import StandardScaler
+
+    smallest = np.unique(y, return_counts=True)[1].min()
+    if smallest < 2:
+        return X, y
+    # SMOTE interpolates in feature space, so it runs on standardized features
+    scaler = StandardScaler().fit(X)
+    X_res, y_res = SMOTE(k_neighbors=min(5, smallest - 1)).fit_resample(scaler.transform(X), y)
+    return scaler.inverse_transform(X_res), y_res
+
+
+def run_folds(view, bounds, warm_rounds: int) -> list:
+    """
+    Train and test consecutive folds of one symbol, warm-starting each fold
+    from the previous booster. Runs in a pool worker; ``view`` is a
+    FeatureView, so only a reference to the shared matrix is sent.
+    """
+    from xgboost import XGBClassifier
+
+    X, y, next_return, dates = dataset(view)
+    folds = []
+    booster = None
+    for train_start, train_end, test_start, test_end in bounds:
+        y_train = y[train_start:train_end] + 1  # XGBoost classes: -1->0, 0->1, 1->2
+        fold = {
+            "train": [str(dates[train_start])[:10], str(dates[train_end - 1])[:10]],
+            "test": [str(dates[test_start])[:10], str(dates[test_end - 1])[:10]],
+        }
+        if len(np.unique(y_train)) < len(SIGNAL_LABELS):
+            # the classifier needs every class; the next (larger) window may have them
+            folds.append(dict(fold, skipped="not every signal occurs in the training rows"))
+            continue
+        X_train, y_train = _oversample(X[train_start:train_end], y_train)
+        # trees do not need the standardized features, which keeps boosters comparable across folds
+        model = XGBClassifier(eval_metric='mlogloss', n_estimators=warm_rounds if booster else N_ESTIMATORS)
+        model.fit(X_train, y_train, xgb_model=booster)
+        booster = model.get_booster()
+        fold.update(
+            pred=model.predict(X[test_start:test_end]) - 1,
+            actual=y[test_start:test_end],
+            returns=next_return[test_start:test_end],
+        )
+        folds.append(fold)
+    return folds
+
+
+def plan_many(items, mode: str, train_bars: int, test_bars: int) -> list:
+    """
+    Features and fold bounds of each ``(symbol, hist)``; one pool task.
+    Each entry is ``{"symbol", "view", "bounds"}``, or ``{"symbol", "error"}``
+    for a symbol that cannot be backtested.
+    """
+    plans = []
+    for symbol, hist in items:
+        try:
+            with metrics.stage("indicators"):
+                view = load_features(symbol, hist)
+            bounds = fold_bounds(len(dataset(view)[0]), mode, train_bars, test_bars)
+        except Exception as e:
+            plans.append({"symbol": symbol, "error": str(e)})
+            continue
+        if not bounds:
+            plans.append({"symbol": symbol, "error": "Not enough history for one fold"})
+        else:
+            plans.append({"symbol": symbol, "view": view, "bounds": bounds})
+    return plans
+
+
+def run_units(units) -> list:
+    """``run_folds`` over ``(symbol, view, bounds, warm_rounds)`` units; one pool task."""
+    return [(symbol, run_folds(view, bounds, warm_rounds)) for symbol, view, bounds, warm_rounds in units]
+
+
+def signal_metrics(pred: np.ndarray, actual: np.ndarray, returns: np.ndarray) -> dict:
+    """Hit rate, precision per signal and PnL of holding the signal's position for one bar."""
+    if not len(pred):
+        return {"rows": 0}
+    precision = {}
+    for value, label in SIGNAL_LABELS.items():
+        called = pred == value
+        precision[label.split()[0]] = round(float((actual[called] == value).mean()), 4) if called.any() else None
+    pnl = pred * np.nan_to_num(returns)
+    equity = np.cumprod(1 + pnl)
+    std = pnl.std()
+    return {
+        "rows": int(len(pred)),
+        "hit_rate": round(float((pred == actual).mean()), 4),
+        "precision": precision,
+        "pnl": {
+            "total_return_%": round(float(equity[-1] - 1) * 100, 2),
+            "sharpe": round(float(pnl.mean() / std * np.sqrt(TRADING_DAYS)), 3) if std > 0 else None,
+            "max_drawdown_%": round(float((1 - equity / np.maximum.accumulate(equity)).max()) * 100, 2),
+            "exposure": round(float((pred != 0).mean()), 4),
+            "position_changes": int(np.count_nonzero(np.diff(pred, prepend=0))),
+        },
+    }
+
+
+def _metrics_of(folds) -> dict:
+    scored = [f for f in folds if "pred" in f]
+    if not scored:
+        return signal_metrics(np.empty(0), np.empty(0), np.empty(0))
+    return signal_metrics(*(np.concatenate([f[key] for f in scored]) for key in SCORES))
+
+
+def _fold_report(fold: dict) -> dict:
+    report = {k: v for k, v in fold.items() if k not in SCORES}
+    if "pred" in fold:
+        report["metrics"] = signal_metrics(*(fold[key] for key in SCORES))
+    return report
+
+
+@metrics.timed("backtest")
+def backtest(symbols, start: str = None, end: str = None, mode: str = "expanding",
+             train_bars: int = 504, test_bars: int = 63, warm_rounds: int = 25) -> dict:
+    """
+    Walk-forward backtest of the XGBoost signal for ``symbols`` over one
+    window. Raises ValueError for bad fold settings and QueueFullError if
+    the pool cannot take the tasks.
+    """
+    if warm_rounds < 1:
+        raise ValueError("warm_rounds must be positive")
+    fold_bounds(0, mode, train_bars, test_bars)  # rejects bad fold settings before any work
+    histories = fetch_historical_many(symbols, start, end)
+    executor = get_executor()
+    results, items = {}, []
+    for symbol in symbols:
+        hist = histories[symbol]
+        if hist.empty:
+            results[symbol] = {"symbol": symbol, "error": "No historical data found"}
+        else:
+            items.append((symbol, hist))
+
+    # features in the pool, at most one chunk of symbols per worker
+    plans = []
+    chunks = [items[i::executor.workers] for i in range(min(executor.workers, len(items)))]
+    futures = executor.submit_all((plan_many, (chunk, mode, train_bars, test_bars), {}) for chunk in chunks)
+    for chunk, future in zip(chunks, futures):
+        try:
+            for plan in future.result():
+                if "error" in plan:
+                    results[plan["symbol"]] = plan
+                else:
+                    plans.append((plan["symbol"], plan["view"], plan["bounds"]))
+            metrics.add_stages(future.stage_timings)
+        except Exception as e:
+            for symbol, _ in chunk:
+                results[symbol] = {"symbol": symbol, "error": str(e)}
+
+    # split each symbol's folds into consecutive groups (warm-started inside a group)
+    # so that there is about one group per worker, then one task per worker
+    groups = -(-executor.workers // max(len(plans), 1))
+    units = []
+    for symbol, view, bounds in plans:
+        size = -(-len(bounds) // min(groups, len(bounds)))
+        units.extend((symbol, view, bounds[i:i + size], warm_rounds) for i in range(0, len(bounds), size))
+    tasks = [units[i::executor.workers] for i in range(min(executor.workers, len(units)))]
+
+    folds = {symbol: [] for symbol, _, _ in plans}
+    futures = executor.submit_all((run_units, (task,), {}) for task in tasks)
+    for task, future in zip(tasks, futures):
+        try:
+            for symbol, unit_folds in future.result():
+                folds[symbol].extend(unit_folds)
+            metrics.add_stages(future.stage_timings)
+        except Exception as e:
+            for symbol, *_ in task:
+                results[symbol] = {"symbol": symbol, "error": str(e)}
+                log_event(logger, "backtest_failed", logging.WARNING, symbol=symbol, error=str(e))
+
+    scored = []
+    for symbol, symbol_folds in folds.items():
+        if symbol in results:
+            continue
+        symbol_folds.sort(key=lambda f: f["test"][0])
+        scored.extend(symbol_folds)
+        results[symbol] = {
+            "symbol": symbol,
+            "summary": _metrics_of(symbol_folds),
+            "folds": [_fold_report(f) for f in symbol_folds],
+        }
+    return {
+        "mode": mode,
+        "train_bars": train_bars,
+        "test_bars": test_bars,
+        "warm_rounds": warm_rounds,
+        "summary": _metrics_of(scored),
+        "results": [results[symbol] for symbol in symbols],
+    }
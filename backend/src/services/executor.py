@@ -0,0 +1,272 @@
+"""
+Process pool for the CPU-heavy analysis, with admission control.
+
+Analysis runs in ``ANALYSIS_WORKERS`` processes, so XGBoost and SARIMA work
+does not contend for the GIL of the API process. Each worker limits its
+BLAS/OpenMP threads to ``ANALYSIS_THREADS_PER_WORKER`` to avoid
+oversubscribing the cores. At most ``ANALYSIS_QUEUE_LIMIT`` tasks may wait
+behind the running ones; beyond that ``submit`` raises ``QueueFullError``
+right away, and the API answers 503 with a Retry-After header instead of
+letting the request time out.
+
+Workers are forked from a forkserver, a single-threaded process started
+once, rather than from the multi-threaded API process: a fork taken while
+another thread holds a lock (e.g. an import in progress) would leave the
+worker deadlocked on it. With ``PRELOAD`` the forkserver imports
+``WORKER_MODULES`` when it starts and each worker's initializer makes sure
+they are loaded, so every worker begins its first task with the analysis
+libraries loaded.
+
+A worker that dies (e.g. killed by the OS for memory) breaks the whole
+``ProcessPoolExecutor``: its running tasks fail with ``BrokenProcessPool``
+and it takes no more work. The broken pool is dropped then, and the next
+submission starts a new one.
+"""
+import asyncio
+import importlib
+import math
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ..config import settings
+from ..utils import metrics
+
+# imported once by the forkserver (with PRELOAD), inherited by every worker
+WORKER_MODULES = (
+    "scipy.signal",
+    "statsmodels.api",
+    "sklearn.preprocessing",
+    "sklearn.metrics",
+    "imblearn.over_sampling",
+    "xgboost",
+    f"{__package__}.stock_services",
+)
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+# seconds this worker's initializer spent importing WORKER_MODULES (None without PRELOAD)
+_import_seconds = None
+
+
+def import_worker_modules() -> float:
+    """Import ``WORKER_MODULES``; seconds taken, close to 0 when they were already loaded."""
+    started = time.perf_counter()
+    for name in WORKER_MODULES:
+        importlib.import_module(name)
+    return time.perf_counter() - started
+
+
+def worker_import_seconds():
+    """Seconds the worker running this task took to import ``WORKER_MODULES``; a pool task."""
+    return _import_seconds
+
+
+def _init_worker(threads: int, preload: bool = False):
+    global _import_seconds
+    from threadpoolctl import threadpool_limits
+
+    # libraries loaded later (xgboost, statsmodels are imported on first use) read the environment
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    threadpool_limits(limits=threads)
+    if preload:
+        try:
+            _import_seconds = import_worker_modules()
+        except Exception:
+            # an initializer error would break the pool; the task needing the module reports it instead
+            pass
+
+
+def _run(fn, args, kwargs):
+    started = time.time()
+    with metrics.capture() as recorder:
+        value = fn(*args, **kwargs)
+    return started, time.time(), value, (recorder.stages, recorder.events)
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class AnalysisExecutor:
+    def __init__(self, workers: int = None, queue_limit: int = None, threads_per_worker: int = None):
+        self.workers = workers or settings.ANALYSIS_WORKERS
+        self.queue_limit = queue_limit if queue_limit is not None else settings.ANALYSIS_QUEUE_LIMIT
+        self.threads_per_worker = threads_per_worker or settings.ANALYSIS_THREADS_PER_WORKER
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._completed = 0
+        self._wait_times = deque(maxlen=500)
+        self._run_times = deque(maxlen=500)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            context = None
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                if settings.PRELOAD:
+                    context.set_forkserver_preload(list(WORKER_MODULES))
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context,
+                initializer=_init_worker, initargs=(self.threads_per_worker, settings.PRELOAD)
+            )
+        return self._pool
+
+    def _discard(self, pool: ProcessPoolExecutor):
+        """Drop a broken ``pool``, so the next submission creates a new one."""
+        with self._lock:
+            if self._pool is not pool:
+                return  # already replaced
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_limit
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from the recent run times."""
+        run_avg = sum(self._run_times) / len(self._run_times) if self._run_times else 5.0
+        queued = max(0, self._pending - self.workers)
+        return max(1, math.ceil(run_avg * (queued + 1) / self.workers))
+
+    def submit_all(self, calls) -> list:
+        """
+        Submit ``(fn, args, kwargs)`` calls together: either all are admitted
+        or ``QueueFullError`` is raised and none runs. Returns plain futures
+        resolving to each call's return value; their ``stage_timings``
+        attribute holds the queue wait and the stages measured in the worker.
+        """
+        calls = list(calls)
+        with self._lock:
+            if self._pending + len(calls) > self.capacity:
+                self._rejected += 1
+                raise QueueFullError(self.retry_after())
+            self._pending += len(calls)
+            pool = self._get_pool()
+        futures = []
+        for k, (fn, args, kwargs) in enumerate(calls):
+            try:
+                futures.append(self._submit(pool, fn, args, kwargs))
+            except BaseException:
+                # _submit released the slot of call k; the calls after it never ran
+                with self._lock:
+                    self._pending -= len(calls) - k - 1
+                raise
+        return futures
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.submit_all([(fn, args, kwargs)])[0]
+
+    def _submit(self, pool, fn, args, kwargs) -> Future:
+        submitted = time.time()
+        outer = Future()
+        try:
+            inner = pool.submit(_run, fn, args, kwargs)
+        except BaseException as e:
+            self._done()
+            if isinstance(e, BrokenProcessPool):
+                self._discard(pool)
+            raise
+
+        def on_done(f):
+            self._done()
+            if f.cancelled():
+                outer.cancel()
+                return
+            error = f.exception()
+            if isinstance(error, BrokenProcessPool):
+                self._discard(pool)
+            if error is None:
+                started, finished, value, (stages, events) = f.result()
+                wait = max(0.0, started - submitted)
+                with self._lock:
+                    self._wait_times.append(wait)
+                    self._run_times.append(finished - started)
+                    self._completed += 1
+                outer.stage_timings = [("queue_wait", wait)] + stages
+                metrics.replay(outer.stage_timings, events)
+            try:
+                if error is not None:
+                    outer.set_exception(error)
+                else:
+                    outer.set_result(value)
+            except InvalidStateError:
+                pass  # the caller cancelled meanwhile
+
+        inner.add_done_callback(on_done)
+        # cancelling the caller's future cancels the task if it has not started yet
+        outer.add_done_callback(lambda f: f.cancelled() and inner.cancel())
+        return outer
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = list(self._wait_times)
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "running": min(self._pending, self.workers),
+                "queued": max(0, self._pending - self.workers),
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "wait_avg_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                "wait_p95_s": round(_percentile(waits, 0.95), 3),
+                "run_avg_s": round(sum(self._run_times) / len(self._run_times), 3) if self._run_times else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Cancel the queued tasks and stop the workers; ``wait`` blocks until the running ones finish."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+_executor = None
+_executor_guard = threading.Lock()
+
+
+def get_executor() -> AnalysisExecutor:
+    global _executor
+    with _executor_guard:
+        if _executor is None:
+            _executor = AnalysisExecutor()
+        return _executor
+
+
+def call_when_free(fn, *args, stop: threading.Event = None, **kwargs):
+    """
+    Run ``fn`` in the analysis pool and wait for the result. Background work
+    (jobs, precompute) waits for room in the queue instead of being rejected;
+    raises QueueFullError only when ``stop`` is set while waiting.
+    """
+    stop = stop or threading.Event()
+    while True:
+        try:
+            return get_executor().submit(fn, *args, **kwargs).result()
+        except QueueFullError as e:
+            if stop.wait(e.retry_after):
+                raise
+
+
+async def run_analysis(fn, *args, **kwargs):
+    """Run ``fn`` in the analysis pool from async code; raises QueueFullError when full."""
+    return await asyncio.wrap_future(get_executor().submit(fn, *args, **kwargs))
@@ -0,0 +1,223 @@
+"""
+Shared, memory-mapped feature matrices.
+
+Per symbol, the indicator frame is kept as one column-major matrix of
+``COLUMNS`` (OHLCV followed by the XGBoost features) in ``FEATURE_STORE_DTYPE``
+plus its dates, as ``.npy`` files under ``FEATURE_STORE_DIR/<symbol>/``,
+with a small ``index.json`` naming the current version. Every process maps
+the files read-only, so the API process and the pool workers share the
+pages of the OS page cache instead of each holding a copy, and consumers
+read columns, feature blocks and leading row ranges as NumPy views.
+
+New bars publish a new version: the arrays are written under fresh names,
+then ``index.json`` is swapped with ``os.replace``. Readers that mapped the
+previous version keep a valid view; that version stays on disk until the
+next swap so a view pickled to another process just before can still be
+opened there. Publishing holds a per-symbol file lock (``.lock``), so two
+workers storing the same symbol at once never remove each other's new
+version.
+"""
+import json
+import os
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no flock (Windows): publishes of one symbol are not serialized across processes
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from ..config import settings
+from ..utils.helper import safe_filename
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+SIGNAL_FEATURES = [
+    'RSI_D', 'MACD_D', 'MACD_SIGNAL_D', 'STOCH_K', 'STOCH_D', 'ADX',
+    'MFI', 'ATR', 'Volatility05', 'Volatility10', 'EMA5', 'EMA10', 'Lag1', 'Lag3', 'Lag5',
+    'RSI_W', 'MACD_W', 'MACD_SIGNAL_W', 'RSI_M', 'MACD_M', 'MACD_SIGNAL_M',
+]
+COLUMNS = OHLCV + SIGNAL_FEATURES
+INDEX = "index.json"
+LOCK = ".lock"
+
+
+@contextmanager
+def _locked(directory: str):
+    """Exclusive lock on a symbol's directory, across processes and threads (each call opens its own descriptor)."""
+    with open(os.path.join(directory, LOCK), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _open_view(directory: str, symbol: str, version: str, rows: int, first: int = 0):
+    return FeatureStore(directory).open(symbol, version).rows(first, rows)
+
+
+class FeatureView:
+    """
+    Read-only rows ``first:`` ``first + len`` (the leading ones unless
+    trimmed with ``since``) of one stored version. ``view['Close']`` is a
+    1-D view, ``view[['RSI_D', ...]]`` a 2-D one (a copy only if the columns
+    are not adjacent in ``COLUMNS``) and ``view['Date']`` the datetime64 dates.
+    Pickles as a reference to the files, not as data.
+    """
+
+    def __init__(self, directory: str, symbol: str, version: str, dates: np.ndarray, values: np.ndarray,
+                 first: int = 0):
+        self.directory = directory
+        self.symbol = symbol
+        self.version = version
+        self.dates = dates
+        self.values = values
+        self.first = first
+        self.columns = ['Date'] + COLUMNS
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.dates if key == 'Date' else self.values[:, COLUMNS.index(key)]
+        positions = [COLUMNS.index(name) for name in key]
+        first = positions[0]
+        if positions == list(range(first, first + len(positions))):
+            return self.values[:, first:first + len(positions)]
+        return self.values[:, positions]
+
+    def __reduce__(self):
+        return _open_view, (self.directory, self.symbol, self.version, self.first + len(self), self.first)
+
+    def rows(self, first: int, stop: int) -> "FeatureView":
+        return FeatureView(self.directory, self.symbol, self.version, self.dates[first:stop], self.values[first:stop],
+                           self.first + first)
+
+    def head(self, rows: int) -> "FeatureView":
+        return self.rows(0, rows)
+
+    def since(self, start) -> "FeatureView":
+        """The rows dated ``start`` or later, e.g. a window without the warm-up bars loaded before it."""
+        first = int(np.searchsorted(self.dates, np.datetime64(start, 'ns'), side='left'))
+        return self.rows(first, len(self))
+
+    def match(self, bars: pd.DataFrame):
+        """
+        The rows for ``bars`` (sorted OHLCV, NaN rows dropped) if they are a
+        prefix of this view, else None. Every stored column is causal, so the
+        features of a prefix window are the leading rows of a longer one.
+        """
+        rows = len(bars)
+        if not rows or rows > len(self):
+            return None
+        dates = bars['Date'].to_numpy(dtype='datetime64[ns]')
+        if dates[0] != self.dates[0] or dates[-1] != self.dates[rows - 1]:
+            return None
+        edges = bars[OHLCV].to_numpy(dtype=self.values.dtype)[[0, -1]]
+        if not np.array_equal(edges, self.values[[0, rows - 1], :len(OHLCV)]):
+            return None
+        return self.head(rows)
+
+
+class FeatureStore:
+    def __init__(self, directory: str = None, dtype: str = None):
+        self.directory = directory or settings.FEATURE_STORE_DIR
+        self.dtype = np.dtype(dtype or settings.FEATURE_STORE_DTYPE)
+        self._maps = {}  # symbol -> mapped view of the current version
+        self._lock = threading.Lock()
+
+    def _dir(self, symbol: str) -> str:
+        return os.path.join(self.directory, safe_filename(symbol))
+
+    def open(self, symbol: str, version: str) -> FeatureView:
+        base = os.path.join(self._dir(symbol), version)
+        dates = np.load(f"{base}.dates.npy", mmap_mode='r')
+        values = np.load(f"{base}.values.npy", mmap_mode='r')
+        return FeatureView(self.directory, symbol, version, dates, values)
+
+    def get(self, symbol: str):
+        """The current ``FeatureView`` of ``symbol``, or None."""
+        try:
+            with open(os.path.join(self._dir(symbol), INDEX)) as f:
+                index = json.load(f)
+            if index["columns"] != COLUMNS:
+                return None
+            view = self._maps.get(symbol)
+            if view is None or view.version != index["version"]:
+                view = self.open(symbol, index["version"])
+                with self._lock:
+                    self._maps[symbol] = view
+        except (FileNotFoundError, ValueError, KeyError):
+            # not stored yet, swapped twice while reading, or an older layout
+            return None
+        return view
+
+    def _save(self, directory: str, name: str, array: np.ndarray):
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array)
+            os.replace(tmp_path, os.path.join(directory, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, symbol: str, frame: pd.DataFrame) -> FeatureView:
+        """Publish the indicator ``frame`` of ``symbol`` as a new version; returns its view."""
+        directory = self._dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, INDEX)
+        values = np.asfortranarray(frame[COLUMNS].to_numpy(dtype=self.dtype))
+        # held from reading the previous version to the cleanup: a concurrent publish would
+        # otherwise see the same previous version and remove this one's files
+        with _locked(directory):
+            try:
+                with open(index_path) as f:
+                    previous = json.load(f).get("version")
+            except (FileNotFoundError, ValueError):
+                previous = None
+
+            version = uuid.uuid4().hex[:16]
+            self._save(directory, f"{version}.dates.npy", frame['Date'].to_numpy(dtype='datetime64[ns]'))
+            self._save(directory, f"{version}.values.npy", values)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"version": version, "columns": COLUMNS, "rows": len(frame), "dtype": self.dtype.name}, f)
+                os.replace(tmp_path, index_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            view = self.open(symbol, version)
+
+            keep = {INDEX, LOCK, f"{version}.dates.npy", f"{version}.values.npy"}
+            if previous:
+                keep.update((f"{previous}.dates.npy", f"{previous}.values.npy"))
+            for name in os.listdir(directory):
+                if name not in keep and not name.endswith(".tmp"):
+                    try:
+                        os.remove(os.path.join(directory, name))
+                    except OSError:
+                        # still mapped on platforms that lock mapped files; removed on a later swap
+                        pass
+        with self._lock:
+            self._maps[symbol] = view
+        return view
+
+
+_store = None
+
+
+def get_feature_store() -> FeatureStore:
+    global _store
+    if _store is None:
+        _store = FeatureStore()
+    return _store
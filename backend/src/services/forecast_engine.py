@@ -0,0 +1,163 @@
+"""
+Fast price forecasts, an alternative to the SARIMA fit.
+
+``ar``
+    Least-squares AR(``FORECAST_AR_LAGS``) with an intercept on the daily
+    log returns; the returns are forecast recursively and compounded from
+    the latest close.
+``ets``
+    Holt's additive damped-trend exponential smoothing on the log closes.
+    ``(alpha, beta, phi)`` are picked per series from a fixed grid by the
+    sum of squared one-step errors; every grid point runs in the same pass.
+
+Both fit a whole batch in one array computation: the last
+``FORECAST_FIT_BARS`` closes of every series are stacked right-aligned into
+one NaN-padded ``(series, bars)`` array, so there is one batched
+least-squares solve (or one smoothing pass) per batch instead of one fit
+per symbol. The results have the layout of ``predict_with_sarima``; AIC and
+BIC come from the Gaussian likelihood of the one-step errors on the log
+scale, so they compare candidates of one engine, not engines.
+"""
+import numpy as np
+
+from ..config import settings
+from ..utils import metrics
+
+ENGINES = ("sarima", "ar", "ets")
+FAST_ENGINES = ("ar", "ets")
+
+# smoothing grid of the ets engine
+ETS_ALPHAS = np.linspace(0.05, 0.95, 10)
+ETS_BETAS = np.array([0.0, 0.02, 0.05, 0.1, 0.2])
+ETS_PHIS = np.array([0.8, 0.9, 0.95, 0.98, 1.0])
+# keeps the normal equations solvable for a constant or very short series
+RIDGE = 1e-10
+
+
+def min_bars(engine: str) -> int:
+    """Closes a series needs for ``engine``."""
+    return 2 * settings.FORECAST_AR_LAGS + 4 if engine == "ar" else 10
+
+
+def stack(series) -> np.ndarray:
+    """The last ``FORECAST_FIT_BARS`` values of each series, right-aligned in one NaN-padded array."""
+    series = [np.asarray(s, dtype=float)[-settings.FORECAST_FIT_BARS:] for s in series]
+    width = max(len(s) for s in series)
+    out = np.full((len(series), width), np.nan)
+    for row, values in zip(out, series):
+        row[width - len(values):] = values
+    return out
+
+
+def _information_criteria(sse: np.ndarray, rows: np.ndarray, params: int):
+    """AIC and BIC of Gaussian one-step errors; ``params`` counts the error variance too."""
+    llf = -rows / 2 * (np.log(2 * np.pi * sse / rows) + 1)
+    return 2 * params - 2 * llf, params * np.log(rows) - 2 * llf
+
+
+def fit_ar(log_close: np.ndarray, lags: int, steps: int):
+    """
+    Batched AR fit on the log returns of ``log_close`` (series x bars).
+    Returns the log-price paths for ``steps`` bars ahead, AIC and BIC.
+    """
+    r = np.diff(log_close, axis=1)
+    series, width = r.shape
+    y = r[:, lags:]
+    X = np.stack([np.ones_like(y)] + [r[:, lags - k:width - k] for k in range(1, lags + 1)], axis=2)
+    valid = ~(np.isnan(y) | np.isnan(X).any(axis=2))
+    X = np.where(valid[..., None], X, 0.0)
+    y = np.where(valid, y, 0.0)
+
+    gram = X.transpose(0, 2, 1) @ X + RIDGE * np.eye(lags + 1)
+    coef = np.linalg.solve(gram, np.einsum('snk,sn->sk', X, y)[..., None])[..., 0]
+    sse = (((y - np.einsum('snk,sk->sn', X, coef)) * valid) ** 2).sum(axis=1)
+    aic, bic = _information_criteria(sse, valid.sum(axis=1), lags + 2)
+
+    recent = r[:, :-lags - 1:-1]  # latest return first
+    path = np.empty((series, steps))
+    for step in range(steps):
+        path[:, step] = coef[:, 0] + (coef[:, 1:] * recent).sum(axis=1)
+        recent = np.concatenate([path[:, step:step + 1], recent[:, :-1]], axis=1)
+    return log_close[:, -1:] + np.cumsum(path, axis=1), aic, bic
+
+
+def fit_ets(log_close: np.ndarray, steps: int):
+    """
+    Batched damped-trend smoothing of ``log_close`` (series x bars), every
+    grid point at once. Returns the log-price paths of each series' best
+    grid point for ``steps`` bars ahead, AIC and BIC.
+    """
+    alpha, beta, phi = (g.ravel() for g in np.meshgrid(ETS_ALPHAS, ETS_BETAS, ETS_PHIS, indexing='ij'))
+    series = log_close.shape[0]
+    level = np.full((series, len(alpha)), np.nan)
+    trend = np.zeros_like(level)
+    sse = np.zeros_like(level)
+    rows = np.zeros(series)
+    for t in range(log_close.shape[1]):
+        y = log_close[:, t:t + 1]
+        expected = level + phi * trend
+        error = y - expected
+        scored = ~np.isnan(error)
+        sse += np.where(scored, error ** 2, 0.0)
+        rows += scored[:, 0]
+        new_level = expected + alpha * error
+        trend = np.where(scored, beta * (new_level - level) + (1 - beta) * phi * trend, trend)
+        # the first close of a series starts its level
+        level = np.where(scored, new_level, np.where(np.isnan(level), y, level))
+
+    best = sse.argmin(axis=1)
+    pick = np.arange(series)
+    damping = np.cumsum(phi[best, None] ** np.arange(1, steps + 1), axis=1)
+    path = level[pick, best, None] + damping * trend[pick, best, None]
+    aic, bic = _information_criteria(sse[pick, best], rows, 4)
+    return path, aic, bic
+
+
+def horizon_results(forecast, latest_close, horizons, aic, bic) -> dict:
+    """``{"<h>_Day": {...}}`` for a forecast path whose first value is one bar ahead."""
+    results = {}
+    for horizon in horizons:
+        predicted_price = forecast[horizon - 1]
+        pred_return = ((predicted_price - latest_close) / latest_close) * 100
+        error_pct = abs(predicted_price - latest_close) / latest_close * 100
+        results[f"{horizon}_Day"] = {
+            "Predicted_Price": round(predicted_price, 2),
+            "Latest_Close": round(latest_close, 2),
+            "Predicted_Return_%": round(pred_return, 2),
+            # Renaming to 'Predicted_Deviation_%' for clarity on current data
+            "Predicted_Deviation_%": round(error_pct, 2),
+            "AIC": round(aic, 2),
+            "BIC": round(bic, 2)
+        }
+    return results
+
+
+@metrics.timed("forecast")
+def forecast_many(closes: dict, engine: str, horizons=settings.SARIMA_HORIZONS) -> dict:
+    """
+    Predictions of ``engine`` for ``{symbol: closes}`` in one batched fit.
+    Symbols with fewer than ``min_bars(engine)`` closes are left out.
+    """
+    if engine not in FAST_ENGINES:
+        raise ValueError(f"engine must be one of: {', '.join(FAST_ENGINES)}")
+    closes = {symbol: np.asarray(c, dtype=float) for symbol, c in closes.items() if len(c) >= min_bars(engine)}
+    if not closes:
+        return {}
+    log_close = np.log(stack(closes.values()))
+    steps = max(horizons)
+    if engine == "ar":
+        paths, aic, bic = fit_ar(log_close, settings.FORECAST_AR_LAGS, steps)
+    else:
+        paths, aic, bic = fit_ets(log_close, steps)
+    return {
+        symbol: horizon_results(np.exp(path), c[-1], horizons, a, b)
+        for (symbol, c), path, a, b in zip(closes.items(), paths, aic, bic)
+    }
+
+
+def forecast(close, engine: str, horizons=settings.SARIMA_HORIZONS) -> dict:
+    """``forecast_many`` for one series; raises ValueError if it is too short."""
+    result = forecast_many({None: close}, engine, horizons)
+    if not result:
+        raise ValueError("Not enough history for the forecast")
+    return result[None]
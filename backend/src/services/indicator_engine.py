@@ -0,0 +1,585 @@
+"""
+Incremental indicator engine.
+
+Keeps the per-symbol state behind every column of ``build_indicators``
+(EMA accumulators, Wilder/RMA smoothing, rolling windows and the
+higher-timeframe indicators of ``timeframes.FEATURES``) and updates it in O(1) per new bar, so a refresh after
+one new daily bar does not recompute the whole history. Intraday series pass
+the ``timeframes.features_for`` of their interval instead.
+
+A window the engine has no state for (a cold symbol, or a new window
+start) is computed by the vectorized ``build_indicators`` and the state is
+seeded from its bars in one vectorized pass (``seed``); only bars that come
+after the saved state go through the per-bar ``update``.
+
+Output matches ``build_indicators`` on the same bars to within
+``MATCH_TOLERANCE`` (relative, ``|a - b| <= tol * max(1, |b|)``, see
+``max_deviation``); the only differences are floating point rounding of
+the recursive forms.
+"""
+import copy
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..config import settings
+from . import indicator_kernels as kernels
+from .timeframes import FEATURES, feature_columns, grouped, period_key, period_keys
+
+MATCH_TOLERANCE = 1e-8
+
+NAN = float('nan')
+EPS = np.finfo(float).eps
+
+INDICATOR_COLUMNS = [
+    'RSI_D', 'MACD_D', 'MACD_SIGNAL_D', 'ADX', 'STOCH_K', 'STOCH_D', 'ATR', 'MFI',
+    'Return', 'Lag1', 'Lag3', 'Lag5', 'Volatility10', 'Volatility05', 'EMA5', 'EMA10',
+] + feature_columns()
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+# dtype of the indicator columns of a frame; the kernels and the state always work in float64
+FRAME_DTYPE = np.float32 if settings.LEAN_MODE else np.float64
+
+
+def _isnan(x):
+    return x != x
+
+
+def _last(values):
+    return values[-1] if len(values) else NAN
+
+
+def _diff(x):
+    """``x[t] - x[t-1]``, NaN for the first bar."""
+    out = np.full_like(x, np.nan)
+    out[1:] = x[1:] - x[:-1]
+    return out
+
+
+class _EWM:
+    """pandas ``ewm(alpha=..., adjust=True).mean()``; NaN inputs decay the weights like pandas does."""
+
+    def __init__(self, alpha, min_periods=0):
+        self.decay = 1.0 - alpha
+        self.min_periods = min_periods
+        self.num = 0.0
+        self.den = 0.0
+        self.nobs = 0
+
+    def _step(self, x):
+        if _isnan(x):
+            return self.num * self.decay, self.den * self.decay, self.nobs
+        return x + self.decay * self.num, 1.0 + self.decay * self.den, self.nobs + 1
+
+    def peek(self, x):
+        num, den, nobs = self._step(x)
+        return num / den if nobs and nobs >= self.min_periods else NAN
+
+    def push(self, x):
+        self.num, self.den, self.nobs = self._step(x)
+        return self.num / self.den if self.nobs and self.nobs >= self.min_periods else NAN
+
+    def seed(self, x):
+        """State after pushing every value of ``x`` into a fresh smoother; returns the last ``push`` value."""
+        valid = ~np.isnan(x)
+        weights = self.decay ** np.arange(len(x) - 1, -1, -1, dtype=float)[valid]
+        self.num = float(weights @ x[valid])
+        self.den = float(weights.sum())
+        self.nobs = int(valid.sum())
+        return self.num / self.den if self.nobs and self.nobs >= self.min_periods else NAN
+
+
+def _rma(length):
+    # pandas_ta rma: ewm(alpha=1/length, min_periods=length).mean()
+    return _EWM(1.0 / length, min_periods=length)
+
+
+class _SeededEMA:
+    """pandas_ta ``ema``: SMA of the first ``length`` values, then a recursive EMA (adjust=False)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.count = 0
+        self.total = 0.0
+        self.value = NAN
+
+    def peek(self, x):
+        if self.count + 1 < self.length:
+            return NAN
+        if self.count + 1 == self.length:
+            return (self.total + x) / self.length
+        return (1.0 - self.alpha) * self.value + self.alpha * x
+
+    def push(self, x):
+        value = self.peek(x)
+        self.count += 1
+        if self.count <= self.length:
+            self.total += x
+        self.value = value
+        return value
+
+    def seed(self, x):
+        self.count = len(x)
+        self.total = float(x[:self.length].sum())
+        self.value = float(kernels.seeded_ema(x, self.length)[-1]) if self.count >= self.length else NAN
+        return self.value
+
+
+class _Window:
+    """Fixed-size rolling window; ``full`` once it holds ``size`` values."""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque(maxlen=size)
+
+    def push(self, x):
+        self.values.append(x)
+
+    def seed(self, x):
+        self.values = deque(x[-self.size:].tolist(), maxlen=self.size)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+
+class _MACD:
+    def __init__(self, fast, slow, signal):
+        self.fast = _SeededEMA(fast)
+        self.slow = _SeededEMA(slow)
+        self.signal = _SeededEMA(signal)
+
+    def push(self, close):
+        macd = self.fast.push(close) - self.slow.push(close)
+        signal = self.signal.push(macd) if not _isnan(macd) else NAN
+        # pandas_ta column order: MACD, histogram, signal
+        return macd, macd - signal, signal
+
+    def seed(self, close):
+        macd = self.fast.seed(close) - self.slow.seed(close)
+        signal = NAN
+        if not _isnan(macd):
+            line = kernels.seeded_ema(close, self.fast.length) - kernels.seeded_ema(close, self.slow.length)
+            signal = self.signal.seed(line[~np.isnan(line)])
+        return macd, macd - signal, signal
+
+
+class _RSI:
+    def __init__(self, length=14):
+        self.prev = NAN
+        self.gain = _rma(length)
+        self.loss = _rma(length)
+
+    def _split(self, close):
+        diff = close - self.prev
+        if _isnan(diff):
+            return NAN, NAN
+        return max(diff, 0.0), min(diff, 0.0)
+
+    @staticmethod
+    def _value(gain, loss):
+        return 100 * gain / (gain + abs(loss))
+
+    def push(self, close):
+        up, down = self._split(close)
+        value = self._value(self.gain.push(up), self.loss.push(down))
+        self.prev = close
+        return value
+
+    def seed(self, close):
+        diff = _diff(close)
+        value = self._value(self.gain.seed(np.maximum(diff, 0.0)), self.loss.seed(np.minimum(diff, 0.0)))
+        self.prev = _last(close)
+        return value
+
+
+_INDICATORS = {
+    'rsi': _RSI,
+    'macd': _MACD,
+}
+
+
+class _Timeframe:
+    """The indicators of one ``timeframes.FEATURES`` entry, as of the last completed period."""
+
+    def __init__(self, timeframe, columns):
+        self.timeframe = timeframe
+        self.indicators = [
+            (_INDICATORS[indicator](**dict(params)), outputs)
+            for (indicator, params), outputs in grouped(columns).items()
+        ]
+        self.period = None
+        self.close = NAN
+        self.values = dict.fromkeys(columns, NAN)
+
+    def update(self, date, close):
+        period = period_key(date, self.timeframe)
+        if period != self.period:
+            if self.period is not None:
+                # previous period is complete: its last close moves the indicators
+                for indicator, outputs in self.indicators:
+                    values = indicator.push(self.close)
+                    values = values if isinstance(values, tuple) else (values,)
+                    for output, column in outputs.items():
+                        self.values[column] = values[output]
+            self.period = period
+        self.close = close
+        return self.values
+
+    def seed(self, dates, close):
+        """State after ``update`` with every bar; only completed periods reach the indicators."""
+        keys = period_keys(dates, self.timeframe)
+        last = np.flatnonzero(np.diff(keys))  # last bar of every period but the current one
+        if len(last):
+            for indicator, outputs in self.indicators:
+                values = indicator.seed(close[last])
+                values = values if isinstance(values, tuple) else (values,)
+                for output, column in outputs.items():
+                    self.values[column] = values[output]
+        self.period = int(keys[-1])
+        self.close = float(close[-1])
+
+
+class _State:
+    def __init__(self, features):
+        self.prev_close = NAN
+        self.prev_high = NAN
+        self.prev_low = NAN
+        self.prev_tp = NAN
+        self.rsi = _RSI(14)
+        self.macd = _MACD(12, 26, 9)
+        self.atr = _rma(14)
+        self.dm_pos = _rma(14)
+        self.dm_neg = _rma(14)
+        self.adx = _rma(14)
+        self.highs = _Window(14)
+        self.lows = _Window(14)
+        self.stoch = _Window(3)
+        self.stoch_k = _Window(3)
+        self.mf_pos = _Window(14)
+        self.mf_neg = _Window(14)
+        self.returns = _Window(10)
+        self.ema5 = _EWM(2.0 / 6)
+        self.ema10 = _EWM(2.0 / 11)
+        self.timeframes = [_Timeframe(timeframe, columns) for timeframe, columns in features.items()]
+
+    def seed(self, dates, open_, high, low, close, volume):
+        """State after ``IndicatorEngine.update`` with every bar (float64 arrays), computed in one vectorized pass."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.rsi.seed(close)
+            self.macd.seed(close)
+
+            # true range / directional movement, as update() builds them bar by bar
+            prev_close = np.concatenate([[NAN], close[:-1]])
+            hl = high - low
+            hl[hl == 0] = EPS
+            tr = np.maximum.reduce([np.abs(hl), np.abs(high - prev_close), np.abs(prev_close - low)])
+            up, down = _diff(high), -_diff(low)
+            up_dm = np.where((up > down) & (up > 0), up, 0.0)
+            down_dm = np.where((down > up) & (down > 0), down, 0.0)
+            up_dm[np.abs(up_dm) < EPS] = 0.0
+            down_dm[np.abs(down_dm) < EPS] = 0.0
+            up_dm[0] = down_dm[0] = NAN
+            atr = kernels.rma(tr, 14)
+            k = np.where(atr != 0, 100 / atr, NAN)
+            dmp = k * kernels.rma(up_dm, 14)
+            dmn = k * kernels.rma(down_dm, 14)
+            dx = np.where(dmp + dmn != 0, 100 * np.abs(dmp - dmn) / (dmp + dmn), NAN)
+            self.atr.seed(tr)
+            self.dm_pos.seed(up_dm)
+            self.dm_neg.seed(down_dm)
+            self.adx.seed(dx)
+
+            self.highs.seed(high)
+            self.lows.seed(low)
+            if len(close) >= self.highs.size:
+                size = self.highs.size
+                lowest = sliding_window_view(low, size).min(axis=-1)
+                rng = sliding_window_view(high, size).max(axis=-1) - lowest
+                raw = 100 * (close[size - 1:] - lowest) / np.where(rng != 0, rng, EPS)
+                self.stoch.seed(raw)
+                if len(raw) >= self.stoch.size:
+                    stoch_k = sliding_window_view(raw, self.stoch.size).sum(axis=-1) / self.stoch.size
+                    self.stoch_k.seed(stoch_k[~np.isnan(stoch_k)])
+
+            tp = (high + low + close) / 3
+            change = _diff(tp)
+            self.mf_pos.seed(np.where(change > 0, tp * volume, 0.0))
+            self.mf_neg.seed(np.where(change < 0, tp * volume, 0.0))
+
+            self.returns.seed(close / prev_close - 1)
+            self.ema5.seed(close)
+            self.ema10.seed(close)
+
+        for tf in self.timeframes:
+            tf.seed(dates, close)
+        self.prev_close, self.prev_high, self.prev_low, self.prev_tp = close[-1], high[-1], low[-1], tp[-1]
+
+
+def _rolling_std(window, n):
+    values = list(window.values)[-n:]
+    if len(values) < n or any(_isnan(v) for v in values):
+        return NAN
+    mean = sum(values) / n
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+
+
+def _mean_if_full(window):
+    if not window.full or any(_isnan(v) for v in window.values):
+        return NAN
+    return sum(window.values) / window.size
+
+
+class IndicatorEngine:
+    """Streaming equivalent of ``build_indicators`` for one symbol and window start."""
+
+    def __init__(self, features=None):
+        self.lock = threading.Lock()
+        self._state = _State(FEATURES if features is None else features)
+        self._rollback = None
+        self._capacity = 0
+        self._n = 0
+        self._dates = np.empty(0, dtype='datetime64[ns]')
+        self._out = {}
+
+    @property
+    def first_date(self):
+        return self._dates[0] if self._n else None
+
+    @property
+    def last_date(self):
+        return self._dates[self._n - 1] if self._n else None
+
+    def __len__(self):
+        return self._n
+
+    def _grow(self, size: int = 0):
+        capacity = max(256, self._capacity * 2, size)
+        self._dates = np.resize(self._dates, capacity)
+        for name in OHLCV + INDICATOR_COLUMNS:
+            buf = np.full(capacity, np.nan)
+            if name in self._out:
+                buf[:self._n] = self._out[name][:self._n]
+            self._out[name] = buf
+        self._capacity = capacity
+
+    def update(self, date, open_, high, low, close, volume):
+        """Apply one new bar; returns nothing, read results with ``frame()``."""
+        if _isnan(close) or _isnan(volume):
+            return
+        if self._n == self._capacity:
+            self._grow()
+        st = self._state
+        row = self._n
+        out = self._out
+        ts = pd.Timestamp(date)
+        self._dates[row] = np.datetime64(ts, 'ns')
+        for name, value in zip(OHLCV, (open_, high, low, close, volume)):
+            out[name][row] = value
+
+        # ---- momentum ----
+        out['RSI_D'][row] = st.rsi.push(close)
+        out['MACD_D'][row], out['MACD_SIGNAL_D'][row], _ = st.macd.push(close)
+
+        # ---- true range / ATR / ADX ----
+        if _isnan(st.prev_close):
+            tr = up_dm = down_dm = NAN
+        else:
+            hl = high - low
+            if hl == 0:
+                hl = EPS
+            tr = max(abs(hl), abs(high - st.prev_close), abs(st.prev_close - low))
+            up = high - st.prev_high
+            down = st.prev_low - low
+            up_dm = up if (up > down and up > 0) else 0.0
+            down_dm = down if (down > up and down > 0) else 0.0
+            up_dm = 0.0 if abs(up_dm) < EPS else up_dm
+            down_dm = 0.0 if abs(down_dm) < EPS else down_dm
+        atr = st.atr.push(tr)
+        out['ATR'][row] = atr
+        k = 100 / atr if atr else NAN
+        dmp = k * st.dm_pos.push(up_dm)
+        dmn = k * st.dm_neg.push(down_dm)
+        dx = 100 * abs(dmp - dmn) / (dmp + dmn) if (dmp + dmn) else NAN
+        out['ADX'][row] = st.adx.push(dx)
+
+        # ---- stochastic ----
+        st.highs.push(high)
+        st.lows.push(low)
+        if st.highs.full:
+            lowest, highest = min(st.lows.values), max(st.highs.values)
+            rng = highest - lowest
+            st.stoch.push(100 * (close - lowest) / (rng if rng != 0 else EPS))
+            stoch_k = _mean_if_full(st.stoch)
+            if not _isnan(stoch_k):
+                st.stoch_k.push(stoch_k)
+            out['STOCH_K'][row] = stoch_k
+            out['STOCH_D'][row] = _mean_if_full(st.stoch_k)
+        else:
+            out['STOCH_K'][row] = out['STOCH_D'][row] = NAN
+
+        # ---- money flow ----
+        tp = (high + low + close) / 3
+        flow = tp * volume
+        st.mf_pos.push(flow if tp - st.prev_tp > 0 else 0.0)
+        st.mf_neg.push(flow if tp - st.prev_tp < 0 else 0.0)
+        if st.mf_pos.full:
+            psum, nsum = sum(st.mf_pos.values), sum(st.mf_neg.values)
+            out['MFI'][row] = 100 * psum / (psum + nsum) if (psum + nsum) else NAN
+        else:
+            out['MFI'][row] = NAN
+
+        # ---- returns, lags, volatility ----
+        ret = close / st.prev_close - 1
+        lags = list(st.returns.values)
+        out['Return'][row] = ret
+        out['Lag1'][row] = lags[-1] if len(lags) >= 1 else NAN
+        out['Lag3'][row] = lags[-3] if len(lags) >= 3 else NAN
+        out['Lag5'][row] = lags[-5] if len(lags) >= 5 else NAN
+        st.returns.push(ret)
+        out['Volatility10'][row] = _rolling_std(st.returns, 10)
+        out['Volatility05'][row] = _rolling_std(st.returns, 5)
+        out['EMA5'][row] = st.ema5.push(close)
+        out['EMA10'][row] = st.ema10.push(close)
+
+        # ---- higher timeframes: completed periods only, so earlier rows never change ----
+        for tf in st.timeframes:
+            for name, value in tf.update(ts, close).items():
+                out[name][row] = value
+
+        st.prev_close, st.prev_high, st.prev_low, st.prev_tp = close, high, low, tp
+        self._n += 1
+
+    def extend(self, df: pd.DataFrame):
+        """Apply the bars of ``df`` (sorted by Date) in order."""
+        rows = df[['Date'] + OHLCV].itertuples(index=False, name=None)
+        last = len(df) - 1
+        for i, bar in enumerate(rows):
+            if i == last:
+                # keep the state before the newest bar so an intraday revision of it can be replayed
+                self._rollback = (copy.deepcopy(self._state), self._n)
+            self.update(*bar)
+
+    def seed(self, df: pd.DataFrame, frame: pd.DataFrame):
+        """
+        Take over the bars of ``df`` with the rows ``build_indicators``
+        computed for them (``frame``), and set the state to what
+        ``extend(df)`` would have left, without the per-bar loop.
+        """
+        n = len(df)
+        if not n:
+            return
+        if n > self._capacity:
+            self._grow(n)
+        self._dates[:n] = df['Date'].to_numpy(dtype='datetime64[ns]')
+        for name in OHLCV + INDICATOR_COLUMNS:
+            self._out[name][:n] = frame[name].to_numpy(dtype=float)
+        self._state.seed(self._dates[:n], *(df[name].to_numpy(dtype=float) for name in OHLCV))
+        self._n = n
+        self._rollback = None
+
+    def revise_last(self, df: pd.DataFrame):
+        """Replace the newest bar with the first row of ``df`` and apply the remaining rows."""
+        state, n = self._rollback
+        self._state = copy.deepcopy(state)
+        self._n = n
+        self.extend(df)
+
+    def same_bar(self, row: int, bar) -> bool:
+        return all(self._out[name][row] == bar[name] for name in OHLCV)
+
+    def frame(self) -> pd.DataFrame:
+        """Materialize the same frame ``build_indicators`` returns for the bars seen so far."""
+        n = self._n
+        data = {'Date': self._dates[:n].copy()}
+        for name in OHLCV:
+            data[name] = self._out[name][:n].copy()
+        for name in INDICATOR_COLUMNS:
+            data[name] = self._out[name][:n].astype(FRAME_DTYPE)
+        # the arrays are fresh copies already; the frame takes them as they are
+        df = pd.DataFrame(data, copy=False)
+        df.ffill(inplace=True)
+        return df
+
+
+def ohlcv_bars(df: pd.DataFrame) -> pd.DataFrame:
+    """``df`` with datetime dates, in date order, without bars missing a close or volume; the caller's frame is left alone."""
+    df = df.assign(Date=pd.to_datetime(df['Date']))
+    if not df['Date'].is_monotonic_increasing:
+        df = df.sort_values('Date')
+    return df.dropna(subset=['Close', 'Volume']).reset_index(drop=True)
+
+
+def max_deviation(frame: pd.DataFrame, expected: pd.DataFrame) -> float:
+    """
+    Largest relative difference ``|a - b| / max(1, |b|)`` between the
+    indicator columns of two frames of the same bars; ``inf`` where only
+    one of them has a value. Within ``MATCH_TOLERANCE`` for the engine and
+    ``build_indicators``.
+    """
+    worst = 0.0
+    for name in INDICATOR_COLUMNS:
+        a = frame[name].to_numpy(dtype=float)
+        b = expected[name].to_numpy(dtype=float)
+        if len(a) != len(b) or (np.isnan(a) != np.isnan(b)).any():
+            return math.inf
+        if len(a):
+            worst = max(worst, float(np.nanmax(np.abs(a - b) / np.maximum(1.0, np.abs(b)), initial=0.0)))
+    return worst
+
+
+_engines = OrderedDict()
+_engines_guard = threading.Lock()
+
+
+def update_indicators(symbol: str, df: pd.DataFrame, build_batch, features=None) -> pd.DataFrame:
+    """
+    Incremental front-end to ``build_indicators``. Reuses the engine kept for
+    ``symbol`` when ``df`` starts on the same bar and extends the bars it has
+    already seen; a revised newest bar (intraday refresh) is replayed from
+    the saved state. Older windows of the same series are answered by
+    ``build_batch`` without touching the state; anything else (a cold
+    symbol or a new window start) is computed by ``build_batch`` too and a
+    new state is seeded from it.
+    ``df`` holds the bars as ``ohlcv_bars`` returns them; ``features`` are
+    the higher-timeframe features of their interval (``FEATURES`` if
+    omitted), and ``symbol`` must tell series of different intervals apart.
+    """
+    if df.empty:
+        return build_batch(df)
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+
+    with _engines_guard:
+        engine = _engines.get(symbol)
+        if engine is not None:
+            _engines.move_to_end(symbol)
+
+    if engine is not None:
+        with engine.lock:
+            if engine.first_date == dates[0]:
+                if dates[-1] < engine.last_date:
+                    return build_batch(df)
+                pos = len(engine) - 1
+                if pos < len(dates) and dates[pos] == engine.last_date:
+                    if engine.same_bar(pos, df.iloc[pos]):
+                        if pos + 1 < len(df):
+                            engine.extend(df.iloc[pos + 1:])
+                    else:
+                        engine.revise_last(df.iloc[pos:])
+                    return engine.frame()
+
+    frame = build_batch(df)
+    engine = IndicatorEngine(features)
+    with engine.lock:
+        # the newest bar goes through update(), which keeps the state before it for revise_last
+        engine.seed(df.iloc[:-1], frame.iloc[:-1])
+        engine.extend(df.iloc[-1:])
+    with _engines_guard:
+        _engines[symbol] = engine
+        while len(_engines) > settings.INDICATOR_ENGINE_MAX_SYMBOLS:
+            _engines.popitem(last=False)
+    return frame
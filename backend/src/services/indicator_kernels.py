@@ -0,0 +1,198 @@
+"""
+Vectorized NumPy indicator kernels.
+
+Drop-in replacements for the pandas_ta indicators used by ``build_indicators``.
+Every kernel takes contiguous float arrays shaped ``(time,)`` or
+``(symbols, time)`` and works along the last axis, so a whole universe is
+computed in one call. Rows of a 2-D block may start with NaN padding
+(symbols with shorter histories); interior gaps are not supported.
+
+Recursive smoothers (EMA, RMA) run through ``scipy.signal.lfilter``, rolling
+windows through ``sliding_window_view``. Results match pandas_ta 0.3.14b to
+floating point rounding.
+"""
+import functools
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+EPS = np.finfo(float).eps
+
+
+def lfilter(b, a, x, axis=-1):
+    """``scipy.signal.lfilter``; scipy.signal is imported on first use, it takes over a second."""
+    from scipy.signal import lfilter
+
+    return lfilter(b, a, x, axis=axis)
+
+
+def _time_axis(func):
+    """Accept 1-D or 2-D inputs; compute on 2-D float64 and give back the input rank."""
+    @functools.wraps(func)
+    def wrapper(*arrays, **kwargs):
+        one_d = np.ndim(arrays[0]) == 1
+        arrays = [np.atleast_2d(np.ascontiguousarray(a, dtype=np.float64)) if np.ndim(a) else a for a in arrays]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = func(*arrays, **kwargs)
+        if one_d:
+            return tuple(o[0] for o in out) if isinstance(out, tuple) else out[0]
+        return out
+    return wrapper
+
+
+def _shift(x, periods=1):
+    out = np.full_like(x, np.nan)
+    out[:, periods:] = x[:, :-periods]
+    return out
+
+
+def _pad_front(values, window):
+    out = np.full(values.shape[:-1] + (values.shape[-1] + window - 1,), np.nan)
+    out[..., window - 1:] = values
+    return out
+
+
+def _rolling(x, window, reduce):
+    # NaN anywhere in the window gives NaN, like pandas with min_periods=window
+    if x.shape[-1] < window:
+        return np.full_like(x, np.nan)
+    return _pad_front(reduce(sliding_window_view(x, window, axis=-1), axis=-1), window)
+
+
+def _first_valid(x):
+    valid = ~np.isnan(x)
+    first = valid.argmax(axis=-1)
+    first[~valid.any(axis=-1)] = x.shape[-1]
+    return first
+
+
+def _non_zero_range(high, low):
+    # pandas_ta non_zero_range: add eps to the whole series if any range is exactly zero
+    diff = high - low
+    return diff + EPS * (diff == 0).any(axis=-1, keepdims=True)
+
+
+@_time_axis
+def ewm_mean(x, alpha, min_periods=0):
+    """pandas ``ewm(alpha=alpha, adjust=True).mean()``."""
+    mask = ~np.isnan(x)
+    a = [1.0, -(1.0 - alpha)]
+    num = lfilter([1.0], a, np.where(mask, x, 0.0), axis=-1)
+    den = lfilter([1.0], a, mask.astype(np.float64), axis=-1)
+    out = num / den
+    out[np.cumsum(mask, axis=-1) < max(min_periods, 1)] = np.nan
+    return out
+
+
+@_time_axis
+def ema(x, span):
+    """pandas ``ewm(span=span).mean()``, as used for EMA5/EMA10."""
+    return ewm_mean(x, 2.0 / (span + 1))
+
+
+@_time_axis
+def rma(x, length):
+    """pandas_ta ``rma`` (Wilder smoothing)."""
+    return ewm_mean(x, 1.0 / length, min_periods=length)
+
+
+@_time_axis
+def seeded_ema(x, length):
+    """pandas_ta ``ema``: SMA of the first ``length`` values, then a recursive EMA (adjust=False)."""
+    alpha = 2.0 / (length + 1)
+    n_rows, n = x.shape
+    rows = np.arange(n_rows)
+    seed_at = _first_valid(x) + length - 1
+    has_seed = seed_at < n
+    csum = np.cumsum(np.nan_to_num(x), axis=-1)
+    csum = np.concatenate([np.zeros((n_rows, 1)), csum], axis=-1)
+    seed_idx = np.minimum(seed_at, n - 1)
+    # rows shorter than ``length`` have no seed; clamp so their index stays in bounds
+    seed = (csum[rows, seed_idx + 1] - csum[rows, np.maximum(seed_idx + 1 - length, 0)]) / length
+
+    # y[t] = (1 - alpha) * y[t-1] + alpha * u[t], started from y[seed_at] = seed
+    u = np.where(np.arange(n) > seed_at[:, None], x, 0.0)
+    u[rows[has_seed], seed_idx[has_seed]] = seed[has_seed] / alpha
+    out = lfilter([alpha], [1.0, -(1.0 - alpha)], u, axis=-1)
+    out[np.arange(n) < seed_at[:, None]] = np.nan
+    return out
+
+
+@_time_axis
+def rsi(close, length=14):
+    diff = close - _shift(close)
+    gains = rma(np.maximum(diff, 0.0), length)
+    losses = rma(np.minimum(diff, 0.0), length)
+    return 100 * gains / (gains + np.abs(losses))
+
+
+@_time_axis
+def macd(close, fast=12, slow=26, signal=9):
+    """Returns ``(macd, histogram, signal)`` in pandas_ta column order."""
+    line = seeded_ema(close, fast) - seeded_ema(close, slow)
+    signal_line = seeded_ema(line, signal)
+    return line, line - signal_line, signal_line
+
+
+@_time_axis
+def true_range(high, low, close):
+    prev_close = _shift(close)
+    ranges = np.stack([_non_zero_range(high, low), high - prev_close, prev_close - low])
+    out = np.fmax.reduce(np.abs(ranges), axis=0)
+    out[np.isnan(prev_close)] = np.nan
+    return out
+
+
+@_time_axis
+def atr(high, low, close, length=14):
+    return rma(true_range(high, low, close), length)
+
+
+@_time_axis
+def adx(high, low, close, length=14):
+    """Returns ``(adx, dmp, dmn)`` in pandas_ta column order."""
+    up = high - _shift(high)
+    down = _shift(low) - low
+    pos = np.where((up > down) & (up > 0), up, 0.0)
+    neg = np.where((down > up) & (down > 0), down, 0.0)
+    pos[np.isnan(up)] = np.nan
+    neg[np.isnan(down)] = np.nan
+    pos[np.abs(pos) < EPS] = 0.0
+    neg[np.abs(neg) < EPS] = 0.0
+
+    k = 100 / atr(high, low, close, length)
+    dmp = k * rma(pos, length)
+    dmn = k * rma(neg, length)
+    dx = 100 * np.abs(dmp - dmn) / (dmp + dmn)
+    return rma(dx, length), dmp, dmn
+
+
+@_time_axis
+def stoch(high, low, close, k=14, d=3, smooth_k=3):
+    """Returns ``(stoch_k, stoch_d)``."""
+    lowest = _rolling(low, k, np.min)
+    highest = _rolling(high, k, np.max)
+    raw = 100 * (close - lowest) / _non_zero_range(highest, lowest)
+    stoch_k = _rolling(raw, smooth_k, np.mean)
+    stoch_d = _rolling(stoch_k, d, np.mean)
+    return stoch_k, stoch_d
+
+
+@_time_axis
+def mfi(high, low, close, volume, length=14):
+    typical = (high + low + close) / 3
+    flow = typical * volume
+    change = typical - _shift(typical)
+    pos = np.where(change > 0, flow, 0.0)
+    neg = np.where(change < 0, flow, 0.0)
+    pos[np.isnan(flow)] = np.nan
+    neg[np.isnan(flow)] = np.nan
+    pos_sum = _rolling(pos, length, np.sum)
+    neg_sum = _rolling(neg, length, np.sum)
+    return 100 * pos_sum / (pos_sum + neg_sum)
+
+
+@_time_axis
+def rolling_std(x, window):
+    """pandas ``rolling(window).std()`` (ddof=1)."""
+    return _rolling(x, window, functools.partial(np.std, ddof=1))
@@ -0,0 +1,378 @@
+"""
+Intraday bars from minute-level files.
+
+``ingest_files`` reads one-minute OHLCV bars from CSV or Parquet files and
+aggregates them into the bars of ``INTERVALS`` (5m, 15m, 1h), kept in the
+``IntradayStore``, and into daily bars, which go to the OHLCV cache like
+downloaded ones, so the daily analysis uses them without a download.
+
+Files
+    A timestamp column (``Date``, ``Datetime``, ``Timestamp`` or ``Time``,
+    in exchange local time unless it has a timezone), ``Open``, ``High``,
+    ``Low``, ``Close``, ``Volume`` and, in files with several symbols, a
+    ``Symbol`` or ``Ticker`` column; otherwise the symbol is the file name,
+    as for LocalFileProvider (``INFY.NS.csv``). Column names are matched
+    case-insensitively; rows without a close or volume are dropped.
+
+Bounded memory
+    Files are read ``INTRADAY_CHUNK_ROWS`` rows at a time. A chunk is sorted
+    by ticker and time and reduced to the bars of every interval with
+    ``reduceat`` (first open, highest high, lowest low, last close, summed
+    volume), the same aggregation as the chart's candles. Completed bars
+    are written out when ``INTRADAY_FLUSH_ROWS`` of them are held, and at
+    the end of every file.
+
+Resumable
+    The newest bar of every ticker and interval may still get minutes from
+    the next chunk or file, so it is kept open in the ticker's state,
+    together with the newest minute ingested (the watermark). Minutes at or
+    before the watermark are skipped: files can be added one after the
+    other, a file ingested twice adds nothing, and an interrupted run starts
+    again from its last flush. The minutes of a ticker must therefore come
+    in time order across chunks and files (in any order within a chunk).
+    Buckets start at ``MARKET_OPEN`` (1h bars: 09:15, 10:15, ...).
+
+Storage
+    ``INTRADAY_DIR/<interval>/<ticker>/<n>.parquet``, one file of completed
+    bars per flush, compacted into one beyond ``INTRADAY_MAX_PARTS``, and
+    ``INTRADAY_DIR/state/<ticker>.json`` with the watermark and the open
+    bars. Reads include the open bar, so the newest bar of a window may still
+    grow, like the unsettled session in the OHLCV cache; the daily cache only
+    gets completed days. One ingestion runs at a time.
+
+    python -m backend.src.services.intraday data/minutes/*.parquet [--symbol INFY]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..config import settings
+from ..utils.downsample import ohlc_buckets
+from ..utils.helper import safe_filename, to_ticker
+from ..utils.log import get_logger, log_event
+from .ohlcv_cache import OHLCV_COLUMNS, get_cache, normalize_ohlcv
+from .timeframes import bucket_start, minute_buckets
+
+# bar interval: minutes
+INTERVALS = {"5m": 5, "15m": 15, "1h": 60}
+DAILY = "1d"
+# intervals a request can ask for
+BAR_INTERVALS = (DAILY, *INTERVALS)
+# shortest window an analysis of each interval takes, in days: the higher-timeframe
+# features of its bars (timeframes.features_for) need that much history
+MIN_DAYS = {DAILY: 365, "5m": 30, "15m": 45, "1h": 180}
+# weekdays without bars between two ingested days that are taken for holidays, not missing data
+HOLIDAY_GAP_DAYS = 2
+
+OHLCV = OHLCV_COLUMNS[1:]
+TIME_COLUMNS = ("date", "datetime", "timestamp", "time")
+SYMBOL_COLUMNS = ("symbol", "ticker")
+FILE_SUFFIXES = (".parquet", ".pq", ".csv.gz", ".csv")
+DAY_NS = 24 * 3600 * 10**9
+
+logger = get_logger(__name__)
+
+
+def session_minutes() -> int:
+    """Minutes from ``MARKET_OPEN`` to ``MARKET_CLOSE``."""
+    (open_h, open_m), (close_h, close_m) = (
+        (int(part) for part in value.split(":")) for value in (settings.MARKET_OPEN, settings.MARKET_CLOSE)
+    )
+    return (close_h * 60 + close_m) - (open_h * 60 + open_m)
+
+
+def _write_atomic(path: str, write):
+    """``write(tmp_path)``, then swap the file in, so readers never see a partial one."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _merged(frames) -> pd.DataFrame:
+    """Bars of ``frames`` (in write order) in date order; a bar written twice keeps its last version."""
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return normalize_ohlcv(None)
+    frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    frame = frame.sort_values('Date', kind='stable').drop_duplicates('Date', keep='last')
+    return frame.reset_index(drop=True)
+
+
+class IntradayStore:
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.INTRADAY_DIR
+
+    def _dir(self, interval: str, ticker: str) -> str:
+        return os.path.join(self.directory, interval, safe_filename(ticker))
+
+    def _state_path(self, ticker: str) -> str:
+        return os.path.join(self.directory, "state", f"{safe_filename(ticker)}.json")
+
+    def _parts(self, interval: str, ticker: str) -> list:
+        try:
+            names = os.listdir(self._dir(interval, ticker))
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names if name.endswith(".parquet"))
+
+    def state(self, ticker: str) -> dict:
+        """``{"watermark": ns or None, "open": {interval: [start ns, open, high, low, close, volume]}}``."""
+        try:
+            with open(self._state_path(ticker)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"watermark": None, "open": {}}
+
+    def put_state(self, ticker: str, state: dict):
+        path = self._state_path(ticker)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, "w") as f:
+                json.dump(state, f)
+        _write_atomic(path, write)
+
+    def _write_part(self, interval: str, ticker: str, frame: pd.DataFrame, number: int):
+        directory = self._dir(interval, ticker)
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        _write_atomic(os.path.join(directory, f"{number:06d}.parquet"), lambda path: pq.write_table(table, path))
+
+    def append(self, interval: str, ticker: str, bars: pd.DataFrame):
+        """Store completed ``bars``; the files of the series are compacted into one beyond ``INTRADAY_MAX_PARTS``."""
+        parts = self._parts(interval, ticker)
+        number = int(parts[-1][:-len(".parquet")]) + 1 if parts else 0
+        self._write_part(interval, ticker, bars, number)
+        if len(parts) + 1 > settings.INTRADAY_MAX_PARTS:
+            directory = self._dir(interval, ticker)
+            parts.append(f"{number:06d}.parquet")
+            merged = _merged(pq.read_table(os.path.join(directory, name)).to_pandas() for name in parts)
+            # the merged file is written before the parts go; a reader in between sees each bar twice
+            self._write_part(interval, ticker, merged, number + 1)
+            for name in parts:
+                os.remove(os.path.join(directory, name))
+
+    def window(self, ticker: str, interval: str, start, end) -> pd.DataFrame:
+        """Bars of ``interval`` for ``ticker`` from ``start`` to ``end`` (dates, inclusive), the open bar included."""
+        lo, hi = pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)
+        directory = self._dir(interval, ticker)
+        for attempt in range(3):
+            try:
+                frames = [
+                    pq.read_table(os.path.join(directory, name), filters=[('Date', '>=', lo), ('Date', '<', hi)]).to_pandas()
+                    for name in self._parts(interval, ticker)
+                ]
+                break
+            except FileNotFoundError:
+                # compacted while being read
+                if attempt == 2:
+                    raise
+        held = self.state(ticker)["open"].get(interval)
+        if held is not None and lo.value <= held[0] < hi.value:
+            frames.append(pd.DataFrame([[pd.Timestamp(held[0])] + held[1:]], columns=OHLCV_COLUMNS))
+        return _merged(frames)
+
+
+def _holiday_ranges(days: np.ndarray) -> list:
+    """``[(first, last)]`` date ranges of the sorted ``days``, split where more than ``HOLIDAY_GAP_DAYS`` weekdays have no bars."""
+    if not len(days):
+        return []
+    gaps = np.busday_count(days[:-1] + np.timedelta64(1, 'D'), days[1:]) > HOLIDAY_GAP_DAYS
+    splits = np.flatnonzero(gaps)
+    firsts, lasts = np.r_[0, splits + 1], np.r_[splits, len(days) - 1]
+    return [(days[f].astype(object), days[l].astype(object)) for f, l in zip(firsts, lasts)]
+
+
+class _Ingestion:
+    """One ``ingest_files`` run: the state of the tickers seen and the completed bars not written yet."""
+
+    def __init__(self, store: IntradayStore):
+        self.store = store
+        self.states = {}
+        self.touched = set()
+        self.pending = {}  # (interval, ticker) -> [(starts, {column: values})]
+        self.pending_rows = 0
+        self.rows = self.skipped = 0
+        self.bars = dict.fromkeys(list(INTERVALS) + [DAILY], 0)
+
+    def _state(self, ticker: str) -> dict:
+        if ticker not in self.states:
+            self.states[ticker] = self.store.state(ticker)
+        return self.states[ticker]
+
+    def add(self, tickers: list, codes: np.ndarray, stamps: np.ndarray, values: dict):
+        """Aggregate one chunk: ``tickers[codes]`` per row, ``stamps`` as int64 ns, ``values`` per OHLCV column."""
+        self.rows += len(codes)
+        order = np.lexsort((stamps, codes))
+        codes, stamps = codes[order], stamps[order]
+        watermark = np.array([
+            w if (w := self._state(t)["watermark"]) is not None else np.iinfo(np.int64).min for t in tickers
+        ], dtype=np.int64)
+        keep = stamps > watermark[codes]
+        # the same minute twice: the later row wins
+        keep[:-1] &= (codes[1:] != codes[:-1]) | (stamps[1:] != stamps[:-1])
+        self.skipped += int(len(keep) - keep.sum())
+        if not keep.any():
+            return
+        rows = order[keep]
+        codes, stamps = codes[keep], stamps[keep]
+        values = {c: v[rows] for c, v in values.items()}
+
+        for interval, minutes in list(INTERVALS.items()) + [(DAILY, None)]:
+            if minutes is None:
+                buckets = stamps // DAY_NS
+                starts_ns = buckets * DAY_NS
+            else:
+                buckets = minute_buckets(stamps, minutes)
+                starts_ns = bucket_start(buckets, minutes)
+            first = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])])
+            self._collect(interval, tickers, codes[first], starts_ns[first], ohlc_buckets(values, first))
+
+        last = np.r_[np.flatnonzero(codes[1:] != codes[:-1]), len(codes) - 1]
+        for code, stamp in zip(codes[last], stamps[last]):
+            self._state(tickers[code])["watermark"] = int(stamp)
+            self.touched.add(tickers[code])
+
+    def _collect(self, interval: str, tickers: list, codes: np.ndarray, starts: np.ndarray, bars: dict):
+        """Merge the bars of a chunk with the open bar of each ticker; all but each ticker's newest are complete."""
+        firsts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        lasts = np.r_[firsts[1:], len(codes)] - 1
+        for first, last in zip(firsts, lasts):
+            ticker = tickers[codes[first]]
+            held = self._state(ticker)["open"].get(interval)
+            if held is not None and held[0] == starts[first]:
+                # the open bar goes on in this chunk
+                bars["Open"][first] = held[1]
+                bars["High"][first] = np.fmax(held[2], bars["High"][first])
+                bars["Low"][first] = np.fmin(held[3], bars["Low"][first])
+                bars["Volume"][first] += held[5]
+            elif held is not None:
+                self._complete(interval, ticker, np.array([held[0]]), {c: np.array([v]) for c, v in zip(OHLCV, held[1:])})
+            if last > first:
+                self._complete(interval, ticker, starts[first:last], {c: v[first:last] for c, v in bars.items()})
+            self._state(ticker)["open"][interval] = [int(starts[last])] + [float(bars[c][last]) for c in OHLCV]
+
+    def _complete(self, interval: str, ticker: str, starts: np.ndarray, bars: dict):
+        self.pending.setdefault((interval, ticker), []).append((starts, bars))
+        self.pending_rows += len(starts)
+        self.bars[interval] += len(starts)
+
+    def flush(self):
+        """Write the completed bars, then the states, so a restart never skips minutes that were not stored."""
+        for (interval, ticker), pieces in self.pending.items():
+            frame = pd.DataFrame({'Date': np.concatenate([s for s, _ in pieces]).astype('datetime64[ns]')})
+            for column in OHLCV:
+                frame[column] = np.concatenate([b[column] for _, b in pieces]).astype(float)
+            if interval == DAILY:
+                days = frame['Date'].to_numpy().astype('datetime64[D]')
+                get_cache().store(ticker, frame, _holiday_ranges(days))
+            else:
+                self.store.append(interval, ticker, frame)
+        for ticker in self.touched:
+            self.store.put_state(ticker, self.states[ticker])
+        self.pending, self.pending_rows, self.touched = {}, 0, set()
+
+    def summary(self) -> dict:
+        return {"rows": self.rows, "skipped": self.skipped, "tickers": len(self.states), "bars": self.bars}
+
+
+def _file_symbol(path: str) -> str:
+    name = os.path.basename(path)
+    for suffix in FILE_SUFFIXES:
+        if name.lower().endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def read_chunks(path: str, chunk_rows: int = None):
+    """DataFrames of at most ``chunk_rows`` rows (``INTRADAY_CHUNK_ROWS``) of a CSV or Parquet file."""
+    chunk_rows = chunk_rows or settings.INTRADAY_CHUNK_ROWS
+    if path.lower().endswith((".parquet", ".pq")):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def chunk_columns(df: pd.DataFrame, symbol: str):
+    """``(tickers, codes, stamps, values)`` of a chunk for ``_Ingestion.add``; ``symbol`` for files without a symbol column."""
+    names = {str(c).strip().lower(): c for c in df.columns}
+    time_column = next((names[c] for c in TIME_COLUMNS if c in names), None)
+    if time_column is None or any(c.lower() not in names for c in OHLCV):
+        raise ValueError(f"Minute bars need a timestamp column ({', '.join(TIME_COLUMNS)}) and {', '.join(OHLCV)}")
+    stamps = pd.to_datetime(df[time_column])
+    if stamps.dt.tz is not None:
+        stamps = stamps.dt.tz_convert(settings.MARKET_TIMEZONE).dt.tz_localize(None)
+    values = {c: pd.to_numeric(df[names[c.lower()]], errors='coerce').to_numpy(dtype=float) for c in OHLCV}
+    symbol_column = next((names[c] for c in SYMBOL_COLUMNS if c in names), None)
+    if symbol_column is not None:
+        codes, symbols = pd.factorize(df[symbol_column].astype(str).str.strip())
+        # INFY and INFY.NS are the same ticker
+        codes, tickers = pd.factorize(np.array([to_ticker(s) for s in symbols], dtype=object)[codes])
+    else:
+        codes, tickers = np.zeros(len(df), dtype=np.intp), [to_ticker(symbol)]
+    valid = stamps.notna().to_numpy() & ~np.isnan(values["Close"]) & ~np.isnan(values["Volume"]) & (codes >= 0)
+    stamps = stamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    return list(tickers), codes[valid], stamps[valid], {c: v[valid] for c, v in values.items()}
+
+
+_ingest_lock = threading.Lock()
+
+
+def ingest_files(paths, symbol: str = None, store: IntradayStore = None, chunk_rows: int = None) -> dict:
+    """
+    Ingest minute-bar files in order (see the module docstring); ``symbol``
+    names the ticker of files without a symbol column (default: the file
+    name). Returns counts of the rows read and skipped and the bars
+    completed per interval.
+    """
+    run = _Ingestion(store or get_intraday_store())
+    started = time.perf_counter()
+    with _ingest_lock:
+        for path in paths:
+            for chunk in read_chunks(path, chunk_rows):
+                run.add(*chunk_columns(chunk, symbol or _file_symbol(path)))
+                if run.pending_rows >= settings.INTRADAY_FLUSH_ROWS:
+                    run.flush()
+            run.flush()
+            log_event(logger, "intraday_file_ingested", path=path, rows=run.rows)
+    summary = dict(run.summary(), files=len(paths), seconds=round(time.perf_counter() - started, 3))
+    log_event(logger, "intraday_ingested", **summary)
+    return summary
+
+
+_store = None
+
+
+def get_intraday_store() -> IntradayStore:
+    global _store
+    if _store is None:
+        _store = IntradayStore()
+    return _store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest minute-level OHLCV files into 5m/15m/1h and daily bars.")
+    parser.add_argument("paths", nargs="+", help="CSV or Parquet files, ingested in this order")
+    parser.add_argument("--symbol", help="ticker of files without a symbol column (default: the file name)")
+    args = parser.parse_args(argv)
+    print(json.dumps(ingest_files(args.paths, symbol=args.symbol), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""
+Background analysis jobs.
+
+``submit`` queues a get_stock-style analysis and returns its id at once.
+``JOB_WORKERS`` threads take queued jobs by priority (interactive before
+bulk, then oldest first) and run the stages in the analysis process pool:
+indicators (which give the chart), then the XGBoost signal, then the SARIMA
+forecasts. Each finished stage is saved, so a job can be polled for partial
+results while it runs. A job of kind ``sarima_search`` runs a SARIMA order
+search (sarima_search.search_orders, with the ``params`` it was queued with)
+instead, and its result is the selection.
+
+Jobs and their results are kept in a SQLite file (``JOB_STORE_PATH``) and
+expire ``JOB_RESULT_TTL_SECONDS`` after they finish. Every server process
+has its own runner over the same file: a runner claims a job with one
+conditional UPDATE (queued -> running, with itself as ``owner``) before it
+runs it, so a job runs in one process only, and marks the jobs it runs
+alive every ``JOB_HEARTBEAT_SECONDS``. Running jobs whose owner stopped
+marking them (a crashed or stopped process) and queued jobs nobody took
+are queued again by the runners after ``JOB_HEARTBEAT_TIMEOUT_SECONDS``.
+"""
+import itertools
+import json
+import logging
+import os
+import pickle
+import queue
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+
+from ..config import settings
+from ..utils.log import get_logger, log_event
+from .executor import call_when_free
+from .sarima_search import search_orders
+from .stock_services import chart_frame, generate_xgboost_signal, predict_with_sarima, prepare_history
+
+PRIORITIES = {"interactive": 0, "bulk": 10}
+STOCK = "stock"
+SARIMA_SEARCH = "sarima_search"
+
+logger = get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_COLUMNS = (
+    "id", "kind", "params", "symbol", "start", "end", "priority", "status", "stage", "error", "created", "updated",
+    "expires",
+)
+# columns added after the first layout, with their declarations
+_ADDED_COLUMNS = {
+    "kind": "TEXT DEFAULT 'stock'",  # every job of older stores is a /stock analysis
+    "params": "TEXT",
+    "owner": "TEXT",
+    "heartbeat": "REAL",
+}
+
+
+class JobStore:
+    def __init__(self, path: str = None, ttl: float = None):
+        self.path = path or settings.JOB_STORE_PATH
+        self.ttl = ttl if ttl is not None else settings.JOB_RESULT_TTL_SECONDS
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT DEFAULT 'stock', params TEXT, symbol TEXT, start TEXT, end TEXT,"
+                " priority INTEGER, status TEXT, stage TEXT, error TEXT, result BLOB,"
+                " created REAL, updated REAL, expires REAL, owner TEXT, heartbeat REAL)"
+            )
+            existing = {row[1] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, declaration in _ADDED_COLUMNS.items():
+                if name not in existing:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {declaration}")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    @contextmanager
+    def _db(self):
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:  # commit on success, roll back on error
+                yield conn
+
+    def create(self, symbol: str, start: str, end: str, priority: int, kind: str = STOCK, params: dict = None) -> dict:
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex, "kind": kind, "params": json.dumps(params or {}),
+            "symbol": symbol, "start": start, "end": end, "priority": priority,
+            "status": QUEUED, "stage": None, "error": None, "created": now, "updated": now,
+            # unfinished jobs get a generous expiry; it is reset when they finish
+            "expires": now + 2 * self.ttl,
+        }
+        with self._db() as db:
+            db.execute(
+                f"INSERT INTO jobs ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [job[c] for c in _COLUMNS],
+            )
+        return job
+
+    def update(self, job_id: str, result: dict = None, owner: str = None, **fields) -> bool:
+        """Set ``fields``; with ``owner`` only while that runner still owns the job. Returns whether a row changed."""
+        fields["updated"] = time.time()
+        if fields.get("status") in (DONE, FAILED):
+            fields["expires"] = fields["updated"] + self.ttl
+        if result is not None:
+            fields["result"] = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        where, args = ("id = ? AND owner = ?", [job_id, owner]) if owner is not None else ("id = ?", [job_id])
+        with self._db() as db:
+            return db.execute(f"UPDATE jobs SET {assignments} WHERE {where}", [*fields.values(), *args]).rowcount == 1
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """Mark a queued job running for ``owner``; False if another runner has it or it is finished or expired."""
+        now = time.time()
+        with self._db() as db:
+            return db.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat = ?, updated = ?"
+                " WHERE id = ? AND status = ? AND expires > ?",
+                (RUNNING, owner, now, now, job_id, QUEUED, now),
+            ).rowcount == 1
+
+    def heartbeat(self, owner: str):
+        with self._db() as db:
+            db.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?", (time.time(), owner, RUNNING))
+
+    def release(self, owner: str):
+        """Queue the running jobs of ``owner`` again, e.g. when its process stops."""
+        with self._db() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL WHERE owner = ? AND status = ?", (QUEUED, owner, RUNNING)
+            )
+
+    def get(self, job_id: str, with_result: bool = True):
+        """The job as a dict (with its partial or final ``result``), or None if unknown or expired."""
+        columns = _COLUMNS + (("result",) if with_result else ())
+        with self._db() as db:
+            row = db.execute(
+                f"SELECT {', '.join(columns)} FROM jobs WHERE id = ? AND expires > ?", (job_id, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        if with_result:
+            job["result"] = pickle.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def requeue_stale(self, timeout: float, idle: float = None) -> list:
+        """
+        Queue again the running jobs without a heartbeat for ``timeout``
+        seconds; returns ``(priority, created, id)`` of the queued jobs not
+        updated for ``idle`` seconds (all of them if omitted), these included.
+        """
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, owner = NULL"
+                " WHERE status = ? AND (heartbeat IS NULL OR heartbeat < ?)",
+                (QUEUED, RUNNING, now - timeout),
+            )
+            return db.execute(
+                "SELECT priority, created, id FROM jobs WHERE status = ? AND updated <= ? AND expires > ?"
+                " ORDER BY priority, created",
+                (QUEUED, now - (idle or 0), now),
+            ).fetchall()
+
+    def purge_expired(self) -> int:
+        with self._db() as db:
+            return db.execute("DELETE FROM jobs WHERE expires <= ?", (time.time(),)).rowcount
+
+
+class JobRunner:
+    def __init__(self, store: JobStore = None, workers: int = None):
+        self.store = store or JobStore()
+        self.workers = workers or settings.JOB_WORKERS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._queue = queue.PriorityQueue()
+        self._queued = set()  # ids in ``_queue``, so a sweep does not add them twice
+        self._queued_guard = threading.Lock()
+        self._seq = itertools.count()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Purge expired jobs, queue the unclaimed and orphaned ones, and start the worker and heartbeat threads."""
+        self.store.purge_expired()
+        for priority, _, job_id in self.store.requeue_stale(settings.JOB_HEARTBEAT_TIMEOUT_SECONDS):
+            self._enqueue(priority, job_id)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop taking jobs; jobs cut short are queued again for another process or the next start."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.store.release(self.owner)
+
+    def submit(self, symbol: str, start: str, end: str, priority: int = PRIORITIES["interactive"],
+               kind: str = STOCK, params: dict = None) -> dict:
+        job = self.store.create(symbol, start, end, priority, kind, params)
+        self._enqueue(priority, job["id"])
+        return job
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _enqueue(self, priority: int, job_id: str):
+        with self._queued_guard:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self._queue.put((priority, next(self._seq), job_id))
+
+    def _heartbeat(self):
+        timeout = settings.JOB_HEARTBEAT_TIMEOUT_SECONDS
+        while not self._stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+            try:
+                self.store.heartbeat(self.owner)
+                # jobs of a process that died, and queued jobs another process never got to
+                for priority, _, job_id in self.store.requeue_stale(timeout, idle=timeout):
+                    self._enqueue(priority, job_id)
+            except sqlite3.Error as e:
+                log_event(logger, "job_heartbeat_failed", logging.WARNING, error=str(e))
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                _, _, job_id = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            with self._queued_guard:
+                self._queued.discard(job_id)
+            try:
+                self._run(job_id)
+            except Exception as e:
+                log_event(logger, "job_crashed", logging.ERROR, job_id=job_id, error=str(e))
+
+    def _run(self, job_id: str):
+        if not self.store.claim(job_id, self.owner):
+            return  # another process runs it, or it finished or expired
+        job = self.store.get(job_id, with_result=False)
+        if job is None:
+            return
+        symbol = job["symbol"]
+        try:
+            if job["kind"] == SARIMA_SEARCH:
+                self._search(job)
+            else:
+                self._analyze(job)
+        except Exception as e:
+            if self._stop.is_set():
+                return  # queued again by stop()
+            self.store.update(job_id, owner=self.owner, status=FAILED, error=str(e))
+            log_event(logger, "job_failed", logging.WARNING, job_id=job_id, symbol=symbol, error=str(e))
+
+    def _search(self, job: dict):
+        params = json.loads(job["params"] or "{}")
+        selection = search_orders(
+            job["symbol"], job["start"], job["end"], params.get("criterion"), params.get("budget_seconds"), stop=self._stop
+        )
+        self.store.update(job["id"], owner=self.owner, status=DONE, stage="search", result=selection)
+
+    def _analyze(self, job: dict):
+        job_id, symbol = job["id"], job["symbol"]
+        result = {"symbol": symbol}
+        hist = call_when_free(prepare_history, symbol, job["start"], job["end"], stop=self._stop)
+        result["chart"] = chart_frame(hist)
+        self.store.update(job_id, owner=self.owner, stage="indicators", result=result)
+
+        result["XGBoost_Signal"] = call_when_free(generate_xgboost_signal, hist, symbol=symbol, stop=self._stop)
+        self.store.update(job_id, owner=self.owner, stage="signal", result=result)
+
+        result["SARIMA_Predictions"] = call_when_free(predict_with_sarima, hist, symbol=symbol, stop=self._stop)
+        self.store.update(job_id, owner=self.owner, status=DONE, stage="sarima", result=result)
+
+
+_runner = None
+_runner_guard = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    """Shared runner, started on first use."""
+    global _runner
+    with _runner_guard:
+        if _runner is None:
+            _runner = JobRunner()
+            _runner.start()
+        return _runner
+
+
+def queued_jobs() -> int:
+    """Jobs waiting in the shared runner; 0 when it is not running."""
+    runner = _runner
+    return runner.queued() if runner is not None else 0
+
+
+def shutdown_job_runner():
+    global _runner
+    with _runner_guard:
+        if _runner is not None:
+            _runner.stop()
+            _runner = None
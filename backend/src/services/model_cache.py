@@ -0,0 +1,160 @@
+"""
+Cache of trained XGBoost signal models.
+
+Entries are keyed by symbol, feature list and a hash of the training
+window (features and labels), so a repeat request for the same data goes
+straight to inference. They are persisted with joblib under
+``MODEL_CACHE_DIR`` and shared by every worker process; a small in-memory
+layer avoids reloading hot entries.
+
+Eviction is by age (``MODEL_CACHE_TTL_SECONDS``) and size
+(``MODEL_CACHE_MAX_ENTRIES``, least recently used first). A file's mtime is
+its creation time and its atime the last time it was used.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+
+from ..config import settings
+from ..utils.helper import safe_filename
+
+SUFFIX = ".joblib"
+
+
+def fingerprint(symbol: str, features, X: np.ndarray, y: np.ndarray) -> str:
+    """Cache key for a model trained on ``X``/``y`` with ``features`` for ``symbol``."""
+    digest = hashlib.sha256()
+    digest.update(symbol.encode())
+    digest.update("|".join(features).encode())
+    # float32 so rounding noise between the batch and incremental indicator paths hashes alike
+    digest.update(np.ascontiguousarray(X, dtype=np.float32).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return f"{safe_filename(symbol)}__{digest.hexdigest()[:32]}"
+
+
+class ModelCache:
+    def __init__(self, directory: str = None, max_entries: int = None, ttl_seconds: float = None):
+        self.directory = directory or settings.MODEL_CACHE_DIR
+        self.max_entries = max_entries if max_entries is not None else settings.MODEL_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.MODEL_CACHE_TTL_SECONDS
+        self._memory = OrderedDict()
+        self._guard = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key: str):
+        """The cached entry for ``key``, or None if it is missing or expired."""
+        path = self._path(key)
+        try:
+            created = os.stat(path).st_mtime
+        except FileNotFoundError:
+            # also drops entries another worker invalidated
+            with self._guard:
+                self._memory.pop(key, None)
+            return None
+        if time.time() - created > self.ttl_seconds:
+            self._remove(key)
+            return None
+
+        with self._guard:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            try:
+                entry = joblib.load(path)
+            except (FileNotFoundError, EOFError):
+                return None
+            self._remember(key, entry)
+        try:
+            os.utime(path, (time.time(), created))
+        except FileNotFoundError:
+            pass
+        return entry
+
+    def put(self, key: str, entry: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=SUFFIX + ".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._remember(key, entry)
+        self.evict()
+
+    def _remember(self, key: str, entry: dict):
+        with self._guard:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _remove(self, key: str):
+        with self._guard:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _entries(self):
+        """(key, created, last_used) for every entry on disk."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((name[:-len(SUFFIX)], st.st_mtime, st.st_atime))
+        return entries
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones above the size limit."""
+        now = time.time()
+        alive = []
+        for key, created, last_used in self._entries():
+            if now - created > self.ttl_seconds:
+                self._remove(key)
+            else:
+                alive.append((last_used, key))
+        alive.sort()
+        for _, key in alive[:max(0, len(alive) - self.max_entries)]:
+            self._remove(key)
+
+    def invalidate(self, symbol: str = None) -> int:
+        """
+        Remove every entry of ``symbol``, daily and intraday series alike (or
+        all entries); returns how many were removed.
+        """
+        from .intraday import BAR_INTERVALS
+        from .stock_services import series_key
+
+        prefixes = tuple(f"{safe_filename(series_key(symbol, interval))}__" for interval in BAR_INTERVALS) if symbol else ("",)
+        return sum(self._remove(key) for key, _, _ in self._entries() if key.startswith(prefixes))
+
+
+_cache = None
+_cache_guard = threading.Lock()
+
+
+def get_model_cache() -> ModelCache:
+    global _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = ModelCache()
+        return _cache
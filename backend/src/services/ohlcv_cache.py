@@ -0,0 +1,402 @@
+"""
+Persistent OHLCV cache in front of the market data provider.
+
+Each ticker is stored as one Parquet file under ``OHLCV_CACHE_DIR``. The file
+metadata records the date ranges that have already been downloaded, so a
+request only goes to the provider for the parts of its window that are
+missing. A range the provider answered for is covered even when it had no
+bars (exchange holidays, days before a listing); a failed download
+(``ProviderError``) covers nothing. When a download starts well before the
+first bar it returns, that bar's date is kept as the listing floor and
+earlier dates are never asked for again.
+
+Sessions that have not closed yet are never marked as covered: they are
+fetched again, at most once per ``OHLCV_TAIL_TTL_SECONDS``, and the bars
+after the market close are appended for good.
+"""
+import functools
+import json
+import logging
+import os
+import ssl
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..config import settings
+from ..utils import metrics
+from ..utils.helper import safe_filename
+from ..utils.log import get_logger, log_event
+
+OHLCV_COLUMNS = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+# weekdays without bars at the start of a download that mark the first bar as the listing date
+LISTING_GAP_WEEKDAYS = 10
+# yfinance messages that mean "no bars in this range" rather than a failed download
+NO_DATA_MARKERS = ("no price data found", "no data found", "data doesn't exist", "possibly delisted")
+
+logger = get_logger(__name__)
+
+
+class ProviderError(Exception):
+    """A download failed (network error, rate limit); unlike an empty frame it says nothing about the range."""
+
+
+def normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """Bring a provider frame to the ``Date, Open, High, Low, Close, Volume`` layout."""
+    if df is None or df.empty:
+        return pd.DataFrame({c: pd.Series(dtype='datetime64[ns]' if c == 'Date' else 'float64') for c in OHLCV_COLUMNS})
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.droplevel(level=1)
+    if 'Date' not in df.columns:
+        df = df.reset_index()
+        df = df.rename(columns={df.columns[0]: 'Date'})
+    dates = pd.to_datetime(df['Date'])
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    df = df.assign(Date=dates.dt.normalize())[OHLCV_COLUMNS]
+    return df.sort_values('Date').drop_duplicates('Date', keep='last').reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=None)
+def _use_certifi():
+    """Point HTTPS verification at the certifi bundle; done once, on the first download."""
+    import certifi
+
+    os.environ['SSL_CERT_FILE'] = certifi.where()
+    os.environ["REQUESTS_CA_BUNDLE"] = certifi.where()
+    ssl._create_default_https_context = functools.partial(ssl.create_default_context, cafile=certifi.where())
+
+
+# yf.download reports failures per ticker in a module global that every call resets
+_yf_lock = threading.Lock()
+
+
+def _yf_download(tickers, start: date, end: date, **kwargs):
+    """``yf.download`` and ``{ticker: message}`` of the tickers it failed for; "no data" answers are not failures."""
+    _use_certifi()
+    import yfinance as yf
+
+    with _yf_lock:
+        try:
+            # yfinance treats ``end`` as exclusive
+            df = yf.download(tickers, start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+                             progress=False, **kwargs)
+        except Exception as e:
+            raise ProviderError(str(e)) from e
+        errors = dict(getattr(getattr(yf, 'shared', None), '_ERRORS', None) or {})
+    failed = {}
+    for ticker in ([tickers] if isinstance(tickers, str) else tickers):
+        message = str(errors.get(ticker, errors.get(ticker.upper(), '')))
+        if message and not any(marker in message.lower() for marker in NO_DATA_MARKERS):
+            failed[ticker] = message
+    return df, failed
+
+
+class YFinanceProvider:
+    """
+    Downloads daily bars from Yahoo Finance. An empty frame means Yahoo has
+    no bars in the range; failed downloads raise ``ProviderError``.
+    """
+
+    def download(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        df, failed = _yf_download(ticker, start, end)
+        if failed:
+            raise ProviderError(f"{ticker}: {failed[ticker]}")
+        return normalize_ohlcv(df)
+
+    def download_many(self, tickers, start: date, end: date) -> dict:
+        """One bulk ``yf.download`` call for several tickers. Returns {ticker: DataFrame}, without the failed tickers."""
+        df, failed = _yf_download(tickers, start, end, group_by='ticker', threads=True)
+        frames = {}
+        for ticker in tickers:
+            if ticker in failed:
+                continue
+            if isinstance(df.columns, pd.MultiIndex) and ticker in df.columns.get_level_values(0):
+                # dates traded by other tickers only come back as all-NaN rows
+                frames[ticker] = normalize_ohlcv(df[ticker].dropna(subset=['Close']))
+            else:
+                frames[ticker] = normalize_ohlcv(None)
+        return frames
+
+
+class LocalFileProvider:
+    """
+    File-backed stand-in for a market data provider.
+    Reads ``<directory>/<TICKER>.parquet`` or ``<directory>/<TICKER>.csv`` with a Date column;
+    the ticker goes through ``safe_filename`` like the cache's own files.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def download(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        parquet_path = os.path.join(self.directory, f"{safe_filename(ticker)}.parquet")
+        csv_path = os.path.join(self.directory, f"{safe_filename(ticker)}.csv")
+        if os.path.exists(parquet_path):
+            df = pd.read_parquet(parquet_path)
+        elif os.path.exists(csv_path):
+            df = pd.read_csv(csv_path, parse_dates=['Date'])
+        else:
+            return normalize_ohlcv(None)
+        df = normalize_ohlcv(df)
+        mask = (df['Date'] >= pd.Timestamp(start)) & (df['Date'] <= pd.Timestamp(end))
+        return df.loc[mask].reset_index(drop=True)
+
+    def download_many(self, tickers, start: date, end: date) -> dict:
+        return {ticker: self.download(ticker, start, end) for ticker in tickers}
+
+
+def last_settled_date(now: datetime = None) -> date:
+    """Latest session date whose bar is final (its market close has passed)."""
+    tz = ZoneInfo(settings.MARKET_TIMEZONE)
+    now = now.astimezone(tz) if now is not None else datetime.now(tz)
+    close_h, close_m = (int(part) for part in settings.MARKET_CLOSE.split(':'))
+    if now.time() >= time(close_h, close_m):
+        return now.date()
+    return now.date() - timedelta(days=1)
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(covered, start: date, end: date):
+    """Sub-ranges of ``[start, end]`` not present in ``covered`` that contain at least one weekday."""
+    gaps = []
+    cursor = start
+    for c_start, c_end in _merge_ranges(covered):
+        if c_end < cursor:
+            continue
+        if c_start > end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start - timedelta(days=1)))
+        cursor = max(cursor, c_end + timedelta(days=1))
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return [(s, e) for s, e in gaps if np.busday_count(s, e + timedelta(days=1)) > 0]
+
+
+def _listing_floor(frame: pd.DataFrame, coverage, listed):
+    """
+    First date with bars, once the provider answered for at least
+    ``LISTING_GAP_WEEKDAYS`` weekdays right before it without any bars;
+    ``listed`` is kept otherwise, and dropped if bars before it turn up.
+    """
+    if frame.empty:
+        return listed
+    first = pd.Timestamp(frame['Date'].iloc[0]).date()
+    if listed is not None and first < listed:
+        return None
+    for start, end in coverage:  # merged, so at most one range holds the day before the first bar
+        if start < first <= end + timedelta(days=1) and np.busday_count(start, first) >= LISTING_GAP_WEEKDAYS:
+            return first
+    return listed
+
+
+class OHLCVCache:
+    def __init__(self, provider, directory: str = None):
+        self.provider = provider
+        self.directory = directory or settings.OHLCV_CACHE_DIR
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._memo = {}  # ticker -> (mtime_ns, frame, coverage, meta)
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.directory, f"{safe_filename(ticker)}.parquet")
+
+    def _lock(self, ticker: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _read(self, ticker: str):
+        """
+        ``(frame, coverage, meta)``; ``meta`` holds the listing floor
+        (``listed``) and the unsettled range fetched last with its fetch
+        time (``tail``: ``(start, end, timestamp)``), each None if unknown.
+        """
+        path = self._path(ticker)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return normalize_ohlcv(None), [], {'listed': None, 'tail': None}
+        memo = self._memo.get(ticker)
+        if memo and memo[0] == mtime:
+            return memo[1], memo[2], memo[3]
+        table = pq.read_table(path)
+        stored = table.schema.metadata or {}
+        coverage = [(date.fromisoformat(s), date.fromisoformat(e)) for s, e in json.loads(stored.get(b'coverage', b'[]'))]
+        listed = json.loads(stored.get(b'listed', b'null'))
+        tail = json.loads(stored.get(b'tail', b'null'))
+        meta = {
+            'listed': date.fromisoformat(listed) if listed else None,
+            'tail': (date.fromisoformat(tail[0]), date.fromisoformat(tail[1]), tail[2]) if tail else None,
+        }
+        frame = table.to_pandas()
+        self._memo[ticker] = (mtime, frame, coverage, meta)
+        return frame, coverage, meta
+
+    def _write(self, ticker: str, frame: pd.DataFrame, coverage, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        stored = dict(table.schema.metadata or {})
+        stored[b'coverage'] = json.dumps([(s.isoformat(), e.isoformat()) for s, e in coverage]).encode()
+        listed, tail = meta['listed'], meta['tail']
+        stored[b'listed'] = json.dumps(listed.isoformat() if listed else None).encode()
+        stored[b'tail'] = json.dumps((tail[0].isoformat(), tail[1].isoformat(), tail[2]) if tail else None).encode()
+        table = table.replace_schema_metadata(stored)
+        # write next to the target and swap it in so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.parquet.tmp')
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self._path(ticker))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def store(self, ticker: str, bars: pd.DataFrame, fetched_ranges):
+        """
+        Merge the ``bars`` the provider answered ``fetched_ranges`` with and
+        mark the settled part of the ranges as covered, bars or not (failed
+        downloads raise ``ProviderError`` and are never stored). The
+        unsettled part is remembered with the time it was fetched.
+        """
+        settled = last_settled_date()
+        with self._lock(ticker):
+            frame, coverage, meta = self._read(ticker)
+            # the memoized list and dict are shared with readers until the new file is written
+            coverage, meta = list(coverage), dict(meta)
+            if not bars.empty:
+                frame = pd.concat([frame, bars], ignore_index=True) if not frame.empty else bars
+                frame = frame.sort_values('Date').drop_duplicates('Date', keep='last').reset_index(drop=True)
+            for start, end in fetched_ranges:
+                if start <= min(end, settled):
+                    coverage.append((start, min(end, settled)))
+                if end > settled:
+                    meta['tail'] = (max(start, settled + timedelta(days=1)), end, datetime.now().timestamp())
+            coverage = _merge_ranges(coverage)
+            meta['listed'] = _listing_floor(frame, coverage, meta['listed'])
+            self._write(ticker, frame, coverage, meta)
+            self._memo.pop(ticker, None)
+
+    def missing(self, ticker: str, start: date, end: date):
+        _, coverage, meta = self._read(ticker)
+        if meta['listed'] is not None:
+            start = max(start, meta['listed'])
+        tail = meta['tail']
+        if tail is not None and datetime.now().timestamp() - tail[2] < settings.OHLCV_TAIL_TTL_SECONDS:
+            # the unsettled sessions were fetched moments ago; until the TTL runs out they come from the file
+            coverage = coverage + [tail[:2]]
+        return missing_ranges(coverage, start, end)
+
+    def get(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        """Bars for ``ticker`` between ``start`` and ``end`` (inclusive), downloading only what is missing."""
+        gaps = self.missing(ticker, start, end)
+        metrics.cache_event("ohlcv", hit=not gaps)
+        if gaps:
+            try:
+                bars = [self.provider.download(ticker, gap_start, gap_end) for gap_start, gap_end in gaps]
+            except ProviderError as e:
+                # serve what is cached; the gaps are asked for again next time
+                log_event(logger, "ohlcv_download_failed", logging.WARNING, ticker=ticker, error=str(e))
+            else:
+                self.store(ticker, pd.concat(bars, ignore_index=True) if len(bars) > 1 else bars[0], gaps)
+        return self.window(ticker, start, end)
+
+    def get_many(self, tickers, start: date, end: date) -> dict:
+        """
+        Bulk variant of ``get``. Tickers with missing data are downloaded
+        together: through the provider's ``download_many`` when it has one,
+        otherwise through a bounded thread pool.
+        """
+        gaps = {ticker: self.missing(ticker, start, end) for ticker in tickers}
+        stale = [ticker for ticker in tickers if gaps[ticker]]
+        for ticker in tickers:
+            metrics.cache_event("ohlcv", hit=not gaps[ticker])
+        if stale:
+            span_start = min(gaps[t][0][0] for t in stale)
+            span_end = max(gaps[t][-1][1] for t in stale)
+            try:
+                if hasattr(self.provider, 'download_many'):
+                    bars = self.provider.download_many(stale, span_start, span_end)
+                else:
+                    with ThreadPoolExecutor(max_workers=settings.BATCH_DOWNLOAD_CONCURRENCY) as pool:
+                        fetched = pool.map(lambda t: self._try_download(t, span_start, span_end), stale)
+                        bars = {t: frame for t, frame in zip(stale, fetched) if frame is not None}
+            except ProviderError as e:
+                log_event(logger, "ohlcv_download_failed", logging.WARNING, tickers=len(stale), error=str(e))
+                bars = {}
+            for ticker in stale:
+                # tickers missing from ``bars`` failed; they keep their gaps
+                if ticker in bars:
+                    self.store(ticker, bars[ticker], [(span_start, span_end)])
+                else:
+                    log_event(logger, "ohlcv_download_failed", logging.WARNING, ticker=ticker)
+        return {ticker: self.window(ticker, start, end) for ticker in tickers}
+
+    def _try_download(self, ticker: str, start: date, end: date):
+        try:
+            return self.provider.download(ticker, start, end)
+        except ProviderError as e:
+            log_event(logger, "ohlcv_download_failed", logging.WARNING, ticker=ticker, error=str(e))
+            return None
+
+    def window(self, ticker: str, start: date, end: date) -> pd.DataFrame:
+        frame, _, _ = self._read(ticker)
+        dates = frame['Date'].to_numpy()
+        lo = np.searchsorted(dates, np.datetime64(start, 'ns'), side='left')
+        hi = np.searchsorted(dates, np.datetime64(end, 'ns'), side='right')
+        return frame.iloc[lo:hi].reset_index(drop=True)
+
+    def invalidate(self, ticker: str = None):
+        """Drop the cached bars of one ticker, or of every ticker."""
+        if ticker:
+            tickers = [ticker]
+        elif os.path.isdir(self.directory):
+            tickers = [f[:-len('.parquet')] for f in os.listdir(self.directory) if f.endswith('.parquet')]
+        else:
+            tickers = []
+        for t in tickers:
+            with self._lock(t):
+                self._memo.pop(t, None)
+                try:
+                    os.remove(self._path(t))
+                except FileNotFoundError:
+                    pass
+
+
+def default_provider():
+    if settings.OHLCV_PROVIDER == 'local':
+        return LocalFileProvider(settings.OHLCV_LOCAL_DIR)
+    return YFinanceProvider()
+
+
+_cache = None
+_cache_guard = threading.Lock()
+
+
+def get_cache() -> OHLCVCache:
+    global _cache
+    with _cache_guard:
+        if _cache is None:
+            _cache = OHLCVCache(default_provider())
+        return _cache
+
+
+def set_provider(provider):
+    """Swap the provider behind the shared cache (e.g. a LocalFileProvider in tests)."""
+    get_cache().provider = provider
@@ -0,0 +1,114 @@
+"""
+Cross-sectional (panel) XGBoost signal model.
+
+Instead of one small model per symbol and window, one classifier is
+trained on the stacked signal features of every symbol in
+``PANEL_UNIVERSE``. Each symbol's features are z-scored with its own mean
+and standard deviation first, so price-level features (EMA, ATR, MACD)
+are comparable across symbols; those statistics are saved with the model
+and reused at inference, symbols outside the universe use the ones of the
+request window.
+
+Training runs offline (after the close in the precompute scheduler, or
+POST /models/panel/train) and the model is saved with joblib at
+``PANEL_MODEL_PATH``. With ``SIGNAL_MODE=panel`` requests only run
+``predict``: one call for all symbols of a batch chunk.
+"""
+import os
+import tempfile
+import threading
+
+import joblib
+import numpy as np
+
+from ..config import settings
+
+SIGNAL_LABELS = {1: "BUY 📈", 0: "HOLD 🤝", -1: "SELL 📉"}
+
+
+def symbol_stats(X: np.ndarray):
+    """Per-feature ``(mean, std)`` of one symbol's rows; constant features get std 1."""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0)
+    std[~(std > 0)] = 1.0
+    return mean, std
+
+
+def normalize(X: np.ndarray, stats) -> np.ndarray:
+    mean, std = stats
+    return (X - mean) / std
+
+
+def predict_signals(entry: dict, latest: dict) -> dict:
+    """
+    Signals for ``{symbol: (X, last_row)}``, where ``X`` holds the symbol's
+    complete feature rows and ``last_row`` the one to classify, with a
+    single ``predict`` call.
+    """
+    symbols, rows = [], []
+    for symbol, (X, last_row) in latest.items():
+        stats = entry["stats"].get(symbol) or symbol_stats(X)
+        symbols.append(symbol)
+        rows.append(normalize(last_row, stats))
+    if not rows:
+        return {}
+    predictions = entry["model"].predict(entry["scaler"].transform(np.vstack(rows))) - 1
+    return {symbol: SIGNAL_LABELS.get(int(p), "UNKNOWN") for symbol, p in zip(symbols, predictions)}
+
+
+class PanelModelStore:
+    def __init__(self, path: str = None):
+        self.path = path or settings.PANEL_MODEL_PATH
+        self._memo = None  # (mtime_ns, entry)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The saved model entry, or None if none was trained yet."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        memo = self._memo
+        if memo and memo[0] == mtime:
+            return memo[1]
+        try:
+            entry = joblib.load(self.path)
+        except (FileNotFoundError, EOFError):
+            return None
+        with self._lock:
+            self._memo = (mtime, entry)
+        return entry
+
+    def put(self, entry: dict):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".joblib.tmp")
+        os.close(fd)
+        try:
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def summary(entry: dict) -> dict:
+    """JSON-friendly description of a model entry."""
+    return {
+        "as_of": entry["as_of"],
+        "trained_at": entry["trained_at"],
+        "window": entry["window"],
+        "symbols": len(entry["stats"]),
+        "rows": entry["rows"],
+        "accuracy": round(float(entry["accuracy"]), 4),
+    }
+
+
+_store = None
+
+
+def get_panel_store() -> PanelModelStore:
+    global _store
+    if _store is None:
+        _store = PanelModelStore()
+    return _store
@@ -0,0 +1,54 @@
+"""
+Background warm-up of the analysis pool.
+
+statsmodels, xgboost, sklearn, imblearn and scipy.signal take seconds to
+import, so the service modules import them inside the functions that use
+them; importing the app, and answering / or /metrics, does not wait for
+them. With ``PRELOAD`` the pool workers get them from the forkserver they
+are forked from and load any that are missing in their initializer, before
+their first task (see executor.py). With ``PRELOAD`` on, the server calls
+``start_preload`` once it takes traffic: a daemon thread starts the pool,
+and with it the forkserver and every worker, so the first /stock request
+finds them warm.
+"""
+import logging
+import threading
+import time
+
+from ..config import settings
+from ..utils.log import get_logger, log_event
+from .executor import get_executor, worker_import_seconds
+
+logger = get_logger(__name__)
+
+
+def preload() -> dict:
+    """
+    Start every pool worker; one task per worker makes the pool start them
+    all, and the worker initializer loads the analysis modules.
+    """
+    started = time.perf_counter()
+    executor = get_executor()
+    futures = executor.submit_all((worker_import_seconds, (), {}) for _ in range(executor.workers))
+    worker_seconds = [f.result() for f in futures]
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "worker_seconds": [round(s, 3) if s is not None else None for s in worker_seconds],
+    }
+
+
+def _run():
+    try:
+        log_event(logger, "preload_finished", **preload())
+    except Exception as e:
+        # not fatal: the workers import the modules on first use instead
+        log_event(logger, "preload_failed", logging.WARNING, error=str(e))
+
+
+def start_preload():
+    """``preload`` in a daemon thread if ``PRELOAD`` is on; returns the thread or None."""
+    if not settings.PRELOAD:
+        return None
+    thread = threading.Thread(target=_run, name="preload", daemon=True)
+    thread.start()
+    return thread
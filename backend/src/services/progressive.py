@@ -0,0 +1,104 @@
+"""
+Progressive /stock results, for /stock/stream.
+
+The analysis runs as three pool tasks instead of one: first the download
+and indicators (``prepare_history``), then the XGBoost signal and the price
+forecast side by side on the FeatureView it returns. Each part is handed
+out as an event as soon as its task finishes, so the chart can be shown
+while the models still run. The work done is the same as for /stock.
+
+Events, in order of arrival, each a ``(name, payload)`` pair; the payloads
+are pieces of a /stock result, so merging them rebuilds one:
+
+- ``chart``: ``{"symbol", "Interval", "chart"}``, always first;
+- ``signal``: ``{"XGBoost_Signal"}``;
+- ``forecast``: ``{"Forecast_Engine", "SARIMA_Predictions": {horizon: ...}}``,
+  one per horizon (they come from the same fit, so they arrive together);
+- ``error``: ``{"stage", "error"}`` for a failed stage; the other stages
+  still report, except after a failed ``indicators`` stage;
+- ``done``: ``{"elapsed_ms": {event: ms since the start}}``, always last.
+"""
+import asyncio
+import logging
+import time
+
+from ..config import settings
+from ..utils.log import get_logger, log_event
+from .executor import QueueFullError, get_executor
+from .singleflight import wait
+from .intraday import DAILY
+from .stock_services import chart_frame, generate_xgboost_signal, predict_prices, prepare_history
+
+logger = get_logger(__name__)
+
+
+def start_history(symbol: str, start: str = None, end: str = None, interval: str = DAILY):
+    """Submit the first stage; raises QueueFullError when the pool cannot take it."""
+    return get_executor().submit(prepare_history, symbol, start, end, interval)
+
+
+def result_events(result: dict) -> list:
+    """The events of an already complete result (e.g. a precomputed one)."""
+    events = [("chart", {"symbol": result["symbol"], "Interval": result.get("Interval", DAILY), "chart": result["chart"]})]
+    events.append(("signal", {"XGBoost_Signal": result["XGBoost_Signal"]}))
+    engine = result.get("Forecast_Engine", "sarima")
+    for horizon, prediction in result["SARIMA_Predictions"].items():
+        events.append(("forecast", {"Forecast_Engine": engine, "SARIMA_Predictions": {horizon: prediction}}))
+    return events + [("done", {"elapsed_ms": {}})]
+
+
+async def _submit_when_free(calls) -> list:
+    """``submit_all`` that waits for room in the queue: the client already has the chart."""
+    while True:
+        try:
+            return get_executor().submit_all(calls)
+        except QueueFullError as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def stage_events(history, symbol: str, engine: str = None, interval: str = DAILY):
+    """
+    Events of an analysis whose first stage is the ``history`` future from
+    ``start_history`` (with the same ``interval``). Stages not started yet are cancelled when the
+    consumer stops early (the client disconnected).
+    """
+    engine = engine or settings.FORECAST_ENGINE
+    started = time.perf_counter()
+    elapsed = {}
+
+    def event(name, payload):
+        elapsed[name] = round((time.perf_counter() - started) * 1000, 2)
+        return name, payload
+
+    try:
+        hist = await wait(history)
+    except Exception as e:
+        log_event(logger, "analysis_failed", logging.WARNING, symbol=symbol, stage="indicators", error=str(e))
+        yield event("error", {"stage": "indicators", "error": str(e)})
+        yield "done", {"elapsed_ms": elapsed}
+        return
+    yield event("chart", {"symbol": symbol, "Interval": interval, "chart": chart_frame(hist)})
+
+    signal, forecast = await _submit_when_free([
+        (generate_xgboost_signal, (hist,), {"symbol": symbol, "interval": interval}),
+        (predict_prices, (hist,), {"symbol": symbol, "engine": engine, "interval": interval}),
+    ])
+    pending = {asyncio.wrap_future(signal): "signal", asyncio.wrap_future(forecast): "forecast"}
+    try:
+        while pending:
+            finished, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                stage = pending.pop(task)
+                if task.exception() is not None:
+                    error = str(task.exception())
+                    log_event(logger, "analysis_failed", logging.WARNING, symbol=symbol, stage=stage, error=error)
+                    yield event("error", {"stage": stage, "error": error})
+                elif stage == "signal":
+                    yield event("signal", {"XGBoost_Signal": task.result()})
+                else:
+                    for horizon, prediction in task.result().items():
+                        yield event("forecast", {"Forecast_Engine": engine, "SARIMA_Predictions": {horizon: prediction}})
+    finally:
+        for task in pending:
+            task.cancel()
+    yield "done", {"elapsed_ms": elapsed}
@@ -0,0 +1,75 @@
+"""
+Ready-to-serve analysis results.
+
+The post-close precompute stores one result per symbol under
+``PRECOMPUTE_DIR``, together with the session date (``as_of``) it describes.
+Entries are replaced by the next run; reads are memoised by file mtime so a
+lookup costs a ``stat`` once the entry is in memory.
+"""
+import os
+import pickle
+import tempfile
+import threading
+from datetime import date
+
+from ..config import settings
+from ..utils.helper import safe_filename
+
+
+class ResultStore:
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.PRECOMPUTE_DIR
+        self._memo = {}  # symbol -> (mtime_ns, entry)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.directory, f"{safe_filename(symbol)}.pkl")
+
+    def get(self, symbol: str):
+        """``{"as_of": date, "result": dict}`` or None."""
+        path = self._path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        memo = self._memo.get(symbol)
+        if memo and memo[0] == mtime:
+            return memo[1]
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            return None
+        with self._lock:
+            self._memo[symbol] = (mtime, entry)
+        return entry
+
+    def put(self, symbol: str, result: dict, as_of: date):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".pkl.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump({"as_of": as_of, "result": result}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(symbol))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, symbol: str) -> bool:
+        with self._lock:
+            self._memo.pop(symbol, None)
+        try:
+            os.remove(self._path(symbol))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+_store = None
+
+
+def get_result_store() -> ResultStore:
+    global _store
+    if _store is None:
+        _store = ResultStore()
+    return _store
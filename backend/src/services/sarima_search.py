@@ -0,0 +1,221 @@
+"""
+SARIMA order selection per symbol.
+
+AIC and BIC only compare models fitted to the same series, and the
+differencing orders change the series a model is fitted to. So ``d`` and
+``D`` are not searched: ``d`` is the smallest of ``SARIMA_SEARCH_D`` whose
+differenced closes reject a unit root (ADF at ``SARIMA_SEARCH_ADF_ALPHA``),
+and ``D`` is 1 (if ``SARIMA_SEARCH_SEASONAL_D`` allows it) when the
+seasonal strength of the closes at one of ``SARIMA_SEARCH_PERIODS`` reaches
+``SARIMA_SEARCH_SEASONAL_STRENGTH``, with that period as the only one
+searched. The grid then only varies the AR and MA orders.
+
+Every candidate of the grid (``SARIMA_SEARCH_*``) is fitted in the analysis
+process pool, in two rounds: a short fit of ``SARIMA_SEARCH_PROBE_ITER``
+optimizer iterations for every candidate, then a full fit of the best
+``SARIMA_SEARCH_KEEP`` fraction by ``SARIMA_SEARCH_CRITERION`` (AIC or BIC);
+the others are pruned. The search stops at ``SARIMA_SEARCH_BUDGET_SECONDS``:
+candidates not fitted by then are dropped and the best full fit so far
+wins. A candidate whose turn comes after the deadline is not sent to the
+pool at all; fits already running there finish without being waited for.
+
+The pick is stored per symbol in the SARIMA state store and used by
+``predict_with_sarima`` until it is ``SARIMA_ORDER_TTL_DAYS`` old. Searches
+run after the close for the watchlist (precompute scheduler, with
+``SARIMA_ORDER_SEARCH``) or on demand (POST /models/sarima/search, which
+queues a background job), never inside a request.
+"""
+import itertools
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+
+from ..config import settings
+from ..utils import metrics
+from ..utils.log import get_logger, log_event
+from .executor import QueueFullError, call_when_free, get_executor
+from .sarima_state import get_state_store, order_age_days
+from .stock_services import _statsmodels, prepare_history, sarima_fit_options
+
+CRITERIA = ("aic", "bic")
+# how often a running search checks its stop event
+CANCEL_POLL_SECONDS = 0.5
+
+logger = get_logger(__name__)
+
+
+def seasonal_strength(close: np.ndarray, period: int) -> float:
+    """``1 - var(remainder) / var(seasonal + remainder)`` of an STL decomposition, 0 if too short."""
+    if len(close) < 2 * period + 1:
+        return 0.0
+    result = _statsmodels().tsa.STL(close, period=period, robust=True).fit()
+    detrended = result.seasonal + result.resid
+    return max(0.0, 1 - float(np.var(result.resid) / np.var(detrended))) if np.var(detrended) > 0 else 0.0
+
+
+def differencing(view) -> dict:
+    """
+    ``{"d", "D", "periods"}`` for the closes of ``view``: the differencing
+    orders every candidate shares and the seasonal periods left to search.
+    Runs in a pool worker.
+    """
+    sm = _statsmodels()
+    close = np.asarray(view['Close'], dtype=float)
+    d_options = sorted(settings.SARIMA_SEARCH_D)
+    d = d_options[-1]
+    for option in d_options:
+        series = np.diff(close, n=option) if option else close
+        try:
+            p_value = sm.tsa.adfuller(series, autolag="AIC")[1]
+        except Exception:
+            continue
+        if p_value < settings.SARIMA_SEARCH_ADF_ALPHA:
+            d = option
+            break
+
+    periods = list(settings.SARIMA_SEARCH_PERIODS)
+    seasonal_options = set(settings.SARIMA_SEARCH_SEASONAL_D)
+    if 1 in seasonal_options:
+        strengths = {s: seasonal_strength(close, s) for s in periods}
+        strongest = max(periods, key=strengths.get)
+        if 0 not in seasonal_options or strengths[strongest] >= settings.SARIMA_SEARCH_SEASONAL_STRENGTH:
+            return {"d": d, "D": 1, "periods": [strongest]}
+    return {"d": d, "D": 0, "periods": periods}
+
+
+def candidates(d: int, D: int, periods) -> list:
+    """``(order, seasonal_order)`` pairs of the configured grid for fixed differencing orders."""
+    grid = []
+    for p, q in itertools.product(settings.SARIMA_SEARCH_P, settings.SARIMA_SEARCH_Q):
+        for P, Q, s in itertools.product(settings.SARIMA_SEARCH_SEASONAL_P, settings.SARIMA_SEARCH_SEASONAL_Q, periods):
+            seasonal = (P, D, Q, s) if (P, D, Q) != (0, 0, 0) else (0, 0, 0, 0)
+            if ((p, d, q), seasonal) not in grid:
+                grid.append(((p, d, q), seasonal))
+    return grid
+
+
+def fit_candidate(view, order, seasonal_order, maxiter: int = None) -> dict:
+    """AIC and BIC of one candidate on the closes of ``view``; runs in a pool worker."""
+    sm = _statsmodels()
+    model = sm.tsa.statespace.SARIMAX(
+        np.asarray(view['Close'], dtype=float),
+        order=order,
+        seasonal_order=seasonal_order,
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    )
+    try:
+        result = model.fit(disp=False, **sarima_fit_options(), **({"maxiter": maxiter} if maxiter else {}))
+        aic, bic = float(result.aic), float(result.bic)
+    except Exception:
+        aic = bic = math.inf
+    return {"order": list(order), "seasonal_order": list(seasonal_order), "aic": aic, "bic": bic}
+
+
+def _fit_all(view, grid, maxiter, deadline: float, cancel: threading.Event = None) -> list:
+    """Fit ``grid`` in the pool, at most one task per worker at a time; only fits done by ``deadline``."""
+    stop = threading.Event()
+    threads = ThreadPoolExecutor(max_workers=get_executor().workers, thread_name_prefix="sarima-search")
+
+    def fit(order, seasonal_order):
+        # the wait for a free worker may have outlasted the budget
+        if stop.is_set() or time.monotonic() >= deadline or (cancel is not None and cancel.is_set()):
+            return None
+        return call_when_free(fit_candidate, view, order, seasonal_order, maxiter, stop=stop)
+
+    futures = [threads.submit(fit, order, seasonal_order) for order, seasonal_order in grid]
+    done, pending = set(), set(futures)
+    # waits in short slices, so that ``cancel`` ends the search as soon as the deadline does
+    while pending and not (cancel is not None and cancel.is_set()):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        finished, pending = wait(pending, timeout=min(remaining, CANCEL_POLL_SECONDS))
+        done |= finished
+    stop.set()
+    # fits already running in the pool finish there; their results are not waited for
+    threads.shutdown(wait=False, cancel_futures=True)
+    fits = []
+    for future in done:
+        try:
+            fit_result = future.result()
+        except QueueFullError:
+            continue
+        if fit_result is not None:
+            fits.append(fit_result)
+    return fits
+
+
+@metrics.timed("sarima_search")
+def search_orders(symbol: str, start: str = None, end: str = None, criterion: str = None,
+                  budget_seconds: float = None, stop: threading.Event = None) -> dict:
+    """
+    Picks the SARIMA orders of ``symbol`` on the bars of one window and
+    stores them. Returns the selection; raises ValueError if no candidate
+    could be fitted within the budget. Setting ``stop`` ends the search
+    early, the same way as the deadline.
+    """
+    criterion = (criterion or settings.SARIMA_SEARCH_CRITERION).lower()
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of: {', '.join(CRITERIA)}")
+    budget = budget_seconds if budget_seconds is not None else settings.SARIMA_SEARCH_BUDGET_SECONDS
+    started = time.monotonic()
+    deadline = started + budget
+
+    view = call_when_free(prepare_history, symbol, start, end, stop=stop)
+    orders = call_when_free(differencing, view, stop=stop)
+    grid = candidates(orders["d"], orders["D"], orders["periods"])
+    probes = sorted(
+        (f for f in _fit_all(view, grid, settings.SARIMA_SEARCH_PROBE_ITER, deadline, stop)
+         if math.isfinite(f[criterion])),
+        key=lambda f: f[criterion],
+    )
+    keep = probes[:max(1, math.ceil(len(grid) * settings.SARIMA_SEARCH_KEEP))]
+    fits = _fit_all(view, [(tuple(f["order"]), tuple(f["seasonal_order"])) for f in keep], None, deadline, stop)
+    fits = sorted((f for f in fits if math.isfinite(f[criterion])), key=lambda f: f[criterion])
+    if not fits:
+        raise ValueError(f"No SARIMA candidate fitted within {budget:g}s")
+
+    best = fits[0]
+    selection = {
+        "order": best["order"],
+        "seasonal_order": best["seasonal_order"],
+        "criterion": criterion,
+        "score": round(best[criterion], 2),
+        "searched_at": datetime.now().isoformat(timespec="seconds"),
+        "window": [start, end],
+        "differencing": {"d": orders["d"], "D": orders["D"]},
+        "candidates": len(grid),
+        "probed": len(probes),
+        "fitted": len(fits),
+        "seconds": round(time.monotonic() - started, 1),
+    }
+    get_state_store().put_orders(symbol, selection)
+    log_event(logger, "sarima_orders_selected", symbol=symbol, **selection)
+    return selection
+
+
+def search_due(symbol: str) -> bool:
+    """Searched never, or over half of ``SARIMA_ORDER_TTL_DAYS`` ago (so the pick is renewed before it expires)."""
+    selection = get_state_store().get_orders(symbol)
+    return selection is None or order_age_days(selection) > settings.SARIMA_ORDER_TTL_DAYS / 2
+
+
+def search_many(symbols, start: str, end: str, stop: threading.Event = None) -> dict:
+    """``search_orders`` for each of ``symbols`` that is due, one after the other; failures are logged."""
+    selections = {}
+    for symbol in symbols:
+        if stop is not None and stop.is_set():
+            break
+        if not search_due(symbol):
+            continue
+        try:
+            selections[symbol] = search_orders(symbol, start, end, stop=stop)
+        except Exception as e:
+            log_event(logger, "sarima_search_failed", logging.WARNING, symbol=symbol, error=str(e))
+    return selections
@@ -0,0 +1,112 @@
+"""
+Per-symbol SARIMA state.
+
+Stores the fitted parameters of the last full (MLE) SARIMA fit of each
+symbol as JSON under ``SARIMA_STATE_DIR``. Later requests rebuild the
+state-space model on the current bars and run the Kalman filter with the
+stored parameters instead of refitting. ``needs_refit`` decides when a full
+fit is due again: after ``SARIMA_REFIT_AFTER_BARS`` new bars, once the fit
+is older than ``SARIMA_REFIT_MAX_AGE_DAYS``, when the model orders changed,
+or when the per-observation log-likelihood on the new data dropped by more
+than ``SARIMA_REFIT_LLF_DROP`` (the fit has degraded).
+
+The orders picked by an order search (sarima_search) are stored next to
+the state, per symbol, and replace the configured ones until they are
+``SARIMA_ORDER_TTL_DAYS`` old.
+"""
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from ..config import settings
+from ..utils.helper import safe_filename
+
+ORDERS = ".orders"
+
+
+class SarimaStateStore:
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.SARIMA_STATE_DIR
+
+    def _path(self, symbol: str, kind: str = "") -> str:
+        return os.path.join(self.directory, f"{safe_filename(symbol)}{kind}.json")
+
+    def get(self, symbol: str, kind: str = ""):
+        try:
+            with open(self._path(symbol, kind)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, symbol: str, state: dict, kind: str = ""):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".json.tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self._path(symbol, kind))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get_orders(self, symbol: str):
+        """The search result stored for ``symbol`` (any age), or None."""
+        return self.get(symbol, ORDERS)
+
+    def put_orders(self, symbol: str, selection: dict):
+        self.put(symbol, selection, ORDERS)
+
+    def selected_orders(self, symbol: str):
+        """``(order, seasonal_order)`` picked for ``symbol`` if not expired, else None."""
+        selection = self.get_orders(symbol)
+        if selection is None or order_age_days(selection) > settings.SARIMA_ORDER_TTL_DAYS:
+            return None
+        return tuple(selection["order"]), tuple(selection["seasonal_order"])
+
+    def invalidate(self, symbol: str) -> bool:
+        try:
+            os.remove(self._path(symbol))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+def fitted_state(result, order, seasonal_order, last_date) -> dict:
+    """State to store after a full fit."""
+    return {
+        "order": list(order),
+        "seasonal_order": list(seasonal_order),
+        "params": [float(p) for p in result.params],
+        "fitted_at": datetime.now().isoformat(timespec="seconds"),
+        "fit_last_date": str(last_date)[:10],
+        "llf_per_obs": float(result.llf / result.nobs),
+    }
+
+
+def order_age_days(selection: dict) -> float:
+    return (datetime.now() - datetime.fromisoformat(selection["searched_at"])).total_seconds() / 86400
+
+
+def needs_refit(state, order, seasonal_order, new_bars: int, llf_per_obs: float = None) -> bool:
+    if state is None:
+        return True
+    if tuple(state["order"]) != tuple(order) or tuple(state["seasonal_order"]) != tuple(seasonal_order):
+        return True
+    if new_bars >= settings.SARIMA_REFIT_AFTER_BARS:
+        return True
+    if datetime.now() - datetime.fromisoformat(state["fitted_at"]) > timedelta(days=settings.SARIMA_REFIT_MAX_AGE_DAYS):
+        return True
+    if llf_per_obs is not None and state["llf_per_obs"] - llf_per_obs > settings.SARIMA_REFIT_LLF_DROP:
+        return True
+    return False
+
+
+_store = None
+
+
+def get_state_store() -> SarimaStateStore:
+    global _store
+    if _store is None:
+        _store = SarimaStateStore()
+    return _store
@@ -0,0 +1,304 @@
+"""
+Post-market precompute for the watchlist.
+
+Every weekday, ``PRECOMPUTE_DELAY_MINUTES`` after the market close, the
+symbols in ``WATCHLIST`` are refreshed in one bulk download, then each is
+analysed in the process pool with XGBoost retrained and SARIMA refitted,
+``PRECOMPUTE_CONCURRENCY`` symbols at a time. Results go to the result
+store, where /stock picks them up the next morning. With
+``SIGNAL_MODE=panel`` the panel signal model is retrained on
+``PANEL_UNIVERSE`` first, so the precomputed signals already use it, and
+with ``SARIMA_ORDER_SEARCH`` the SARIMA orders of watchlist symbols whose
+pick is due are searched again before their refit.
+
+Progress is recorded per session and symbol in SQLite (``PRECOMPUTE_DB``).
+A run interrupted by a crash or restart is resumed on the next start with
+the symbols that are not done yet; a run missed while the server was down
+is caught up as soon as it starts.
+
+Each server process starts a scheduler, but a session is run by one of
+them only: the one that takes the session's lease (a conditional UPDATE of
+its ``runs`` row). It renews the lease while it runs; the others wait and
+take over if it is not renewed for ``PRECOMPUTE_LEASE_SECONDS``.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from ..config import settings
+from ..utils.log import get_logger, log_event
+from .executor import call_when_free
+from .panel_model import get_panel_store
+from .result_store import get_result_store
+from .sarima_search import search_many
+from .stock_services import fetch_historical_many, precompute_stock, train_panel_model
+
+DONE = "done"
+FAILED = "failed"
+RUNNING = "running"
+
+logger = get_logger(__name__)
+
+
+def _run_at(session: date) -> datetime:
+    close_h, close_m = (int(part) for part in settings.MARKET_CLOSE.split(':'))
+    close = datetime(session.year, session.month, session.day, close_h, close_m, tzinfo=ZoneInfo(settings.MARKET_TIMEZONE))
+    return close + timedelta(minutes=settings.PRECOMPUTE_DELAY_MINUTES)
+
+
+def due_session(now: datetime = None):
+    """Latest weekday whose precompute time has passed."""
+    now = now or datetime.now(ZoneInfo(settings.MARKET_TIMEZONE))
+    session = date.fromisoformat(str(np.busday_offset(now.date(), 0, roll='backward')))
+    if _run_at(session) > now:
+        session = date.fromisoformat(str(np.busday_offset(session, -1)))
+    return session
+
+
+def next_session(session: date) -> date:
+    return date.fromisoformat(str(np.busday_offset(session, 1)))
+
+
+def session_window(session: date):
+    """
+    Window computed for a session: the default /stock window (365 days up to
+    today) as it looks on the next trading day, when the results are served.
+    """
+    end = next_session(session)
+    return (end - timedelta(days=settings.PRECOMPUTE_LOOKBACK_DAYS)).isoformat(), end.isoformat()
+
+
+def panel_window(session: date):
+    """Training window of the panel model for a session: ``PANEL_TRAIN_DAYS`` up to the next trading day."""
+    end = next_session(session)
+    return (end - timedelta(days=settings.PANEL_TRAIN_DAYS)).isoformat(), end.isoformat()
+
+
+class PrecomputeScheduler:
+    def __init__(self, symbols=None, concurrency: int = None, db_path: str = None):
+        self.symbols = list(symbols if symbols is not None else settings.WATCHLIST)
+        self.concurrency = concurrency or settings.PRECOMPUTE_CONCURRENCY
+        self.db_path = db_path or settings.PRECOMPUTE_DB
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._db() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " session TEXT PRIMARY KEY, started REAL, finished REAL, total INTEGER, owner TEXT, lease REAL)"
+            )
+            existing = {row[1] for row in db.execute("PRAGMA table_info(runs)")}
+            for name, declaration in (("owner", "TEXT"), ("lease", "REAL")):
+                if name not in existing:
+                    db.execute(f"ALTER TABLE runs ADD COLUMN {name} {declaration}")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS progress ("
+                " session TEXT, symbol TEXT, status TEXT, error TEXT, updated REAL,"
+                " PRIMARY KEY (session, symbol))"
+            )
+
+    @contextmanager
+    def _db(self):
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="precompute", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            session = due_session()
+            if not self.finished(session):
+                try:
+                    if not self.run(session):
+                        # another process holds the lease; take over if it stops renewing it
+                        self._stop.wait(settings.PRECOMPUTE_LEASE_SECONDS / 2)
+                except Exception as e:
+                    log_event(logger, "precompute_failed", logging.ERROR, session=session, error=str(e))
+                    self._stop.wait(300)
+                continue
+            wait = (_run_at(next_session(session)) - datetime.now(ZoneInfo(settings.MARKET_TIMEZONE))).total_seconds()
+            # wake up regularly so clock changes or a long suspend cannot delay a run by much
+            self._stop.wait(min(max(wait, 1.0), 900))
+
+    def finished(self, session: date) -> bool:
+        with self._db() as db:
+            row = db.execute("SELECT finished FROM runs WHERE session = ?", (session.isoformat(),)).fetchone()
+        return row is not None and row[0] is not None
+
+    def _acquire(self, session: date) -> bool:
+        """Take or renew the lease of ``session``; False while another process holds it or the run is finished."""
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO runs (session, started, finished, total) VALUES (?, ?, NULL, ?)",
+                (session.isoformat(), now, len(self.symbols)),
+            )
+            return db.execute(
+                "UPDATE runs SET owner = ?, lease = ? WHERE session = ? AND finished IS NULL"
+                " AND (owner IS NULL OR owner = ? OR lease IS NULL OR lease < ?)",
+                (self.owner, now + settings.PRECOMPUTE_LEASE_SECONDS, session.isoformat(), self.owner, now),
+            ).rowcount == 1
+
+    def _release(self, session: date):
+        with self._db() as db:
+            db.execute(
+                "UPDATE runs SET owner = NULL, lease = NULL WHERE session = ? AND owner = ?",
+                (session.isoformat(), self.owner),
+            )
+
+    def _renew(self, session: date, done: threading.Event):
+        while not done.wait(settings.PRECOMPUTE_LEASE_SECONDS / 4):
+            try:
+                if not self._acquire(session):
+                    log_event(logger, "precompute_lease_lost", logging.WARNING, session=session)
+                    return
+            except sqlite3.Error as e:
+                log_event(logger, "precompute_lease_renewal_failed", logging.WARNING, session=session, error=str(e))
+
+    def _mark(self, session: date, symbol: str, status: str, error: str = None):
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO progress (session, symbol, status, error, updated) VALUES (?, ?, ?, ?, ?)",
+                (session.isoformat(), symbol, status, error, time.time()),
+            )
+
+    def run(self, session: date) -> bool:
+        """
+        Precompute every watchlist symbol not yet done for ``session``, if
+        this process gets the session's lease; returns whether it did.
+        """
+        if not self._acquire(session):
+            return False
+        done = threading.Event()
+        renewal = threading.Thread(target=self._renew, args=(session, done), name="precompute-lease", daemon=True)
+        renewal.start()
+        try:
+            self._run(session)
+        finally:
+            done.set()
+            renewal.join()
+            self._release(session)
+        return True
+
+    def _run(self, session: date):
+        key = session.isoformat()
+        with self._db() as db:
+            done = {row[0] for row in db.execute(
+                "SELECT symbol FROM progress WHERE session = ? AND status = ?", (key, DONE)
+            )}
+        todo = [symbol for symbol in self.symbols if symbol not in done]
+        if settings.SIGNAL_MODE == "panel":
+            self._train_panel(session)
+        start, end = session_window(session)
+        if todo and settings.SARIMA_ORDER_SEARCH:
+            search_many(todo, start, end, stop=self._stop)
+        if todo:
+            log_event(logger, "precompute_started", session=key, todo=len(todo), total=len(self.symbols))
+            # one bulk download refreshes the whole watchlist before the analysis
+            fetch_historical_many(todo, start, end, warmup=True)
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                list(pool.map(lambda symbol: self._precompute(session, symbol, start, end), todo))
+        if self._stop.is_set():
+            return  # resumed on the next start
+        with self._db() as db:
+            db.execute("UPDATE runs SET finished = ? WHERE session = ?", (time.time(), key))
+            counts = dict(db.execute(
+                "SELECT status, COUNT(*) FROM progress WHERE session = ? GROUP BY status", (key,)
+            ).fetchall())
+            errors = sorted({row[0] for row in db.execute(
+                "SELECT error FROM progress WHERE session = ? AND status = ?", (key, FAILED)
+            )})
+        log_event(logger, "precompute_finished", session=key, counts=counts)
+        if counts.get(FAILED) and not counts.get(DONE):
+            # nothing will be served from this run
+            log_event(logger, "precompute_run_failed", logging.ERROR, session=key, failed=counts[FAILED], errors=errors[:5])
+
+    def _train_panel(self, session: date):
+        entry = get_panel_store().get()
+        if entry is not None and entry["as_of"] == session.isoformat():
+            return  # already trained before a restart
+        start, end = panel_window(session)
+        try:
+            call_when_free(train_panel_model, settings.PANEL_UNIVERSE, start, end, session.isoformat(), stop=self._stop)
+        except Exception as e:
+            # the previous model (if any) keeps serving
+            if not self._stop.is_set():
+                log_event(logger, "panel_training_failed", logging.WARNING, session=session, error=str(e))
+
+    def _precompute(self, session: date, symbol: str, start: str, end: str):
+        if self._stop.is_set():
+            return
+        self._mark(session, symbol, RUNNING)
+        try:
+            result = call_when_free(precompute_stock, symbol, start, end, stop=self._stop)
+            get_result_store().put(symbol, result, as_of=session)
+            self._mark(session, symbol, DONE)
+        except Exception as e:
+            if not self._stop.is_set():
+                self._mark(session, symbol, FAILED, str(e))
+                log_event(logger, "precompute_symbol_failed", logging.WARNING, session=session, symbol=symbol, error=str(e))
+
+    def status(self) -> dict:
+        """Latest run: session, timings and symbol counts per status."""
+        with self._db() as db:
+            run = db.execute(
+                "SELECT session, started, finished, total FROM runs ORDER BY session DESC LIMIT 1"
+            ).fetchone()
+            if run is None:
+                return {"watchlist": self.symbols, "last_run": None}
+            counts = dict(db.execute(
+                "SELECT status, COUNT(*) FROM progress WHERE session = ? GROUP BY status", (run[0],)
+            ).fetchall())
+            failed = dict(db.execute(
+                "SELECT symbol, error FROM progress WHERE session = ? AND status = ?", (run[0], FAILED)
+            ).fetchall())
+        return {
+            "watchlist": self.symbols,
+            "last_run": {
+                "session": run[0], "started": run[1], "finished": run[2], "total": run[3],
+                "counts": counts, "failed": failed,
+            },
+        }
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """Start the precompute scheduler if a watchlist (or a panel universe in panel mode) is configured."""
+    global _scheduler
+    panel = settings.SIGNAL_MODE == "panel" and settings.PANEL_UNIVERSE
+    if _scheduler is None and (settings.WATCHLIST or panel):
+        _scheduler = PrecomputeScheduler()
+        _scheduler.start()
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+def stop_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
@@ -0,0 +1,98 @@
+"""
+Request coalescing ("single flight") for identical in-flight computations.
+
+When several callers ask for the same key while a computation for it is still
+running, only the first one starts it; the others are attached to the same
+result. Every caller gets its own future, so cancelling one of them (an async
+request whose client disconnected, a thread giving up) does not affect the
+others. The shared computation itself is cancelled only once every caller
+has cancelled.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+from ..utils import metrics
+
+
+class _Flight:
+    def __init__(self, shared: Future):
+        self.shared = shared
+        self.callers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.RLock()  # done callbacks may run inline under it
+        self._flights = {}
+        self._started = 0
+        self._coalesced = 0
+
+    def submit(self, key, start) -> Future:
+        """
+        Future for the computation behind ``key``. ``start()`` is called to
+        launch it (and must return a concurrent.futures.Future) only when no
+        computation for ``key`` is in flight. Errors raised by ``start`` go
+        to the caller and nothing is registered.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = _Flight(start())
+                self._flights[key] = flight
+                self._started += 1
+                flight.shared.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            else:
+                self._coalesced += 1
+            metrics.cache_event("in_flight", hit=flight.callers > 0)
+            flight.callers += 1
+        return self._follow(key, flight)
+
+    def _follow(self, key, flight: _Flight) -> Future:
+        caller = Future()
+
+        def relay(shared):
+            try:
+                if shared.cancelled():
+                    caller.cancel()
+                elif shared.exception() is not None:
+                    caller.set_exception(shared.exception())
+                else:
+                    caller.stage_timings = getattr(shared, "stage_timings", [])
+                    caller.set_result(shared.result())
+            except InvalidStateError:
+                pass  # this caller already cancelled
+
+        def on_caller_done(f):
+            if not f.cancelled():
+                return
+            with self._lock:
+                flight.callers -= 1
+                abandoned = flight.callers == 0
+                if abandoned and self._flights.get(key) is flight:
+                    # a new caller for the key must not join a cancelled computation
+                    del self._flights[key]
+            if abandoned:
+                flight.shared.cancel()
+
+        caller.add_done_callback(on_caller_done)
+        flight.shared.add_done_callback(relay)
+        return caller
+
+    def _forget(self, key, flight: _Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "started": self._started,
+                "coalesced": self._coalesced,
+            }
+
+
+async def wait(future: Future):
+    """Await a caller future from async code; cancelling the await cancels only this caller."""
+    return await asyncio.wrap_future(future)
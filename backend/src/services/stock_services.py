@@ -1,146 +1,296 @@
 import pandas as pd
 import numpy as np
-import yfinance as yf
+from concurrent.futures import Future
+from functools import partial
 from datetime import datetime, timedelta
+import logging
+import math
 import warnings
-from sklearn.preprocessing import StandardScaler
-from imblearn.over_sampling import SMOTE
-from xgboost import XGBClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import pandas_ta as ta
-import statsmodels.api as sm
-import ssl, certifi, os
+from ..config import settings
+from .ohlcv_cache import get_cache, last_settled_date
+from .indicator_engine import FRAME_DTYPE, ohlcv_bars, update_indicators
+from .feature_store import SIGNAL_FEATURES, FeatureView, get_feature_store
+from .panel_model import SIGNAL_LABELS, get_panel_store, normalize, predict_signals, summary, symbol_stats
+from .model_cache import fingerprint, get_model_cache
+from .sarima_state import fitted_state, get_state_store, needs_refit
+from .result_store import get_result_store
+from .executor import get_executor
+from . import forecast_engine
+from .singleflight import SingleFlight
+from . import indicator_kernels as kernels
+from .timeframes import features_for, higher_timeframe_features, warmup_days
+from .intraday import DAILY, INTERVALS, MIN_DAYS, get_intraday_store, session_minutes
+from ..utils import metrics
+from ..utils.helper import to_ticker
+from ..utils.log import get_logger, log_event
 warnings.filterwarnings("ignore")
 
-os.environ['SSL_CERT_FILE'] = certifi.where()
-os.environ["REQUESTS_CA_BUNDLE"] = certifi.where()
-ssl._create_default_https_context = ssl.create_default_context(cafile=certifi.where())
+if settings.LEAN_MODE:
+    # slices, assign, dropna and reset_index share memory with their source until one of them is written
+    pd.set_option("mode.copy_on_write", True)
 
 
-def fetch_historical_yfinance(symbol: str, start: str, end: str) -> pd.DataFrame:
-  
-    ticker = symbol.upper() + ".NS" if not symbol.upper().endswith(".NS") else symbol
+def _parse_range(start: str, end: str, interval: str = DAILY):
     start_date = datetime.strptime(start, "%Y-%m-%d")
     end_date = datetime.strptime(end, "%Y-%m-%d")
 
+    # intraday bars need fewer days for the same number of bars (see intraday.MIN_DAYS)
+    if (end_date - start_date).days < MIN_DAYS[interval]:
+        raise ValueError(f"Select a date range of at least {MIN_DAYS[interval]} days")
+    return start_date.date(), end_date.date()
 
-    if (end_date - start_date).days < 365: 
-        raise ValueError("Select a date range of at least 365 days") 
-    
-    yf_end = end_date + timedelta(days=1) 
-    df = yf.download(ticker, start=start, end=yf_end, progress=False) 
-    if isinstance(df.columns, pd.MultiIndex):
-        df.columns = df.columns.droplevel(level=1)
-    df = df.reset_index()
-    if 'Adj Close' in df.columns:
-        df = df.drop(columns=['Adj Close'])
-    
-    return df
 
+def series_key(symbol: str, interval: str = DAILY) -> str:
+    """Key of a symbol's bars of ``interval`` in the feature store and the model and SARIMA caches."""
+    return symbol if interval == DAILY else f"{symbol}@{interval}"
 
-def build_indicators(df):
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date').reset_index(drop=True)
-
-    df.dropna(subset=['Close', 'Volume'], inplace=True)
-    df = df.reset_index(drop=True)
-
-   
-    df['RSI_D'] = ta.rsi(df['Close'], length=14)
-    macd = ta.macd(df['Close'])
-    if macd is not None:
-        df['MACD_D'] = macd.iloc[:, 0]
-        df['MACD_SIGNAL_D'] = macd.iloc[:, 1]
-    df['ADX'] = ta.adx(df['High'], df['Low'], df['Close'])['ADX_14']
-    stoch = ta.stoch(df['High'], df['Low'], df['Close'])
-    if stoch is not None:
-        df['STOCH_K'] = stoch['STOCHk_14_3_3']
-        df['STOCH_D'] = stoch['STOCHd_14_3_3']
-    df['ATR'] = ta.atr(df['High'], df['Low'], df['Close'], length=14)
-    df['MFI'] = ta.mfi(df['High'], df['Low'], df['Close'], df['Volume'], length=14)
-    df['Return'] = df['Close'].pct_change()
-    df['Lag1'] = df['Return'].shift(1)
-    df['Lag3'] = df['Return'].shift(3)
-    df['Lag5'] = df['Return'].shift(5)
-    df['Volatility10'] = df['Return'].rolling(10).std()
-    df['Volatility05'] = df['Return'].rolling(5).std()
-    df['EMA5'] = df['Close'].ewm(span=5).mean()
-    df['EMA10'] = df['Close'].ewm(span=10).mean()
-
-  
-    df['Week'] = df['Date'].dt.to_period('W')
-    df['Month'] = df['Date'].dt.to_period('M')
 
+def warmup_start(start: str, interval: str = DAILY) -> str:
+    """Start of the bars loaded for a window beginning at ``start``: ``warmup_days`` earlier (see timeframes.py)."""
+    return (datetime.strptime(start, "%Y-%m-%d") - timedelta(days=warmup_days(interval))).strftime("%Y-%m-%d")
 
-    
-    df_w = df.resample('W', on='Date').agg({
-        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
-    }).dropna() # Drop any incomplete weekly periods
-    macd_w = ta.macd(df_w['Close']) 
-    df_w['MACD_W'] = macd_w.iloc[:, 0]
-    df_w['MACD_SIGNAL_W'] = macd_w.iloc[:, 1]
-    df_w['RSI_W'] = ta.rsi(df_w['Close'], 14)
-    df_w['Week'] = df_w.index.to_period('W') # Use the index period for merging
 
-    
-    df_m = df.resample('M', on='Date').agg({
-        'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'
-    }).dropna() 
-    macd_m = ta.macd(df_m['Close'], fast=6, slow=13, signal=5) 
-    df_m['MACD_M'] = macd_m.iloc[:, 0]
-    df_m['MACD_SIGNAL_M'] = macd_m.iloc[:, 1]
-    df_m['RSI_M'] = ta.rsi(df_m['Close'], 14)
-    df_m['Month'] = df_m.index.to_period('M') 
-
-   
-    df = df.merge(df_w[['Week','RSI_W','MACD_W','MACD_SIGNAL_W']], on='Week', how='left')
-    df = df.merge(df_m[['Month','RSI_M','MACD_M','MACD_SIGNAL_M']], on='Month', how='left')
-
-    # ---------------- Drop helper columns & fill NaNs ----------------
-    df.drop(columns=['Week','Month'], inplace=True)
-    
-    df.fillna(method='bfill', inplace=True) 
-    df.fillna(method='ffill', inplace=True) 
-    df = df.reset_index(drop=True)
+logger = get_logger(__name__)
+
+
+@metrics.timed("fetch")
+def fetch_historical_yfinance(symbol: str, start: str, end: str, interval: str = DAILY,
+                              warmup: bool = False) -> pd.DataFrame:
+    """
+    OHLCV bars of ``symbol`` from ``start`` to ``end``; with ``warmup`` from
+    ``warmup_start`` on, for ``load_features(..., start=start)`` to trim.
+    """
+    ticker = to_ticker(symbol)
+    start_date, end_date = _parse_range(start, end, interval)
+    if warmup:
+        start_date = datetime.strptime(warmup_start(start, interval), "%Y-%m-%d").date()
+
+    if interval != DAILY:
+        # Intraday bars only come from ingested minute files (services/intraday.py)
+        return get_intraday_store().window(ticker, interval, start_date, end_date)
+
+    # Served from the local OHLCV cache; only missing date ranges hit the provider
+    df = get_cache().get(ticker, start_date, end_date)
+
+    return df
+
+
+@metrics.timed("fetch")
+def fetch_historical_many(symbols, start: str, end: str, interval: str = DAILY, warmup: bool = False) -> dict:
+    """
+    Bulk variant of fetch_historical_yfinance: one provider call covers every
+    symbol with missing data. Returns {symbol: DataFrame}.
+    """
+    start_date, end_date = _parse_range(start, end, interval)
+    if warmup:
+        start_date = datetime.strptime(warmup_start(start, interval), "%Y-%m-%d").date()
+    tickers = {symbol: to_ticker(symbol) for symbol in symbols}
+    if interval != DAILY:
+        store = get_intraday_store()
+        return {symbol: store.window(ticker, interval, start_date, end_date) for symbol, ticker in tickers.items()}
+    frames = get_cache().get_many(list(tickers.values()), start_date, end_date)
+    return {symbol: frames[ticker] for symbol, ticker in tickers.items()}
+
+
+def _feature(values) -> np.ndarray:
+    return np.asarray(values, dtype=FRAME_DTYPE)
+
+
+def build_indicators(df, interval: str = DAILY):
+    df = ohlcv_bars(df)
+
+    high = df['High'].to_numpy(dtype=float)
+    low = df['Low'].to_numpy(dtype=float)
+    close = df['Close'].to_numpy(dtype=float)
+    volume = df['Volume'].to_numpy(dtype=float)
+
+    # computed in float64, stored as FRAME_DTYPE (float32 in lean mode)
+    df['RSI_D'] = _feature(kernels.rsi(close, length=14))
+    # pandas_ta column order: MACD, histogram, signal (MACD_SIGNAL_D keeps column 1)
+    macd, macd_hist, _ = kernels.macd(close)
+    df['MACD_D'] = _feature(macd)
+    df['MACD_SIGNAL_D'] = _feature(macd_hist)
+    df['ADX'] = _feature(kernels.adx(high, low, close, length=14)[0])
+    stoch_k, stoch_d = kernels.stoch(high, low, close)
+    df['STOCH_K'], df['STOCH_D'] = _feature(stoch_k), _feature(stoch_d)
+    df['ATR'] = _feature(kernels.atr(high, low, close, length=14))
+    df['MFI'] = _feature(kernels.mfi(high, low, close, volume, length=14))
+    returns = pd.Series(close).pct_change()
+    df['Return'] = _feature(returns)
+    df['Lag1'] = _feature(returns.shift(1))
+    df['Lag3'] = _feature(returns.shift(3))
+    df['Lag5'] = _feature(returns.shift(5))
+    df['Volatility10'] = _feature(returns.rolling(10).std())
+    df['Volatility05'] = _feature(returns.rolling(5).std())
+    df['EMA5'] = _feature(kernels.ema(close, span=5))
+    df['EMA10'] = _feature(kernels.ema(close, span=10))
+
+    # weekly / monthly features (hourly / daily for intraday bars) from completed periods only (see timeframes.py)
+    features = features_for(interval)
+    for column, values in higher_timeframe_features(df['Date'].to_numpy(), close, features).items():
+        df[column] = _feature(values)
+
+    # forward fill only: a backward fill would copy later values into the warm-up rows
+    df.ffill(inplace=True)
 
-    
     return df
 
-def generate_xgboost_signal(df):
+@metrics.timed("xgboost")
+def generate_xgboost_signal(df, symbol: str = None, retrain: bool = False, interval: str = DAILY):
     """
     Generates a trading signal using an XGBoost classifier, 
     adopting the signal and model training/evaluation logic 
     from the second code snippet.
+
+    With a ``symbol`` the trained scaler and model are cached by symbol,
+    features and training window, so the same window skips training.
+    ``retrain=True`` trains again and replaces the cached entry.
+
+    ``df`` is an indicator frame or a FeatureView; it is only read, so
+    callers can pass shared data without copying it.
+
+    With ``SIGNAL_MODE=panel`` and a trained panel model nothing is trained
+    here: the latest row is classified by the panel model. The panel model
+    is trained on daily bars; intraday bars (``interval``) always get their
+    own model, cached under ``series_key``.
     """
     
-    df['Future_Max'] = df['Close'].shift(-3).rolling(3).max()
-    df['Future_Min'] = df['Close'].shift(-3).rolling(3).min()
-    future_return = (df['Future_Max'] - df['Close']) / df['Close']
-    future_loss = (df['Future_Min'] - df['Close']) / df['Close']
-    # Signal: 1 (Buy) if a 2% gain is possible, -1 (Sell) if a 2% loss is possible, 0 (Hold) otherwise
-    df['Signal'] = np.where(future_return > 0.02, 1, np.where(future_loss < -0.02, -1, 0))
+    features = list(SIGNAL_FEATURES)
+    X, y = signal_dataset(df, interval)
+    symbol = series_key(symbol, interval) if symbol else None
+
+    if settings.SIGNAL_MODE == "panel" and interval == DAILY:
+        entry = get_panel_store().get()
+        metrics.cache_event("panel_model", hit=entry is not None)
+        if entry is not None:
+            if not len(X):
+                raise ValueError("Not enough history for the signal features")
+            return predict_signals(entry, {symbol: (X, X[-1:])})[symbol]
+
+    cache = get_model_cache()
+    cache_key = fingerprint(symbol, features, X, y) if symbol else None
+    entry = cache.get(cache_key) if cache_key and not retrain else None
+    if cache_key and not retrain:
+        metrics.cache_event("xgboost_model", hit=entry is not None)
+    if entry is None:
+        check_training_rows(X)
+        entry = _train_xgboost(X, y)
+        if cache_key:
+            cache.put(cache_key, dict(entry, symbol=symbol, features=features))
+
+    latest_features = entry["scaler"].transform(X[-1:])
+    latest_pred = entry["model"].predict(latest_features)[0] - 1
     
-   
-    features = [
-        'RSI_D','MACD_D','MACD_SIGNAL_D','STOCH_K','STOCH_D','ADX',
-        'MFI','ATR','Volatility05','Volatility10','EMA5','EMA10','Lag1','Lag3','Lag5',
-        'RSI_W','MACD_W','MACD_SIGNAL_W','RSI_M','MACD_M','MACD_SIGNAL_M'
-    ]
+    signal = SIGNAL_LABELS.get(latest_pred, "UNKNOWN")
+    
+    return signal
 
-   
-    weekly_monthly = ['RSI_W','MACD_W','MACD_SIGNAL_W','RSI_M','MACD_M','MACD_SIGNAL_M']
-    df[weekly_monthly] = df[weekly_monthly].fillna(method='bfill').fillna(method='ffill')
 
-    
-    df[features] = df[features].apply(pd.to_numeric, errors='coerce')
+# rows with every feature a signal model needs to train on (SMOTE and the 80/20 split need a few of each label)
+MIN_SIGNAL_ROWS = 60
+
+
+def check_training_rows(X: np.ndarray):
+    """Raises ValueError, naming the cause, when ``X`` has too few rows to train the signal model."""
+    if len(X) < MIN_SIGNAL_ROWS:
+        raise ValueError(
+            f"Window too short for the W/M features: {len(X)} bars have every feature, "
+            f"at least {MIN_SIGNAL_ROWS} are needed; choose a longer window"
+        )
 
-   
-    df = df.dropna(subset=features + ['Signal']).reset_index(drop=True)
-    
 
-   
-    X = df[features].to_numpy()
-    y = df['Signal'].to_numpy()
+# bars after the signal bar its label looks at
+LABEL_HORIZON = 3
+# move within LABEL_HORIZON daily bars that makes a BUY / SELL label
+LABEL_THRESHOLD = 0.02
+
+
+def label_threshold(interval: str = DAILY) -> float:
+    """
+    ``LABEL_THRESHOLD`` for bars of ``interval``: scaled with the square
+    root of the bar length, as price moves are, so intraday bars do not
+    label almost every bar HOLD.
+    """
+    if interval == DAILY:
+        return LABEL_THRESHOLD
+    return LABEL_THRESHOLD * math.sqrt(INTERVALS[interval] / session_minutes())
+
+
+def signal_labels(close: np.ndarray, threshold: float = LABEL_THRESHOLD) -> np.ndarray:
+    """Signal label of every bar from the next ``LABEL_HORIZON`` closes (HOLD where they are unknown)."""
+    future = pd.Series(close).shift(-LABEL_HORIZON).rolling(LABEL_HORIZON)
+    future_return = (future.max().to_numpy() - close) / close
+    future_loss = (future.min().to_numpy() - close) / close
+    # Signal: 1 (Buy) if a gain of threshold (2% daily) is possible, -1 (Sell) for such a loss, 0 (Hold) otherwise
+    return np.where(future_return > threshold, 1, np.where(future_loss < -threshold, -1, 0))
+
+
+def signal_dataset(df, interval: str = DAILY):
+    """
+    ``(X, y)`` for the signal model: the feature rows of ``df`` that have
+    every feature (the warm-up rows of the slower indicators are NaN) and
+    their labels.
+    """
+    signal = signal_labels(np.asarray(df['Close'], dtype=float), label_threshold(interval))
+    X = np.asarray(df[SIGNAL_FEATURES])
+    complete = ~np.isnan(X).any(axis=1)
+    return X[complete], signal[complete]
+
+
+def train_panel_model(symbols=None, start: str = None, end: str = None, as_of: str = None) -> dict:
+    """
+    Trains the panel signal model on the stacked, per-symbol normalized
+    features of ``symbols`` (default ``PANEL_UNIVERSE``) over one window and
+    saves it for the live requests. Symbols without data are skipped.
+    Returns the model summary.
+    """
+    symbols = list(symbols or settings.PANEL_UNIVERSE)
+    if not symbols:
+        raise ValueError("No symbols to train the panel model on, set PANEL_UNIVERSE or WATCHLIST")
+    histories = fetch_historical_many(symbols, start, end, warmup=True)
+    blocks, labels, stats = [], [], {}
+    for symbol in symbols:
+        hist = histories[symbol]
+        if hist.empty:
+            continue
+        try:
+            with metrics.stage("indicators"):
+                X, y = signal_dataset(since(build_indicators(hist), start))
+        except Exception as e:
+            log_event(logger, "panel_symbol_skipped", logging.WARNING, symbol=symbol, error=str(e))
+            continue
+        if not len(X):
+            continue
+        stats[symbol] = symbol_stats(X)
+        blocks.append(normalize(X, stats[symbol]))
+        labels.append(y)
+    if not blocks:
+        raise ValueError("No training rows for the panel model")
+
+    X, y = np.vstack(blocks), np.concatenate(labels)
+    check_training_rows(X)
+    entry = _train_xgboost(X, y)
+    entry.update(
+        features=list(SIGNAL_FEATURES),
+        stats=stats,
+        rows=len(X),
+        window=[start, end],
+        as_of=as_of or end,
+        trained_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    get_panel_store().put(entry)
+    log_event(logger, "panel_trained", **summary(entry))
+    return summary(entry)
+
+
+@metrics.timed("xgboost_train")
+def _train_xgboost(X, y) -> dict:
+    # heavy imports are deferred to the first training (see services/preload.py)
+    from imblearn.over_sampling import SMOTE
+    from sklearn.metrics import accuracy_score
+    from sklearn.preprocessing import StandardScaler
+    from xgboost import XGBClassifier
+
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
 
@@ -161,97 +311,361 @@ def generate_xgboost_signal(df):
 
     pred = model.predict(X_test) - 1
     
-   
-    latest_features = X_scaled[-1].reshape(1, -1)
-    latest_pred = model.predict(latest_features)[0] - 1
-    
     acc = accuracy_score(y_test, pred)
-    signal_map = {1: "BUY 📈", 0: "HOLD 🤝", -1: "SELL 📉"}
-    signal = signal_map.get(latest_pred, "UNKNOWN")
-    
-    return signal
 
+    return {"scaler": scaler, "model": model, "accuracy": acc}
 
-def predict_with_sarima(df):
-    
-    results = {}
-    latest_close = df['Close'].iloc[-1]
-    for horizon in [3, 5]:
-        sarima_model = sm.tsa.statespace.SARIMAX(
-            df['Close'],
-            order=(2,1,2),
-            seasonal_order=(1,1,1,12),
-            enforce_stationarity=False,
-            enforce_invertibility=False
-        )
-        sarima_result = sarima_model.fit(disp=False)
-        forecast = sarima_result.forecast(steps=horizon)
-        predicted_price = forecast.iloc[-1]
-        
-        
-        pred_return = ((predicted_price - latest_close) / latest_close) * 100
-        error_pct = abs(predicted_price - latest_close) / latest_close * 100 
-        results[f"{horizon}_Day"] = {
-            "Predicted_Price": round(predicted_price, 2),
-            "Latest_Close": round(latest_close, 2),
-            "Predicted_Return_%": round(pred_return, 2),
-            # Renaming to 'Predicted_Deviation_%' for clarity on current data
-            "Predicted_Deviation_%": round(error_pct, 2), 
-            "AIC": round(sarima_result.aic, 2),
-            "BIC": round(sarima_result.bic, 2)
-        }
-   
-    return results
-
-
-def get_stock(symbol: str, start: str = None, end: str = None) -> dict:
+
+def _statsmodels():
+    """statsmodels.api, imported on first use; importing it turns its warnings back on, so they are ignored again."""
+    import statsmodels.api as sm
+
+    warnings.filterwarnings("ignore")
+    return sm
+
+
+def sarima_fit_options() -> dict:
     """
-    Main function to fetch stock data, build indicators, run XGBoost signal,
-    and get SARIMA predictions.
+    Keyword arguments of every SARIMAX ``fit`` and ``filter``. Only the
+    parameters, the log-likelihood and the forecast are used, so the
+    parameter covariance is skipped (a numerical Hessian, most of the time
+    of a filter with stored parameters).
+    In lean mode the Kalman filter also keeps no per-bar state matrices,
+    which are most of a fit's memory; forecasts and AIC/BIC are the same.
+    """
+    return {"cov_type": "none", "low_memory": settings.LEAN_MODE}
+
+
+@metrics.timed("sarima")
+def predict_with_sarima(df, symbol: str = None, horizons=settings.SARIMA_HORIZONS, refit: bool = False):
+    """
+    One SARIMA fit forecasts every horizon. With a ``symbol`` the fitted
+    parameters are kept and later requests only run the Kalman filter over
+    the current bars; a full refit happens when the policy in sarima_state
+    says so, or always with ``refit=True``. The orders are the ones an
+    order search picked for the symbol, else the configured ones.
+    ``df`` is an indicator frame or a FeatureView.
+    """
+    sm = _statsmodels()
+    close = np.asarray(df['Close'], dtype=float)
+    latest_close = close[-1]
+    store = get_state_store()
+    selected = store.selected_orders(symbol) if symbol else None
+    order, seasonal_order = selected or (settings.SARIMA_ORDER, settings.SARIMA_SEASONAL_ORDER)
+    sarima_model = sm.tsa.statespace.SARIMAX(
+        close,
+        order=order,
+        seasonal_order=seasonal_order,
+        enforce_stationarity=False,
+        enforce_invertibility=False
+    )
+
+    state = store.get(symbol) if symbol else None
+    dates = np.asarray(df['Date'], dtype='datetime64[ns]')
+    sarima_result = None
+    if state is not None and not refit:
+        new_bars = int((dates > np.datetime64(state["fit_last_date"])).sum())
+        if not needs_refit(state, order, seasonal_order, new_bars):
+            # Kalman filter with the stored parameters, no MLE
+            filtered = sarima_model.filter(np.asarray(state["params"]), **sarima_fit_options())
+            if not needs_refit(state, order, seasonal_order, new_bars, filtered.llf / filtered.nobs):
+                sarima_result = filtered
+    if symbol and not refit:
+        metrics.cache_event("sarima_params", hit=sarima_result is not None)
+    if sarima_result is None:
+        with metrics.stage("sarima_fit"):
+            sarima_result = sarima_model.fit(disp=False, **sarima_fit_options())
+        if symbol:
+            store.put(symbol, fitted_state(sarima_result, order, seasonal_order, dates[-1]))
+
+    forecast = np.asarray(sarima_result.forecast(steps=max(horizons)))
+    return forecast_engine.horizon_results(forecast, latest_close, horizons, sarima_result.aic, sarima_result.bic)
+
+
+def predict_prices(df, symbol: str = None, engine: str = None, refit: bool = False, interval: str = DAILY):
     """
+    Price predictions of ``engine`` (``FORECAST_ENGINE`` if omitted): the
+    SARIMA fit, or one of the fast engines of forecast_engine, which keep no
+    per-symbol state. Same layout either way; for intraday bars the
+    horizons count bars of ``interval``.
+    """
+    engine = engine or settings.FORECAST_ENGINE
+    if engine == "sarima":
+        return predict_with_sarima(df, symbol=series_key(symbol, interval) if symbol else None, refit=refit)
+    return forecast_engine.forecast(df['Close'], engine)
+
+
+CHART_COLUMNS = [
+    'Date', 'Open', 'High', 'Low', 'Close', 'Volume', 
+    'RSI_D', 'MACD_D', 'MACD_SIGNAL_D', 'ATR', 'EMA5', 'EMA10'
+]
+
+
+def chart_frame(hist) -> pd.DataFrame:
+    """Chart columns of an indicator frame or FeatureView, as returned under "chart"."""
+    chart = pd.DataFrame({column: np.asarray(hist[column]) for column in CHART_COLUMNS})
+    chart["Date"] = pd.to_datetime(chart["Date"])
+    return chart
+
+
+def since(frame: pd.DataFrame, start: str) -> pd.DataFrame:
+    """Rows of an indicator frame dated ``start`` or later; FeatureView.since for frames."""
+    return frame[frame['Date'] >= pd.Timestamp(start)].reset_index(drop=True)
+
+
+def load_features(symbol: str, hist: pd.DataFrame, interval: str = DAILY, start: str = None):
+    """
+    Indicator features of the OHLCV bars ``hist`` as a read-only FeatureView
+    of the shared feature store. When the store already holds these bars
+    (same first bar, possibly more after them) its rows are used as they
+    are; otherwise the indicators are computed, incrementally where this
+    worker has the state, and published for the other workers.
+    Bars of each ``interval`` are kept apart (``series_key``).
+    With ``start`` the view begins there: ``hist`` holds warm-up bars before
+    it (``fetch_historical_yfinance(..., warmup=True)``), used for the
+    features only.
+    """
+    key = series_key(symbol, interval)
+    bars = ohlcv_bars(hist)
+    store = get_feature_store()
+    view = store.get(key)
+    view = view.match(bars) if view is not None else None
+    metrics.cache_event("features", hit=view is not None)
+    if view is None:
+        build = partial(build_indicators, interval=interval)
+        view = store.put(key, update_indicators(key, bars, build, features_for(interval)))
+    if start is not None:
+        view = view.since(start)
+        if not len(view):
+            raise ValueError("No historical data found")
+    return view
+
+
+def prepare_history(symbol: str, start: str = None, end: str = None, interval: str = DAILY):
+    """
+    First stage of an analysis: OHLCV bars with indicators, as a FeatureView.
+    The XGBoost and SARIMA stages run on its output, so callers can report
+    the chart early; it pickles as a reference to the shared store.
+    """
+    hist = fetch_historical_yfinance(symbol, start, end, interval, warmup=True)
+    if hist.empty:
+        raise ValueError("No historical data found")
+    with metrics.stage("indicators"):
+        return load_features(symbol, hist, interval, start)
+
+
+def analyze_history(symbol: str, hist, signal: str = None, forecast: dict = None, engine: str = None,
+                    interval: str = DAILY, start: str = None) -> dict:
+    """
+    Builds indicators, runs the XGBoost signal and the price predictions of
+    the forecast ``engine`` on already downloaded OHLCV data (or its
+    FeatureView) of ``interval`` bars; bars before ``start`` are only the
+    indicators' warm-up. A ``signal`` or ``forecast`` computed by the caller
+    replaces that step. Errors are reported in the result instead of raised,
+    so one symbol never aborts a batch.
+    """
+    engine = engine or settings.FORECAST_ENGINE
     result = {"symbol": symbol}
     try:
         
-        hist = fetch_historical_yfinance(symbol, start, end)
+        # Shared store first, then the incremental path: only bars newer than the kept state are processed
+        if not isinstance(hist, FeatureView):
+            with metrics.stage("indicators"):
+                hist = load_features(symbol, hist, interval, start)
         
-      
-        hist = build_indicators(hist)
         
-        
-        xgb_result = generate_xgboost_signal(hist.copy()) 
+        xgb_result = signal or generate_xgboost_signal(hist, symbol=symbol, interval=interval)
         
        
-        sarima_result = predict_with_sarima(hist.copy())
+        sarima_result = forecast or predict_prices(hist, symbol=symbol, engine=engine, interval=interval)
 
        
-        hist["Date"] = pd.to_datetime(hist["Date"])
-        
-        
-        chart_columns = [
-            'Date', 'Open', 'High', 'Low', 'Close', 'Volume', 
-            'RSI_D', 'MACD_D', 'MACD_SIGNAL_D', 'ATR', 'EMA5', 'EMA10'
-        ]
-        
-        
-        chart_data = hist[chart_columns]
-        
-        
-        chart = chart_data.to_dict(orient="records") 
-        
-        for r in chart:
-            r["Date"] = r["Date"].isoformat()
-
-        
-        result["chart"] = chart
+        # Kept as a frame; the route encodes it in the format the client asked for
+        result["chart"] = chart_frame(hist)
         result["XGBoost_Signal"] = xgb_result
         result["SARIMA_Predictions"] = sarima_result
+        result["Forecast_Engine"] = engine
+        result["Interval"] = interval
         
         
     except Exception as e:
         result["error"] = str(e)
-        print(f"An error occurred: {e}")
+        log_event(logger, "analysis_failed", logging.WARNING, symbol=symbol, error=str(e))
+
+
+    return result
+
+
+def get_stock(symbol: str, start: str = None, end: str = None, engine: str = None, interval: str = DAILY) -> dict:
+    """
+    Main function to fetch stock data, build indicators, run XGBoost signal,
+    and get the price predictions (SARIMA unless ``engine`` picks a fast one).
+    Daily bars unless ``interval`` asks for ingested intraday ones.
+    """
+    try:
+        
+        hist = fetch_historical_yfinance(symbol, start, end, interval, warmup=True)
+        
+    except Exception as e:
+        log_event(logger, "fetch_failed", logging.WARNING, symbol=symbol, error=str(e))
+        return {"symbol": symbol, "error": str(e)}
+
+    return analyze_history(symbol, hist, engine=engine, interval=interval, start=start)
+
+
+def precompute_stock(symbol: str, start: str, end: str) -> dict:
+    """
+    get_stock for the post-close precompute: XGBoost is retrained and SARIMA
+    refitted from scratch (with ``FORECAST_ENGINE``). Raises instead of
+    returning an "error" entry.
+    """
+    hist = prepare_history(symbol, start, end)
+    return {
+        "symbol": symbol,
+        "chart": chart_frame(hist),
+        "XGBoost_Signal": generate_xgboost_signal(hist, symbol=symbol, retrain=True),
+        "SARIMA_Predictions": predict_prices(hist, symbol=symbol, refit=True),
+        "Forecast_Engine": settings.FORECAST_ENGINE,
+        "Interval": DAILY,
+    }
+
+
+def get_precomputed(symbol: str, start: str = None, end: str = None, engine: str = None):
+    """
+    The precomputed result for ``symbol`` if it answers this request: same
+    forecast engine, no session has closed since it was computed, and the
+    cached bars of the requested window (up to that close) are exactly the
+    ones it was computed on. None otherwise.
+    """
+    hit = _precomputed(symbol, start, end, engine or settings.FORECAST_ENGINE)
+    metrics.cache_event("precomputed", hit=hit is not None)
+    return hit
+
+
+def _precomputed(symbol: str, start: str, end: str, engine: str):
+    entry = get_result_store().get(symbol)
+    if entry is None or entry["result"].get("Forecast_Engine", "sarima") != engine:
+        return None
+    as_of = entry["as_of"]
+    if np.busday_count(as_of + timedelta(days=1), last_settled_date() + timedelta(days=1)) > 0:
+        return None
+    try:
+        start_date, end_date = _parse_range(start, end)
+    except ValueError:
+        return None
+    if end_date < as_of:
+        return None
+    bars = get_cache().window(to_ticker(symbol), start_date, as_of)["Date"]
+    chart = entry["result"]["chart"]["Date"]
+    if len(bars) != len(chart) or bars.empty or bars.iloc[0] != chart.iloc[0] or bars.iloc[-1] != chart.iloc[-1]:
+        return None
+    return entry["result"]
+
+
+_in_flight = SingleFlight()
+
+
+def submit_stock(symbol: str, start: str = None, end: str = None, engine: str = None,
+                 interval: str = DAILY) -> Future:
+    """
+    get_stock in the analysis pool, coalesced: a request identical to one
+    still running (same symbol, window and options) waits for that result
+    instead of starting its own download, training and SARIMA fit. Returns
+    a per-caller concurrent.futures.Future; raises QueueFullError if a new
+    computation cannot be admitted.
+    """
+    engine = engine or settings.FORECAST_ENGINE
+    key = ("stock", symbol, start, end, engine, interval)
+    return _in_flight.submit(key, lambda: get_executor().submit(get_stock, symbol, start, end, engine, interval))
+
 
+def in_flight_stats() -> dict:
+    return _in_flight.stats()
 
+
+def retrain_xgboost(symbol: str, start: str = None, end: str = None) -> dict:
+    """Trains the XGBoost signal model again for a window and replaces its cache entry."""
+    result = {"symbol": symbol}
+    try:
+        hist = since(build_indicators(fetch_historical_yfinance(symbol, start, end, warmup=True)), start)
+        result["XGBoost_Signal"] = generate_xgboost_signal(hist, symbol=symbol, retrain=True)
+    except Exception as e:
+        result["error"] = str(e)
+        log_event(logger, "retrain_failed", logging.WARNING, symbol=symbol, error=str(e))
     return result
 
 
+def analyze_many(items, engine: str = None, interval: str = DAILY, start: str = None) -> list:
+    """
+    analyze_history over ``(symbol, hist)`` pairs, whose bars before
+    ``start`` are warm-up; one pool task per batch chunk. With the panel model (daily bars), the signals of the whole chunk
+    come from one ``predict`` call, and with a fast forecast engine the
+    predictions come from one batched fit.
+    """
+    engine = engine or settings.FORECAST_ENGINE
+    entry = get_panel_store().get() if settings.SIGNAL_MODE == "panel" and interval == DAILY else None
+    batched = engine in forecast_engine.FAST_ENGINES
+    if entry is None and not batched:
+        return [analyze_history(symbol, hist, engine=engine, interval=interval, start=start) for symbol, hist in items]
+
+    views, latest = {}, {}
+    for symbol, hist in items:
+        try:
+            with metrics.stage("indicators"):
+                views[symbol] = load_features(symbol, hist, interval, start)
+            if entry is not None:
+                X, _ = signal_dataset(views[symbol])
+                if len(X):
+                    latest[symbol] = (X, X[-1:])
+        except Exception:
+            pass  # analyze_history reports it
+    signals, forecasts = {}, {}
+    if entry is not None:
+        with metrics.stage("xgboost"):
+            signals = predict_signals(entry, latest)
+        metrics.cache_event("panel_model", hit=True)
+    if batched:
+        forecasts = forecast_engine.forecast_many({symbol: view['Close'] for symbol, view in views.items()}, engine)
+    return [
+        analyze_history(symbol, views.get(symbol, hist), signals.get(symbol), forecasts.get(symbol), engine, interval, start)
+        for symbol, hist in items
+    ]
+
+
+def get_stocks(symbols, start: str = None, end: str = None, engine: str = None, interval: str = DAILY) -> list:
+    """
+    Batch version of get_stock. Data for all symbols is fetched in bulk, then
+    the per-symbol analysis is spread over the analysis process pool in at
+    most one chunk per worker. Each entry of the returned list has the same
+    shape as a get_stock result. Raises QueueFullError if the pool cannot
+    take the batch.
+    """
+    try:
+        histories = fetch_historical_many(symbols, start, end, interval, warmup=True)
+    except Exception as e:
+        log_event(logger, "fetch_failed", logging.WARNING, symbols=list(symbols), error=str(e))
+        return [{"symbol": symbol, "error": str(e)} for symbol in symbols]
+
+    results = {}
+    items = []
+    for symbol in symbols:
+        hist = histories[symbol]
+        if hist.empty:
+            results[symbol] = {"symbol": symbol, "error": "No historical data found"}
+        else:
+            items.append((symbol, hist))
+
+    executor = get_executor()
+    chunks = [items[i::executor.workers] for i in range(min(executor.workers, len(items)))]
+    futures = executor.submit_all((analyze_many, (chunk, engine, interval, start), {}) for chunk in chunks)
+    for chunk, future in zip(chunks, futures):
+        try:
+            for result in future.result():
+                results[result["symbol"]] = result
+            metrics.add_stages(future.stage_timings)
+        except Exception as e:
+            # Worker crashed (e.g. killed by the OS); keep the rest of the batch
+            for symbol, _ in chunk:
+                results[symbol] = {"symbol": symbol, "error": str(e)}
+
+    return [results[symbol] for symbol in symbols]
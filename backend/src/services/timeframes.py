@@ -0,0 +1,189 @@
+"""
+Higher-timeframe features.
+
+``FEATURES`` lists, per timeframe (H = hours from the session open, D =
+days, W = weeks ending Sunday, M = calendar months, Q = calendar quarters),
+the columns to compute as ``column: (indicator, params, output)``.
+``higher_timeframe_features`` does one grouped pass per timeframe: the
+closes are split at period boundaries, each period contributes its last
+close, the indicators run on those period closes, and the results are
+aligned back to the bars with ``searchsorted``. A bar only sees periods
+that were complete before its own started, so no value from the rest of
+its own (or a later) period leaks in.
+
+``FEATURES`` is written for daily bars. Intraday bars use the same columns
+one step down (``features_for``): the ``_W`` columns come from the first
+timeframe above the bars and the ``_M`` columns from the second, so the
+signal model keeps its feature layout and a few weeks of bars are enough.
+
+A bar has every feature only once the slowest indicator of each timeframe
+has warmed up on completed periods (MACD_SIGNAL_M: 17 months). Requests
+load ``warmup_days`` of bars before their window for that and trim them
+off again, so the first bar of a window already has all its features.
+"""
+import functools
+import math
+
+import numpy as np
+
+from ..config import settings
+from . import indicator_kernels as kernels
+
+FEATURES = {
+    "W": {
+        "RSI_W": ("rsi", {"length": 14}, 0),
+        "MACD_W": ("macd", {"fast": 12, "slow": 26, "signal": 9}, 0),
+        # MACD_SIGNAL_* keep pandas_ta column 1, as the daily MACD_SIGNAL_D
+        "MACD_SIGNAL_W": ("macd", {"fast": 12, "slow": 26, "signal": 9}, 1),
+    },
+    "M": {
+        "RSI_M": ("rsi", {"length": 14}, 0),
+        "MACD_M": ("macd", {"fast": 6, "slow": 13, "signal": 5}, 0),
+        "MACD_SIGNAL_M": ("macd", {"fast": 6, "slow": 13, "signal": 5}, 1),
+    },
+}
+
+INDICATORS = {
+    "rsi": kernels.rsi,
+    "macd": kernels.macd,
+}
+
+# timeframes of the "W" and "M" entries of FEATURES for bars of each interval
+INTERVAL_TIMEFRAMES = {
+    "1d": ("W", "M"),
+    "1h": ("D", "W"),
+    "15m": ("H", "D"),
+    "5m": ("H", "D"),
+}
+
+MINUTE_NS = 60 * 10**9
+
+# calendar days one period of each timeframe spans at most (weekends and holidays included)
+PERIOD_DAYS = {"H": 0.5, "D": 1.5, "W": 7, "M": 31, "Q": 92}
+# extra days for holidays and a window starting mid-period
+WARMUP_MARGIN_DAYS = 7
+
+
+def features_for(interval: str = "1d") -> dict:
+    """``FEATURES`` for bars of ``interval``: same columns, timeframes from ``INTERVAL_TIMEFRAMES``."""
+    first, second = INTERVAL_TIMEFRAMES[interval]
+    return {first: FEATURES["W"], second: FEATURES["M"]}
+
+
+def _open_offset(minutes: int) -> int:
+    """Offset in minutes of the buckets of ``minutes`` that start at ``MARKET_OPEN``."""
+    hour, minute = (int(part) for part in settings.MARKET_OPEN.split(":"))
+    return (hour * 60 + minute) % minutes
+
+
+def minute_buckets(stamps: np.ndarray, minutes: int) -> np.ndarray:
+    """Bucket of ``minutes`` each timestamp falls in, as an increasing integer; buckets start at the session open."""
+    stamps = np.asarray(stamps, dtype="datetime64[ns]").astype(np.int64)
+    return (stamps - _open_offset(minutes) * MINUTE_NS) // (minutes * MINUTE_NS)
+
+
+def bucket_start(buckets: np.ndarray, minutes: int) -> np.ndarray:
+    """First timestamp of each ``minute_buckets`` bucket."""
+    return (np.asarray(buckets) * minutes + _open_offset(minutes)) * MINUTE_NS
+
+
+def feature_columns(features=None) -> list:
+    features = FEATURES if features is None else features
+    return [column for columns in features.values() for column in columns]
+
+
+def grouped(columns: dict) -> dict:
+    """``{(indicator, params): {output: column}}``, so each indicator runs once per timeframe."""
+    groups = {}
+    for column, (indicator, params, output) in columns.items():
+        groups.setdefault((indicator, tuple(sorted(params.items()))), {})[output] = column
+    return groups
+
+
+def period_keys(dates: np.ndarray, timeframe: str) -> np.ndarray:
+    """Integer period id of each date; increasing with time."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    if timeframe == "H":
+        return minute_buckets(dates, 60)
+    if timeframe == "D":
+        return dates.astype("datetime64[D]").astype(np.int64)
+    if timeframe == "W":
+        # 1970-01-01 is a Thursday: shifting by 3 days makes weeks run Monday..Sunday
+        return (dates.astype("datetime64[D]").astype(np.int64) + 3) // 7
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    if timeframe == "M":
+        return months
+    if timeframe == "Q":
+        return months // 3
+    raise ValueError(f"Unknown timeframe '{timeframe}', use H, D, W, M or Q")
+
+
+def period_key(date, timeframe: str) -> int:
+    """Scalar ``period_keys`` for one pandas Timestamp."""
+    if timeframe == "H":
+        return (date.value - _open_offset(60) * MINUTE_NS) // (60 * MINUTE_NS)
+    if timeframe == "D":
+        return date.toordinal() - 719163
+    if timeframe == "W":
+        return (date.toordinal() - 719163 + 3) // 7  # 719163 = date(1970, 1, 1).toordinal()
+    months = (date.year - 1970) * 12 + date.month - 1
+    if timeframe == "M":
+        return months
+    if timeframe == "Q":
+        return months // 3
+    raise ValueError(f"Unknown timeframe '{timeframe}', use H, D, W, M or Q")
+
+
+def warmup_periods(features=None) -> dict:
+    """
+    ``{timeframe: periods}``: completed periods a bar needs before its own
+    one for every column of that timeframe to have a value, measured from
+    the leading NaN of the indicators.
+    """
+    features = FEATURES if features is None else features
+    probe = 100.0 + np.sin(np.arange(200.0))
+    periods = {}
+    for timeframe, columns in features.items():
+        lead = 0
+        for (indicator, params), outputs in grouped(columns).items():
+            values = INDICATORS[indicator](probe, **dict(params))
+            values = values if isinstance(values, tuple) else (values,)
+            lead = max([lead] + [int(np.argmax(~np.isnan(values[output]))) for output in outputs])
+        periods[timeframe] = lead + 1
+    return periods
+
+
+@functools.lru_cache(maxsize=None)
+def warmup_days(interval: str = "1d") -> int:
+    """Calendar days of bars before a window that give its first bar of ``interval`` every higher-timeframe feature."""
+    periods = warmup_periods(features_for(interval))
+    return math.ceil(max(n * PERIOD_DAYS[timeframe] for timeframe, n in periods.items())) + WARMUP_MARGIN_DAYS
+
+
+def higher_timeframe_features(dates: np.ndarray, close: np.ndarray, features=None) -> dict:
+    """
+    ``{column: array}`` aligned to the rows of ``dates`` (sorted) and
+    ``close``. Rows before the first completed period with a valid value are NaN.
+    """
+    features = FEATURES if features is None else features
+    close = np.asarray(close, dtype=float)
+    out = {}
+    for timeframe, columns in features.items():
+        keys = period_keys(dates, timeframe)
+        if not len(keys):
+            out.update({column: np.full(0, np.nan) for column in columns})
+            continue
+        # last row of each period
+        last = np.append(np.flatnonzero(np.diff(keys)), len(keys) - 1)
+        period_close = close[last]
+        # index of the last period that ended before each day's own period
+        completed = np.searchsorted(keys[last], keys, side="left") - 1
+        valid = completed >= 0
+        for (indicator, params), outputs in grouped(columns).items():
+            values = INDICATORS[indicator](period_close, **dict(params))
+            values = values if isinstance(values, tuple) else (values,)
+            for output, column in outputs.items():
+                aligned = np.full(len(keys), np.nan)
+                aligned[valid] = values[output][completed[valid]]
+                out[column] = aligned
+    return out
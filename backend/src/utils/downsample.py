@@ -0,0 +1,160 @@
+"""
+Downsampling of the chart for display.
+
+A multi-year window has thousands of daily bars, far more than a chart can
+show. ``downsample_chart`` cuts the chart to ``max_points`` rows. The
+analysis (signal, forecasts) has already run on every bar by then.
+
+The first and the last bar stay as they are. The bars in between are split
+into ``max_points - 2`` buckets of consecutive bars, and every bucket
+becomes one row:
+
+- the candle columns are aggregated as a coarser candle: first ``Open``,
+  highest ``High``, lowest ``Low``, last ``Close``, summed ``Volume``,
+  dated at the bucket's first bar;
+- every other numeric column (EMAs, RSI, MACD, ATR) keeps the value that
+  Largest-Triangle-Three-Buckets (LTTB) picks in the bucket: the bar that
+  spans the largest triangle with the bar picked in the previous bucket and
+  the mean of the next one, so peaks and troughs survive. Each column gets
+  its own pick; the value is shown at the bucket's date, less than a bucket
+  (about a pixel) away from its bar.
+
+Both run on whole arrays, for all the line columns at once; cutting the
+payload must not cost the server more than it saves in serializing.
+"""
+import numpy as np
+import pandas as pd
+
+MIN_POINTS = 3
+
+
+def bucket_starts(n: int, max_points: int) -> np.ndarray:
+    """First row of every bucket: ``[0]``, ``max_points - 2`` even buckets, ``[n - 1]``."""
+    middle = 1 + (np.arange(max_points - 2) * (n - 2)) // (max_points - 2)
+    return np.concatenate(([0], middle, [n - 1]))
+
+
+def ohlc_buckets(columns: dict, starts: np.ndarray) -> dict:
+    """Candle columns among the ``columns`` arrays, aggregated per bucket; NaN bars are skipped."""
+    n = len(next(iter(columns.values())))
+    ends = np.append(starts[1:], n) - 1
+    reducers = {
+        "Open": lambda v: v[starts],
+        "High": lambda v: np.fmax.reduceat(v, starts),
+        "Low": lambda v: np.fmin.reduceat(v, starts),
+        "Close": lambda v: v[ends],
+        "Volume": lambda v: np.add.reduceat(np.nan_to_num(v), starts),
+    }
+    return {c: reduce(columns[c].astype(float, copy=False)) for c, reduce in reducers.items() if c in columns}
+
+
+def _padded(starts: np.ndarray, n: int):
+    """Segments starting at ``starts`` as a padded ``(segment, width)`` index matrix, and its mask."""
+    sizes = np.diff(np.append(starts, n))
+    offsets = np.arange(max(1, sizes.max()))
+    mask = offsets < sizes[:, None]
+    return np.where(mask, starts[:, None] + offsets, 0), mask
+
+
+def lttb(values: np.ndarray, starts: np.ndarray, candidates: int = 4) -> np.ndarray:
+    """
+    LTTB pick of every bucket for each row of ``values`` ``(series, time)``,
+    as ``(series, buckets)`` values. ``starts`` comes from ``bucket_starts``,
+    so the first and the last bucket hold a single bar. NaN bars are never
+    picked unless the whole bucket is NaN.
+
+    Each bucket is first cut to its ``candidates`` sub-buckets' minimum and
+    maximum bar (MinMaxLTTB), which bounds the work per bucket for long
+    series; with buckets of up to ``2 * candidates`` bars this is exact LTTB.
+    The pick in a bucket depends on the pick in the previous one. So
+    ``_best_picks`` first finds the best pick for every possible previous
+    pick, and the chain through those maps is resolved by composing them
+    pairwise, in log2(buckets) rounds.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    series, n = values.shape
+    sizes = np.diff(np.append(starts, n))
+    rows = np.arange(series)[:, None]
+
+    if sizes.max() <= 2 * candidates:
+        # narrow buckets: every bar is a candidate
+        index, mask = _padded(starts, n)
+        picks = np.broadcast_to(index, (series,) + index.shape)
+        valid = mask
+    else:
+        # MinMax preselection, in time order so ties go to the earlier bar as in plain LTTB
+        sub = (starts[:, None] + (np.arange(candidates) * sizes[:, None]) // candidates).ravel()
+        index, mask = _padded(sub, n)
+        y = values[:, index]
+        missing = np.isnan(y) | ~mask
+        low = np.where(missing, np.inf, y).argmin(axis=2)
+        high = np.where(missing, -np.inf, y).argmax(axis=2)
+        picks = np.sort(np.stack([sub + low, sub + high], axis=2).reshape(series, len(starts), -1), axis=2)
+        valid = True
+    x = picks.astype(float)
+    y = np.where(valid, values[rows[..., None], picks], np.nan)  # padding is never picked
+
+    # the "next bucket" corner of every triangle: the mean of all its bars
+    valid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_y = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=1) / np.add.reduceat(valid, starts, axis=1)
+    mean_x = starts + (sizes - 1) / 2
+
+    chain = _best_picks(x, y, mean_x, mean_y)
+    # flat position of chain[s, t, 0]; chain[s, t + step] after chain[s, t] is a gather at base + chain[s, t]
+    base = (np.arange(chain.shape[0])[:, None] * chain.shape[1] + np.arange(chain.shape[1]))[..., None] * chain.shape[2]
+    step = 1
+    while step < chain.shape[1]:
+        chain[:, step:] = chain.ravel()[base[:, step:] + chain[:, :-step]]
+        step *= 2
+    picked = np.empty((series, len(starts)))
+    picked[:, 0], picked[:, -1] = values[:, 0], values[:, -1]
+    picked[:, 1:-1] = np.take_along_axis(y[:, 1:-1], chain[:, :, :1], axis=2)[..., 0]
+    return picked
+
+
+def _best_picks(x, y, mean_x, mean_y) -> np.ndarray:
+    """
+    ``(series, bucket - 2, candidate)``: for every middle bucket and every
+    candidate ``a`` of the bucket before it, the candidate spanning the
+    largest triangle with ``a`` and the next bucket's mean ``c``.
+    """
+    # candidates first, so every operation runs over whole (series, bucket) planes
+    x, y = np.moveaxis(x, 2, 0).copy(), np.moveaxis(y, 2, 0).copy()
+    ax, ay = x[:, :, :-2], y[:, :, :-2]
+    cx, cy = mean_x[2:], mean_y[:, 2:]
+    # a NaN corner (indicator warm-up) degrades to the distance from the next bucket's mean
+    ay = np.where(np.isnan(ay), cy, ay)
+    # twice the area of (a, b, c) is |(cy - ay) * bx + (ax - cx) * by + cx * ay - ax * cy|
+    alpha, beta, gamma = cy - ay, ax - cx, cx * ay - ax * cy
+    area = np.empty((len(x),) + ax.shape)  # (b, a, series, bucket)
+    for j, out in enumerate(area):
+        np.multiply(alpha, x[j, :, 1:-1], out=out)
+        out += beta * y[j, :, 1:-1]
+        out += gamma
+    np.abs(area, out=area)
+    np.fmax(area, -1.0, out=area)  # NaN (missing bars) is never picked
+    best = area.argmax(axis=0)
+    return np.ascontiguousarray(np.moveaxis(best, 0, 2))
+
+
+def downsample_chart(chart: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """
+    ``chart`` cut to at most ``max_points`` rows for display (see the module
+    docstring); returned unchanged when it is short enough. Raises
+    ValueError for ``max_points`` below ``MIN_POINTS``.
+    """
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    if not isinstance(chart, pd.DataFrame) or len(chart) <= max_points:
+        return chart
+    if "Date" in chart and not chart["Date"].is_monotonic_increasing:
+        chart = chart.sort_values("Date")
+    source = {c: chart[c].to_numpy() for c in chart.columns}
+    starts = bucket_starts(len(chart), max_points)
+    columns = {"Date": source["Date"][starts]} if "Date" in source else {}
+    columns.update(ohlc_buckets(source, starts))
+    lines = [c for c, v in source.items() if c not in columns and v.dtype.kind in "fiu"]
+    if lines:
+        columns.update(zip(lines, lttb(np.stack([source[c] for c in lines]), starts)))
+    return pd.DataFrame({c: columns[c] for c in chart.columns if c in columns})
@@ -1,2 +1,15 @@
+import re
+
+
 def format_error(msg: str) -> dict:
-    return {"error": msg}
\ No newline at end of file
+    return {"error": msg}
+
+
+def safe_filename(name: str) -> str:
+    """Make a user supplied name (e.g. a ticker) safe to use as a file name."""
+    return re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".") or "_"
+
+
+def to_ticker(symbol: str) -> str:
+    """Exchange ticker of a symbol: ``INFY`` -> ``INFY.NS``."""
+    return symbol.upper() + ".NS" if not symbol.upper().endswith(".NS") else symbol
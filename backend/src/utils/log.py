@@ -0,0 +1,49 @@
+"""
+Structured (one JSON object per line) logging.
+
+``log_event(logger, "request", status=200, duration_ms=12.5)`` writes
+``{"ts": ..., "level": "INFO", "logger": ..., "event": "request", "status": 200, ...}``.
+"""
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+
+from ..config import settings
+
+ROOT_LOGGER = "stock"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def _configure():
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        root.setLevel(settings.LOG_LEVEL)
+        root.propagate = False
+    return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    _configure()
+    # "backend.src.services.jobs" logs as "stock.jobs"
+    return logging.getLogger(f"{ROOT_LOGGER}.{name.rsplit('.', 1)[-1]}")
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    logger.log(level, event, extra={"fields": fields})
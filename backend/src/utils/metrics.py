@@ -0,0 +1,133 @@
+"""
+Stage timings, cache counters and queue gauges.
+
+``stage(name)`` times a block and records it in the ``stock_stage_seconds``
+histogram and in the Server-Timing list of the current request. Work that
+runs in the analysis process pool cannot reach the API process' registry,
+so the pool wrapper runs it under ``capture()``: timings and cache events
+are collected and sent back with the result, then ``replay`` records them
+in the API process and the route adds the timings to its response.
+
+Everything is exposed in Prometheus text format by ``exposition()``.
+"""
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+STAGE_SECONDS = Histogram(
+    "stock_stage_seconds", "Time spent in each analysis stage", ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+REQUEST_SECONDS = Histogram(
+    "stock_request_seconds", "HTTP request duration", ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CACHE_EVENTS = Counter("stock_cache_events_total", "Cache lookups by cache and outcome", ["cache", "result"])
+QUEUE_DEPTH = Gauge("stock_queue_depth", "Tasks waiting or running, per queue", ["queue"])
+
+
+class Recorder:
+    def __init__(self, forward: bool):
+        # forward: collect only, the API process records (pool workers)
+        self.forward = forward
+        self.stages = []
+        self.events = []
+
+
+_recorder = contextvars.ContextVar("metrics_recorder", default=None)
+
+
+def record_stage(name: str, seconds: float):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.stages.append((name, seconds))
+    if recorder is None or not recorder.forward:
+        STAGE_SECONDS.labels(name).observe(seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator form of ``stage``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_event(cache: str, hit: bool):
+    result = "hit" if hit else "miss"
+    recorder = _recorder.get()
+    if recorder is not None and recorder.forward:
+        recorder.events.append((cache, result))
+    else:
+        CACHE_EVENTS.labels(cache, result).inc()
+
+
+@contextmanager
+def capture():
+    """Collect stages and cache events of the block (in a pool worker) instead of recording them."""
+    recorder = Recorder(forward=True)
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def replay(stages, events):
+    """Record what ``capture`` collected in another process."""
+    for name, seconds in stages:
+        STAGE_SECONDS.labels(name).observe(seconds)
+    for cache, result in events:
+        CACHE_EVENTS.labels(cache, result).inc()
+
+
+@contextmanager
+def request_timings():
+    """Collect the stage timings of one request (for its Server-Timing header)."""
+    recorder = Recorder(forward=False)
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def add_stages(stages):
+    """Add stages measured elsewhere (already recorded by ``replay``) to the current request."""
+    recorder = _recorder.get()
+    if recorder is not None and not recorder.forward:
+        recorder.stages.extend(stages)
+
+
+def stage_totals(stages) -> dict:
+    """Milliseconds per stage name, repeated stages summed."""
+    totals = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds * 1000
+    return {name: round(ms, 2) for name, ms in totals.items()}
+
+
+def server_timing(stages, total_seconds: float) -> str:
+    entries = [f"{name};dur={ms}" for name, ms in stage_totals(stages).items()]
+    entries.append(f"total;dur={round(total_seconds * 1000, 2)}")
+    return ", ".join(entries)
+
+
+def exposition():
+    """``(body, content_type)`` for the /metrics endpoint."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,141 @@
+"""
+Response encodings for analysis results.
+
+Inside the service the chart stays a DataFrame; it is only turned into wire
+format here, once, by whole-column conversions:
+
+- ``json``: the original layout, one object per bar with ISO dates (default).
+- ``columnar``: JSON with one array per column and ``Date`` as epoch
+  milliseconds. ``pd.DataFrame(result["chart"])`` rebuilds the frame.
+- ``arrow``: Apache Arrow IPC stream of the chart; the other result fields
+  are JSON in the schema metadata under ``b"result"``.
+- ``msgpack``: the columnar layout, msgpack encoded.
+
+The events of /stock/stream are Server-Sent Events (``sse_event``) whose
+data is JSON with the chart in the columnar layout.
+"""
+import msgpack
+import numpy as np
+import orjson
+import pandas as pd
+import pyarrow as pa
+
+JSON = "json"
+COLUMNAR = "columnar"
+ARROW = "arrow"
+MSGPACK = "msgpack"
+
+MEDIA_TYPES = {
+    JSON: "application/json",
+    COLUMNAR: "application/json",
+    ARROW: "application/vnd.apache.arrow.stream",
+    MSGPACK: "application/msgpack",
+}
+SSE_MEDIA_TYPE = "text/event-stream"
+_ACCEPT = {
+    "application/vnd.apache.arrow.stream": ARROW,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+}
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def negotiate(fmt: str = None, accept: str = None) -> str:
+    """Pick the encoding from an explicit ``format`` parameter, else the Accept header."""
+    if fmt:
+        fmt = fmt.strip().lower()
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"Unsupported format '{fmt}', use one of: {', '.join(MEDIA_TYPES)}")
+        return fmt
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in _ACCEPT:
+            return _ACCEPT[media_type]
+    return JSON
+
+
+def _epoch_ms(dates: pd.Series) -> np.ndarray:
+    return dates.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+
+
+def chart_records(chart: pd.DataFrame) -> list:
+    """Row layout of the chart: ``[{"Date": "2024-01-01T00:00:00", "Open": ...}, ...]``."""
+    columns = list(chart.columns)
+    values = [
+        np.datetime_as_string(chart[c].to_numpy(dtype="datetime64[s]"), unit="s").tolist() if c == "Date"
+        else chart[c].tolist()
+        for c in columns
+    ]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def chart_columns(chart: pd.DataFrame, as_lists: bool = False) -> dict:
+    """Columnar layout of the chart: ``{"Date": [epoch ms, ...], "Open": [...], ...}``."""
+    columns = {c: _epoch_ms(chart[c]) if c == "Date" else chart[c].to_numpy() for c in chart.columns}
+    if as_lists:
+        columns = {c: values.tolist() for c, values in columns.items()}
+    return columns
+
+
+def _with_chart(result: dict, convert) -> dict:
+    chart = result.get("chart")
+    if isinstance(chart, pd.DataFrame):
+        return {**result, "chart": convert(chart)}
+    return result
+
+
+def _numpy_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _arrow_stream(chart, key: bytes, payload) -> bytes:
+    if not isinstance(chart, pd.DataFrame):
+        chart = pd.DataFrame()
+    table = pa.Table.from_pandas(chart, preserve_index=False)
+    table = table.replace_schema_metadata({key: orjson.dumps(payload, option=_ORJSON_OPTIONS)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _without_chart(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k != "chart"}
+
+
+def encode(result: dict, fmt: str = JSON) -> bytes:
+    """Encode one analysis result (as returned by ``get_stock``)."""
+    if fmt == ARROW:
+        return _arrow_stream(result.get("chart"), b"result", _without_chart(result))
+    if fmt == MSGPACK:
+        return msgpack.packb(_with_chart(result, lambda c: chart_columns(c, as_lists=True)), default=_numpy_default)
+    convert = chart_columns if fmt == COLUMNAR else chart_records
+    return orjson.dumps(_with_chart(result, convert), option=_ORJSON_OPTIONS)
+
+
+def encode_many(results: list, fmt: str = JSON) -> bytes:
+    """
+    Encode a batch as ``{"results": [...]}``. For Arrow, the charts are stacked
+    into one table with a ``Symbol`` column and the per-symbol fields go to the
+    ``b"results"`` schema metadata.
+    """
+    if fmt == ARROW:
+        charts = [
+            r["chart"].assign(Symbol=r["symbol"]) for r in results if isinstance(r.get("chart"), pd.DataFrame)
+        ]
+        chart = pd.concat(charts, ignore_index=True) if charts else None
+        return _arrow_stream(chart, b"results", [_without_chart(r) for r in results])
+    if fmt == MSGPACK:
+        encoded = [_with_chart(r, lambda c: chart_columns(c, as_lists=True)) for r in results]
+        return msgpack.packb({"results": encoded}, default=_numpy_default)
+    convert = chart_columns if fmt == COLUMNAR else chart_records
+    return orjson.dumps({"results": [_with_chart(r, convert) for r in results]}, option=_ORJSON_OPTIONS)
+
+
+def sse_event(name: str, payload: dict) -> bytes:
+    """One Server-Sent Event; the payload is encoded as ``columnar`` JSON, always a single line."""
+    return b"event: " + name.encode() + b"\ndata: " + encode(payload, COLUMNAR) + b"\n\n"
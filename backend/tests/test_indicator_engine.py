@@ -0,0 +1,78 @@
+"""
+The incremental engine against the vectorized ``build_indicators``: every
+path through ``update_indicators`` must stay within ``MATCH_TOLERANCE``.
+"""
+from functools import partial
+
+import pandas as pd
+import pytest
+
+from backend.benchmarks.synthetic import random_walk_ohlcv
+from backend.src.services import indicator_engine as engine
+from backend.src.services.stock_services import build_indicators
+from backend.src.services.timeframes import features_for
+
+
+@pytest.fixture(autouse=True)
+def _no_saved_engines():
+    engine._engines.clear()
+    yield
+    engine._engines.clear()
+
+
+def _bars(years, seed=0):
+    return engine.ohlcv_bars(random_walk_ohlcv(years, seed=seed, holidays_per_year=8))
+
+
+def _intraday_bars(interval, days, seed=0):
+    minutes = {"1h": 60, "15m": 15, "5m": 5}[interval]
+    per_day = 375 // minutes
+    df = random_walk_ohlcv(days * per_day / 252, seed=seed)
+    sessions = pd.bdate_range("2022-01-03", periods=days)
+    df["Date"] = [day + pd.Timedelta(minutes=555 + minutes * i) for day in sessions for i in range(per_day)][:len(df)]
+    return engine.ohlcv_bars(df)
+
+
+@pytest.mark.parametrize("years", [1, 6])
+def test_per_bar_updates_match_batch(years):
+    bars = _bars(years, seed=years)
+    streamed = engine.IndicatorEngine()
+    streamed.extend(bars)
+    assert engine.max_deviation(streamed.frame(), build_indicators(bars)) <= engine.MATCH_TOLERANCE
+
+
+@pytest.mark.parametrize("first", [1, 10, 40, 700])
+def test_seeded_state_extends_like_batch(first):
+    bars = _bars(6, seed=3)
+    engine.update_indicators("X", bars.iloc[:first], build_indicators)
+    frame = engine.update_indicators("X", bars, build_indicators)
+    assert len(engine._engines["X"]) == len(bars)
+    assert engine.max_deviation(frame, build_indicators(bars)) <= engine.MATCH_TOLERANCE
+
+
+def test_revised_last_bar_matches_batch():
+    bars = _bars(3, seed=7)
+    engine.update_indicators("X", bars, build_indicators)
+    revised = bars.copy()
+    revised.loc[len(revised) - 1, ["High", "Close"]] *= 1.02
+    frame = engine.update_indicators("X", revised, build_indicators)
+    assert engine.max_deviation(frame, build_indicators(revised)) <= engine.MATCH_TOLERANCE
+
+
+def test_new_window_start_reseeds():
+    bars = _bars(6, seed=11)
+    engine.update_indicators("X", bars.iloc[:-50], build_indicators)
+    later = bars.iloc[200:].reset_index(drop=True)
+    engine.update_indicators("X", later.iloc[:-10], build_indicators)
+    frame = engine.update_indicators("X", later, build_indicators)
+    assert engine._engines["X"].first_date == later["Date"].iloc[0]
+    assert engine.max_deviation(frame, build_indicators(later)) <= engine.MATCH_TOLERANCE
+
+
+@pytest.mark.parametrize("interval", ["1h", "5m"])
+def test_intraday_timeframes_match_batch(interval):
+    bars = _intraday_bars(interval, days=60 if interval == "1h" else 8, seed=5)
+    build = partial(build_indicators, interval=interval)
+    engine.update_indicators("X", bars.iloc[:len(bars) // 2], build, features_for(interval))
+    frame = engine.update_indicators("X", bars, build, features_for(interval))
+    assert engine.max_deviation(frame, build(bars)) <= engine.MATCH_TOLERANCE
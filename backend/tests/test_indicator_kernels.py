@@ -0,0 +1,46 @@
+"""
+The NumPy indicator kernels against pandas_ta, on single series and on a
+2-D (symbols x time) block whose rows start at different dates.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+from backend.benchmarks.indicators import columns, kernel_indicators, pandas_ta_indicators  # noqa: E402
+from backend.benchmarks.synthetic import TRADING_DAYS_PER_YEAR, random_walk_ohlcv  # noqa: E402
+
+TOLERANCE = 1e-9
+
+
+def _deviation(actual, expected):
+    """Largest relative difference; ``inf`` where only one side is NaN."""
+    expected = pd.to_numeric(pd.Series(expected), errors='coerce').to_numpy(dtype=float)
+    if (np.isnan(actual) != np.isnan(expected)).any():
+        return np.inf
+    diff = np.abs(actual - expected) / np.maximum(1.0, np.abs(expected))
+    return float(np.nanmax(diff)) if np.isfinite(diff).any() else 0.0
+
+
+@pytest.mark.parametrize("years", [1, 5, 20])
+def test_single_series_match_pandas_ta(years):
+    df = random_walk_ohlcv(years, seed=years)
+    actual = kernel_indicators(*columns(df))
+    for name, outputs in pandas_ta_indicators(df).items():
+        worst = max(_deviation(a, e) for a, e in zip(actual[name], outputs))
+        assert worst <= TOLERANCE, f"{name}: max relative deviation {worst:.2e}"
+
+
+def test_block_rows_match_pandas_ta():
+    # each row must equal pandas_ta on that symbol alone, NaN padding in front included
+    n = 5 * TRADING_DAYS_PER_YEAR
+    frames = [random_walk_ohlcv(5, seed=100 + i).iloc[i * 37:] for i in range(8)]
+    block = np.full((4, len(frames), n), np.nan)
+    for i, df in enumerate(frames):
+        block[:, i, n - len(df):] = np.vstack(columns(df))
+    actual = kernel_indicators(*block)
+    for i, df in enumerate(frames):
+        for name, outputs in pandas_ta_indicators(df.reset_index(drop=True)).items():
+            worst = max(_deviation(a[i, n - len(df):], e) for a, e in zip(actual[name], outputs))
+            assert worst <= TOLERANCE, f"row {i} {name}: max relative deviation {worst:.2e}"